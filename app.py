@@ -1,13 +1,24 @@
 # app.py
-from flask import Flask, request, jsonify, render_template, abort
-from scrape import scrape_recipe_page
-from enhanced_scraping import scrape_recipe_page_enhanced
-from process_recipe import parse_and_structure_recipe
-from models import db, Recipe
+from flask import Flask, Response, request, jsonify, render_template, abort, stream_with_context
+from recipe_pipeline import extract_recipe as run_extraction_pipeline
+from circuit_breaker import circuit_breaker, is_scrape_failure, negative_cache
+from hedging import HEDGE_DELAY, transport_stats
+from html_cache import html_cache
+from http_session import get_pool_stats
+from llm_cache import llm_cache
+from rate_limit import rate_limiter
+from strategy_memory import strategy_memory
+from process_recipe import parse_and_structure_recipe, stream_parse_and_structure_recipe
+from recipe_structuring import stream_structure_recipe, structure_recipe, structuring_stats
+from audio_jobs import enqueue as enqueue_audio_job, job_payload, queue_stats
+from models import db, AudioJob, Recipe
 from storage import AudioStorage
+from narration import Narration, narration_text
+from tts import AudioCache
 
+import json
 import os
-import time
+import re
 from urllib.parse import urlparse
 from dotenv import load_dotenv
 from openai import OpenAI
@@ -70,22 +81,15 @@ if not os.path.exists(AUDIO_FOLDER):
 
 storage = AudioStorage()
 
-def is_scrape_failure(raw_text: str) -> bool:
-    """
-    Detect scraper failure payloads so we do not send them into LLM parsing.
-    """
-    if not raw_text:
-        return True
-
-    normalized = raw_text.strip().lower()
-    failure_markers = (
-        "error scraping recipe:",
-        "failed to extract recipe content",
-        "no recipe content found",
-        "access denied",
-        "cloudflare",
-    )
-    return any(marker in normalized for marker in failure_markers)
+TTS_NOT_CONFIGURED = 'OpenAI API key not configured. Please set the OPENAI_API_KEY environment variable.'
+
+def synthesize_speech(text: str, model: str, voice: str, fmt: str) -> bytes:
+    if client is None:
+        raise RuntimeError(TTS_NOT_CONFIGURED)
+    response = client.audio.speech.create(model=model, voice=voice, input=text, response_format=fmt)
+    return response.content
+
+audio_cache = AudioCache(storage, synthesize_speech)
 
 def derive_source_name(url: str) -> str:
     """
@@ -112,6 +116,24 @@ def health():
         'openai_configured': client is not None
     }), 200
 
+@app.route('/scrape-stats')
+def scrape_stats():
+    """Per-transport win rate and latency, for tuning the hedge delay"""
+    return jsonify({
+        'hedge_delay': HEDGE_DELAY,
+        'transports': transport_stats.snapshot(),
+        'rate_limiter': rate_limiter.stats(),
+        'sessions': get_pool_stats(),
+        'html_cache': html_cache.stats(),
+        'strategy_memory': strategy_memory.stats(),
+        'circuit_breaker': circuit_breaker.stats(),
+        'negative_cache': negative_cache.stats(),
+        'structuring': structuring_stats(),
+        'llm_cache': llm_cache.stats(),
+        'audio_cache': audio_cache.stats(),
+        'audio_jobs': queue_stats(),
+    })
+
 @app.route('/migrate')
 def migrate_database():
     """Database migration endpoint for Railway"""
@@ -166,6 +188,7 @@ def view_recipe(recipe_id):
         "source_name": derive_source_name(recipe.url),
         "audio_filename": recipe.audio_filename,
         "audio_url": recipe.audio_url,
+        "audio_manifest": recipe.audio_manifest,
         "views": recipe.views
     }
     
@@ -176,6 +199,77 @@ def result():
     """Serve the result page that displays the recipe and audio controls"""
     return render_template('result.html')
 
+def recipe_payload(recipe: Recipe) -> dict:
+    """The JSON shape the front end expects for a stored recipe."""
+    return {
+        'id': recipe.id,
+        'title': recipe.title,
+        'introduction': recipe.introduction,
+        'ingredients': recipe.ingredients,
+        'instructions': recipe.instructions,
+        'url': recipe.url,
+        'source_name': derive_source_name(recipe.url),
+        'audio_filename': recipe.audio_filename,
+        'audio_url': recipe.audio_url,
+        'audio_manifest': recipe.audio_manifest,
+    }
+
+def remember_audio(recipe, filename: str, audio_url: str, manifest: dict = None) -> None:
+    """Point a recipe at its stored audio file and, for segmented narrations, its manifest."""
+    if not recipe or not audio_url:
+        return
+    if recipe.audio_url != audio_url or recipe.audio_manifest != manifest:
+        recipe.audio_filename = filename
+        recipe.audio_url = audio_url
+        recipe.audio_manifest = manifest
+        db.session.commit()
+
+def generate_recipe_audio(recipe, on_segment=None) -> str:
+    """Narrate a recipe (only changed segments are synthesized) and return its audio URL; used by the worker."""
+    narration = Narration(audio_cache, recipe_payload(recipe))
+    if recipe.audio_url and narration.is_current(recipe.audio_manifest):
+        return recipe.audio_url
+    for _ in narration.stream(on_segment):
+        pass
+    manifest = narration.manifest
+    remember_audio(recipe, manifest['audio_filename'], manifest['audio_url'], manifest)
+    return manifest['audio_url']
+
+def is_valid_structure(structured_recipe: dict) -> bool:
+    return bool(
+        structured_recipe.get('title') and structured_recipe.get('ingredients') and structured_recipe.get('instructions')
+    )
+
+def save_structured_recipe(recipe_url: str, structured_recipe: dict) -> dict:
+    """
+    Insert a structured recipe and return its payload. If another request
+    stored the URL first, the existing row is returned instead.
+    """
+    try:
+        new_recipe = Recipe(
+            url=recipe_url,
+            title=structured_recipe.get('title'),
+            introduction=structured_recipe.get('introduction'),
+            ingredients=structured_recipe.get('ingredients'),
+            instructions=structured_recipe.get('instructions')
+        )
+        db.session.add(new_recipe)
+        db.session.commit()
+    except IntegrityError:
+        # Handle race condition or duplicate insert attempts
+        db.session.rollback()
+        existing_recipe = Recipe.query.filter_by(url=recipe_url).first()
+        if existing_recipe is None:
+            raise
+        return recipe_payload(existing_recipe)
+
+    return dict(
+        structured_recipe,
+        id=new_recipe.id,
+        url=recipe_url,
+        source_name=derive_source_name(recipe_url),
+    )
+
 @app.route('/extract-recipe', methods=['POST'])
 def extract_recipe():
     data = request.get_json()
@@ -188,88 +282,125 @@ def extract_recipe():
         # 0. If recipe already exists, return it instead of inserting a duplicate
         existing_recipe = Recipe.query.filter_by(url=recipe_url).first()
         if existing_recipe:
-            existing_structured = {
-                'id': existing_recipe.id,
-                'title': existing_recipe.title,
-                'introduction': existing_recipe.introduction,
-                'ingredients': existing_recipe.ingredients,
-                'instructions': existing_recipe.instructions,
-                'url': existing_recipe.url,
-                'source_name': derive_source_name(existing_recipe.url),
-                'audio_filename': existing_recipe.audio_filename,
-                'audio_url': existing_recipe.audio_url,
-            }
             return jsonify({
                 'success': True,
-                'recipe': existing_structured
+                'recipe': recipe_payload(existing_recipe)
             })
 
-        # 1. Scrape the webpage with fallback to enhanced scraper
-        raw_text = scrape_recipe_page(recipe_url)
+        # 1. Fetch the webpage once and run every extraction strategy on it
+        extraction = run_extraction_pipeline(recipe_url)
+        raw_text = extraction.to_text()
+        print(f"Extraction for {recipe_url}: transport={extraction.transport} "
+              f"strategy={extraction.strategy} fetches={extraction.fetches} "
+              f"elapsed={extraction.elapsed:.2f}s")
         
-        # If original scraper fails, try enhanced scraper
-        if is_scrape_failure(raw_text):
-            print(f"Original scraper failed, trying enhanced scraper for: {recipe_url}")
-            raw_text = scrape_recipe_page_enhanced(recipe_url)
-        
-        # Check if both scrapers failed
+        # Check if extraction failed
         if is_scrape_failure(raw_text):
             return jsonify({'error': raw_text or 'Failed to extract recipe content'}), 400
         
-        # 2. Parse & structure with OpenAI
-        structured_recipe = parse_and_structure_recipe(raw_text)
+        # 2. Structure locally from complete JSON-LD, otherwise with OpenAI
+        structured_recipe = structure_recipe(
+            raw_text, extraction.structured_data, llm=parse_and_structure_recipe
+        )
         
         # Validate the structured recipe has required fields
-        if not structured_recipe.get('title') or not structured_recipe.get('ingredients') or not structured_recipe.get('instructions'):
+        if not is_valid_structure(structured_recipe):
             return jsonify({'error': 'Failed to parse recipe structure properly'}), 400
 
         # 3. Only save to database if we have a valid recipe
-        new_recipe = Recipe(
-            url=recipe_url,
-            title=structured_recipe.get('title'),
-            introduction=structured_recipe.get('introduction'),
-            ingredients=structured_recipe.get('ingredients'),
-            instructions=structured_recipe.get('instructions')
-        )
-        db.session.add(new_recipe)
-        db.session.commit()
-        
-        # Include the ID in the response
-        structured_recipe['id'] = new_recipe.id
-        structured_recipe['url'] = recipe_url
-        structured_recipe['source_name'] = derive_source_name(recipe_url)
-        
         return jsonify({
             'success': True,
-            'recipe': structured_recipe
+            'recipe': save_structured_recipe(recipe_url, structured_recipe)
         })
 
     except IntegrityError:
-        # Handle race condition or duplicate insert attempts
-        db.session.rollback()
-        existing_recipe = Recipe.query.filter_by(url=recipe_url).first()
-        if existing_recipe:
-            existing_structured = {
-                'id': existing_recipe.id,
-                'title': existing_recipe.title,
-                'introduction': existing_recipe.introduction,
-                'ingredients': existing_recipe.ingredients,
-                'instructions': existing_recipe.instructions,
-                'url': existing_recipe.url,
-                'source_name': derive_source_name(existing_recipe.url),
-                'audio_filename': existing_recipe.audio_filename,
-                'audio_url': existing_recipe.audio_url,
-            }
-            return jsonify({
-                'success': True,
-                'recipe': existing_structured
-            })
         return jsonify({'error': 'Duplicate URL and unable to fetch existing record'}), 409
 
     except Exception as e:
         print(f"Error extracting recipe: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+STREAMED_FIELDS = ('title', 'introduction', 'ingredients', 'instructions')
+
+def completed_field(snapshot: dict, field: str):
+    """
+    A field of a partial recipe, without a trailing list item that may still
+    be growing (an ingredient object whose "item" has not arrived yet).
+    The done event carries the final recipe, so nothing is lost.
+    """
+    value = snapshot.get(field)
+    if (isinstance(value, list) and value
+            and list(snapshot)[-1] == field and isinstance(value[-1], dict)):
+        return value[:-1]
+    return value
+
+def _event(payload: dict) -> str:
+    return json.dumps(payload) + '\n'
+
+def extract_recipe_events(recipe_url: str):
+    """
+    NDJSON events for /extract-recipe-stream:
+    {"type": "stage"}, then {"type": "partial", "field", "value"} as each
+    field becomes known, then one {"type": "done", "recipe"} or {"type": "error", "error"}.
+    """
+    try:
+        existing_recipe = Recipe.query.filter_by(url=recipe_url).first()
+        if existing_recipe:
+            yield _event({'type': 'done', 'recipe': recipe_payload(existing_recipe)})
+            return
+
+        yield _event({'type': 'stage', 'stage': 'fetching', 'message': 'Fetching the recipe page...'})
+        extraction = run_extraction_pipeline(recipe_url)
+        raw_text = extraction.to_text()
+        print(f"Extraction for {recipe_url}: transport={extraction.transport} "
+              f"strategy={extraction.strategy} fetches={extraction.fetches} "
+              f"elapsed={extraction.elapsed:.2f}s")
+        if is_scrape_failure(raw_text):
+            yield _event({'type': 'error', 'error': raw_text or 'Failed to extract recipe content'})
+            return
+
+        yield _event({'type': 'stage', 'stage': 'structuring', 'message': 'Reading the recipe...'})
+        sent = {}
+        title_match = re.search(r'^Title: *(.+)$', raw_text, re.MULTILINE)
+        if title_match:
+            # Known from the page itself; the structured title may refine it below
+            sent['title'] = title_match.group(1).strip()
+            yield _event({'type': 'partial', 'field': 'title', 'value': sent['title']})
+
+        structured_recipe = {}
+        for snapshot in stream_structure_recipe(
+            raw_text, extraction.structured_data, llm_stream=stream_parse_and_structure_recipe
+        ):
+            structured_recipe = snapshot
+            for field in STREAMED_FIELDS:
+                value = completed_field(snapshot, field)
+                if value and value != sent.get(field):
+                    sent[field] = value
+                    yield _event({'type': 'partial', 'field': field, 'value': value})
+
+        if not is_valid_structure(structured_recipe):
+            yield _event({'type': 'error', 'error': 'Failed to parse recipe structure properly'})
+            return
+        yield _event({'type': 'done', 'recipe': save_structured_recipe(recipe_url, structured_recipe)})
+
+    except Exception as e:
+        print(f"Error streaming recipe extraction: {str(e)}")
+        db.session.rollback()
+        yield _event({'type': 'error', 'error': str(e)})
+
+@app.route('/extract-recipe-stream', methods=['POST'])
+def extract_recipe_stream():
+    """Streaming /extract-recipe: newline-delimited JSON progress and partial results."""
+    data = request.get_json(silent=True) or {}
+    recipe_url = data.get('recipeUrl')
+    if not recipe_url:
+        return jsonify({'error': 'No URL provided'}), 400
+    return Response(
+        stream_with_context(extract_recipe_events(recipe_url)),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
 @app.route('/generate-audio', methods=['POST'])
 def generate_audio():
     try:
@@ -280,37 +411,14 @@ def generate_audio():
         if not text:
             return jsonify({'error': 'No text provided'}), 400
 
-        # Generate unique filename
-        timestamp = int(time.time())
-        filename = f"recipe_{recipe_id}_{timestamp}.mp3"
+        # Saved recipes are narrated by the background worker; the page polls the job
+        recipe = db.session.get(Recipe, recipe_id) if recipe_id else None
+        if recipe is not None:
+            return enqueue_recipe_audio(recipe)
 
-        # Check if OpenAI client is available
-        if client is None:
-            return jsonify({'error': 'OpenAI API key not configured. Please set the OPENAI_API_KEY environment variable.'}), 500
-
-        # Generate audio using OpenAI
-        response = client.audio.speech.create(
-            model="tts-1",  # Standard model - half the cost, good quality for recipes
-            voice="nova",   # Using nova voice for clearer speech
-            input=text
-        )
-
-        # Get audio content
-        audio_content = response.content
-
-        # Upload to S3
-        audio_url = storage.save_audio(audio_content, filename)
-
-        if not audio_url:
-            return jsonify({'error': 'Failed to save audio'}), 500
-
-        # Update database
-        if recipe_id:
-            recipe = db.session.get(Recipe, recipe_id)
-            if recipe:
-                recipe.audio_filename = filename
-                recipe.audio_url = audio_url
-                db.session.commit()
+        # Audio is named by content, so identical text reuses the stored file
+        # and concurrent requests for it share one synthesis
+        filename, audio_url = audio_cache.get_or_create(text)
 
         return jsonify({
             'success': True,
@@ -321,7 +429,43 @@ def generate_audio():
         print(f"Error in generate_audio: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def enqueue_recipe_audio(recipe):
+    payload = recipe_payload(recipe)
+    if not narration_text(payload):
+        return jsonify({'error': 'This recipe does not have enough content for audio generation yet.'}), 400
+    narration = Narration(audio_cache, payload)
+    if recipe.audio_url and narration.is_current(recipe.audio_manifest):
+        return jsonify({'success': True, 'audio_url': recipe.audio_url})
+
+    job, _ = enqueue_audio_job(recipe.id, narration.filename)
+    if job.status == 'done' and job.audio_url:
+        return jsonify({'success': True, 'audio_url': job.audio_url, 'job': job_payload(job)})
+    return jsonify({'success': True, 'job': job_payload(job)}), 202
+
+@app.route('/audio-jobs/<int:job_id>')
+def audio_job_status(job_id):
+    """Status of a background audio job, polled by the recipe pages"""
+    job = db.session.get(AudioJob, job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job_payload(job))
+
+@app.route('/recipe/<int:recipe_id>/audio-manifest')
+def recipe_audio_manifest(recipe_id):
+    """Byte offsets, start times and durations of each step in the recipe's audio"""
+    recipe = db.session.get(Recipe, recipe_id)
+    if recipe is None:
+        abort(404)
+    # A manifest for an older version of the recipe text does not match the audio being generated
+    if not Narration(audio_cache, recipe_payload(recipe)).is_current(recipe.audio_manifest):
+        return jsonify({'error': 'No step audio has been generated for this recipe yet.'}), 404
+    return jsonify(recipe.audio_manifest)
+
 if __name__ == '__main__':
     # For local dev only
-    # In production, use a proper WSGI server (e.g., gunicorn)
+    # In production, use a proper WSGI server (e.g., gunicorn); its config starts the audio worker
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Work the audio queue in the reloader's child process, so there is exactly one local worker
+        from audio_worker import BackgroundWorker
+        BackgroundWorker(app, generate_recipe_audio).start()
     app.run(port=5000, debug=True)
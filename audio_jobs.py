@@ -0,0 +1,163 @@
+# audio_jobs.py
+"""
+Durable queue of audio generation jobs, kept in the app database.
+
+Synthesizing a narration takes far longer than a page view, and the web
+server only has a couple of threads. The web process therefore just records
+an AudioJob; audio_worker.py claims queued jobs and runs them, on a
+background thread of each web worker or in a process of its own.
+Enqueueing is idempotent. There is one job per recipe text, enforced by a
+unique dedupe key, so repeated clicks, several tabs or several web workers
+all get the same job back. A claim is a conditional UPDATE that only one
+worker can win, and it holds a lease. If a worker dies, its job becomes
+claimable again once the lease runs out; a worker that shuts down cleanly
+releases its job at once. Failed attempts, including ones whose worker
+died, are retried up to AUDIO_JOB_MAX_ATTEMPTS times.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from models import AudioJob, db, utcnow
+
+logger = logging.getLogger(__name__)
+
+AUDIO_JOB_LEASE_SECONDS = int(os.getenv('AUDIO_JOB_LEASE_SECONDS', '300'))
+AUDIO_JOB_MAX_ATTEMPTS = int(os.getenv('AUDIO_JOB_MAX_ATTEMPTS', '3'))
+
+def job_payload(job: AudioJob) -> Dict[str, Any]:
+    """The JSON shape the front end polls."""
+    return {
+        'id': job.id,
+        'recipe_id': job.recipe_id,
+        'status': job.status,
+        'progress': {'done': job.progress_done or 0, 'total': job.progress_total or 0},
+        # Finished segments in narration order; the page can play them before the whole file is stored
+        'segments': list(job.segment_urls or []) if job.status == 'running' else [],
+        'audio_url': job.audio_url,
+        'error': job.error if job.status == 'failed' else None,
+        'status_url': f"/audio-jobs/{job.id}",
+    }
+
+def enqueue(recipe_id: int, narration_filename: str) -> Tuple[AudioJob, bool]:
+    """
+    Return the job that generates ``narration_filename`` for a recipe,
+    creating it if there is none. Returns (job, created). A failed job is
+    queued again.
+    """
+    dedupe_key = f"{recipe_id}:{narration_filename}"
+    job = AudioJob.query.filter_by(dedupe_key=dedupe_key).first()
+    if job is None:
+        job = AudioJob(recipe_id=recipe_id, dedupe_key=dedupe_key, status='queued', attempts=0)
+        db.session.add(job)
+        try:
+            db.session.commit()
+            return job, True
+        except IntegrityError:
+            # Another request enqueued the same recipe text first
+            db.session.rollback()
+            job = AudioJob.query.filter_by(dedupe_key=dedupe_key).first()
+    if job.status == 'failed':
+        job.status, job.attempts, job.error = 'queued', 0, None
+        db.session.commit()
+    return job, False
+
+def claim(now: Optional[datetime] = None) -> Optional[AudioJob]:
+    """Take the oldest queued job, or one whose lease expired; None when there is nothing to do."""
+    now = now or utcnow()
+    expired = and_(AudioJob.status == 'running', AudioJob.locked_until < now)
+    # A job whose worker keeps dying with it gives up like any other failing job
+    gave_up = db.session.execute(
+        update(AudioJob)
+        .where(expired, AudioJob.attempts >= AUDIO_JOB_MAX_ATTEMPTS)
+        .values(status='failed', error='Audio generation stopped responding', locked_until=None, updated_at=now)
+    )
+    db.session.commit()
+    if gave_up.rowcount:
+        logger.warning(f"Gave up on {gave_up.rowcount} audio job(s) after {AUDIO_JOB_MAX_ATTEMPTS} attempts")
+
+    claimable = or_(AudioJob.status == 'queued', and_(expired, AudioJob.attempts < AUDIO_JOB_MAX_ATTEMPTS))
+    while True:
+        candidate = AudioJob.query.filter(claimable).order_by(AudioJob.id).first()
+        if candidate is None:
+            return None
+        # Attempts change on every claim, so only one worker's UPDATE can match
+        result = db.session.execute(
+            update(AudioJob)
+            .where(AudioJob.id == candidate.id, AudioJob.attempts == candidate.attempts, claimable)
+            .values(
+                status='running',
+                attempts=candidate.attempts + 1,
+                progress_done=0,
+                segment_urls=None,
+                locked_until=now + timedelta(seconds=AUDIO_JOB_LEASE_SECONDS),
+                updated_at=now,
+            )
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            db.session.refresh(candidate)
+            # Column attributes reload after every commit, so remember which attempt this worker owns
+            candidate.claimed_attempt = candidate.attempts
+            return candidate
+
+def _update_claimed(job: AudioJob, **values) -> bool:
+    """
+    Update a job only while the claim that returned it still holds it; False
+    once its lease expired and another worker claimed it, or it was released.
+    """
+    result = db.session.execute(
+        update(AudioJob)
+        .where(AudioJob.id == job.id, AudioJob.attempts == job.claimed_attempt, AudioJob.status == 'running')
+        .values(updated_at=utcnow(), **values)
+    )
+    db.session.commit()
+    if result.rowcount != 1:
+        logger.warning(f"Audio job {job.id} attempt {job.claimed_attempt} no longer holds the job")
+        return False
+    return True
+
+def heartbeat(job: AudioJob, done: int, total: int, segment_urls: Optional[List[str]] = None) -> bool:
+    """Record progress, and the segments stored so far, and extend the lease."""
+    return _update_claimed(
+        job, progress_done=done, progress_total=total, segment_urls=segment_urls,
+        locked_until=utcnow() + timedelta(seconds=AUDIO_JOB_LEASE_SECONDS),
+    )
+
+def complete(job: AudioJob, audio_url: str) -> bool:
+    return _update_claimed(
+        job, status='done', audio_url=audio_url, error=None, locked_until=None,
+        progress_done=AudioJob.progress_total,
+    )
+
+def fail(job: AudioJob, error: str) -> bool:
+    """Queue the job again, or mark it failed once it is out of attempts."""
+    attempt = job.claimed_attempt
+    status = 'failed' if attempt >= AUDIO_JOB_MAX_ATTEMPTS else 'queued'
+    if not _update_claimed(job, status=status, error=error, locked_until=None):
+        return False
+    logger.warning(f"Audio job {job.id} attempt {attempt} failed: {error}")
+    return True
+
+def release(job_id: int, attempts: int) -> bool:
+    """
+    Hand a running job back to the queue right away, for a worker that is
+    shutting down mid-job. The interrupted attempt is not counted. Does
+    nothing if the job has moved on since that claim.
+    """
+    result = db.session.execute(
+        update(AudioJob)
+        .where(AudioJob.id == job_id, AudioJob.attempts == attempts, AudioJob.status == 'running')
+        .values(status='queued', attempts=attempts - 1, locked_until=None, updated_at=utcnow())
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+def queue_stats() -> Dict[str, int]:
+    """Number of jobs in each status."""
+    rows = db.session.query(AudioJob.status, func.count(AudioJob.id)).group_by(AudioJob.status).all()
+    return {status: count for status, count in rows}
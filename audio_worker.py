@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# audio_worker.py
+"""
+Background worker that generates recipe audio queued by the web process.
+
+Run it next to the web server (see the Procfile):
+
+    python audio_worker.py
+
+It must share the database and the audio storage with the web service,
+which in practice means S3. Hosts that only start the web process can set
+AUDIO_WORKER_IN_WEB=1 instead; each gunicorn worker then runs one on a
+daemon thread (see the post_worker_init hook in gunicorn_config.py). That
+thread shares the web worker's memory and is restarted with it.
+
+A worker claims one job at a time from the audio job queue (audio_jobs.py)
+and narrates the recipe. Each narration already synthesizes its segments in
+parallel. Progress is written to the job so the page can show it. The
+job's lease keeps two workers from running the same job.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+from audio_jobs import claim, complete, fail, heartbeat, release
+from models import Recipe, db
+
+logger = logging.getLogger(__name__)
+
+AUDIO_WORKER_POLL_SECONDS = float(os.getenv('AUDIO_WORKER_POLL_SECONDS', '1'))
+# Opt in to running the worker on a thread of each web worker, for hosts without a worker process
+AUDIO_WORKER_IN_WEB = os.getenv('AUDIO_WORKER_IN_WEB', '0') == '1'
+
+# generate(recipe, on_segment(done, total, segment URL)) -> audio URL
+Generator = Callable[[Recipe, Callable[[int, int, str], None]], str]
+# on_claim((job id, attempts)) when a job is claimed, on_claim(None) when it is finished
+ClaimListener = Callable[[Optional[Tuple[int, int]]], None]
+
+def run_once(generate: Generator, on_claim: Optional[ClaimListener] = None) -> bool:
+    """Claim and run one job; returns False when the queue was empty. Needs an app context."""
+    job = claim()
+    if job is None:
+        return False
+    logger.info(f"Generating audio for recipe {job.recipe_id} (job {job.id}, attempt {job.attempts})")
+    if on_claim:
+        on_claim((job.id, job.claimed_attempt))
+
+    segment_urls = []
+
+    def on_segment(done: int, total: int, url: str) -> None:
+        segment_urls.append(url)
+        # Stop early once another worker owns the job; its results would be discarded
+        if not heartbeat(job, done, total, list(segment_urls)):
+            raise RuntimeError(f"Audio job {job.id} was taken over")
+
+    try:
+        recipe = db.session.get(Recipe, job.recipe_id)
+        if recipe is None:
+            raise RuntimeError(f"Recipe {job.recipe_id} no longer exists")
+        audio_url = generate(recipe, on_segment)
+    except Exception as e:
+        db.session.rollback()
+        fail(job, str(e))
+    else:
+        complete(job, audio_url)
+    finally:
+        if on_claim:
+            on_claim(None)
+    return True
+
+def run_worker(app, generate: Generator, stop: Optional[threading.Event] = None,
+               on_claim: Optional[ClaimListener] = None) -> None:
+    """Process jobs until ``stop`` is set, sleeping between polls of an empty queue."""
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            with app.app_context():
+                busy = run_once(generate, on_claim)
+        except Exception as e:
+            # A database hiccup should not kill the worker
+            logger.error(f"Audio worker error: {e}")
+            busy = False
+        if not busy:
+            stop.wait(AUDIO_WORKER_POLL_SECONDS)
+
+class BackgroundWorker:
+    """run_worker() on a daemon thread of a web worker process."""
+
+    def __init__(self, app, generate: Generator):
+        self.app = app
+        self.stop_event = threading.Event()
+        self._current: Optional[Tuple[int, int]] = None
+        self.thread = threading.Thread(
+            target=run_worker, args=(app, generate, self.stop_event, self._track),
+            name='audio-worker', daemon=True,
+        )
+
+    def _track(self, claimed: Optional[Tuple[int, int]]) -> None:
+        self._current = claimed
+
+    def start(self) -> 'BackgroundWorker':
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop taking jobs. The daemon thread dies with the process, so a job
+        still running is handed back to the queue for the next worker instead
+        of waiting out its lease; segments already synthesized stay cached.
+        """
+        self.stop_event.set()
+        current = self._current
+        if current is None:
+            return
+        try:
+            with self.app.app_context():
+                if release(*current):
+                    logger.info(f"Released audio job {current[0]} on shutdown")
+        except Exception as e:
+            logger.error(f"Could not release audio job {current[0]}: {e}")
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    from app import app, generate_recipe_audio
+
+    print("🎧 Audio worker started")
+    run_worker(app, generate_recipe_audio)
+
+if __name__ == "__main__":
+    main()
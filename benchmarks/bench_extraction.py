@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Benchmark end-to-end recipe extraction over the recorded HTML corpus.
+
+Runs scrape.extract_recipe_content and EnhancedRecipeScraper.extract_recipe_content
+(each including its DOM parse, as in production) over every page recorded by
+record_corpus.py. For each extractor it reports pages/sec, per-page p50/p99
+time, peak traced memory and how many pages still match the recipe expected
+in the manifest. Without a recorded corpus it falls back to the synthetic
+fixture pages from bench_html_parsers.py.
+
+The JSON output carries the commit and corpus fingerprint. Pass an earlier run
+as --baseline to fail (exit 1) when time, memory or correctness regress.
+
+Usage:
+    python benchmarks/bench_extraction.py [--repeat 3] [--json out.json] [--baseline old.json] [--tolerance 0.15]
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_html_parsers import build_fixture_page  # noqa: E402
+from benchmarks.record_corpus import expected_recipe, load_corpus  # noqa: E402
+from enhanced_scraping import EnhancedRecipeScraper  # noqa: E402
+from html_parsing import make_soup  # noqa: E402
+from scrape import extract_recipe_content, remove_non_content  # noqa: E402
+from tests.test_recipe_parsing import TOP_25_POPULAR_RECIPE_SITES  # noqa: E402
+
+# Metrics compared against a baseline; True when higher is better
+TRACKED_METRICS = {'pages_per_sec': True, 'ms_p50': False, 'ms_p99': False, 'peak_kib_max': False, 'correct': True}
+
+def synthetic_corpus() -> List[Dict[str, Any]]:
+    pages = []
+    for index, (domain, url) in enumerate(TOP_25_POPULAR_RECIPE_SITES):
+        html_text = build_fixture_page(domain, index)
+        pages.append({'domain': domain, 'url': url, 'html': html_text, 'expected': expected_recipe(html_text)})
+    return pages
+
+def run_scrape(page: Dict[str, Any]) -> Dict[str, Any]:
+    soup = make_soup(page['html'])
+    remove_non_content(soup)
+    text = extract_recipe_content(soup, page['url'])
+    return {'text': text}
+
+_enhanced = EnhancedRecipeScraper()
+
+def run_enhanced(page: Dict[str, Any]) -> Dict[str, Any]:
+    return _enhanced.extract_recipe_content(make_soup(page['html']), page['url'])
+
+def is_correct(output: Dict[str, Any], expected: Optional[Dict[str, Any]]) -> bool:
+    """Whether the output still contains the recipe recorded for the page."""
+    if expected is None:
+        return True
+    if 'text' in output:
+        text = output['text']
+        return (
+            'Ingredients:' in text and 'Instructions:' in text
+            and (not expected['title'] or expected['title'] in text)
+        )
+    return (
+        len(output.get('ingredients', [])) == expected['ingredients']
+        and len(output.get('instructions', [])) == expected['instructions']
+        and (not expected['title'] or output.get('title') == expected['title'])
+    )
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def measure(name: str, extractor: Callable[[Dict[str, Any]], Dict[str, Any]], pages: List[Dict[str, Any]], repeat: int) -> dict:
+    times = []
+    peaks = []
+    failures = []
+    for page in pages:
+        page_times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = extractor(page)
+            page_times.append(time.perf_counter() - start)
+        times.append(min(page_times))
+        if not is_correct(output, page.get('expected')):
+            failures.append(page['domain'])
+
+        tracemalloc.start()
+        extractor(page)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+
+    return {
+        'extractor': name,
+        'pages': len(pages),
+        'pages_per_sec': round(len(pages) / sum(times), 2),
+        'ms_p50': round(statistics.median(times) * 1000, 3),
+        'ms_p99': round(percentile(times, 0.99) * 1000, 3),
+        'peak_kib_max': round(max(peaks) / 1024, 1),
+        'correct': len(pages) - len(failures),
+        'failures': failures,
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def corpus_fingerprint(pages: List[Dict[str, Any]]) -> str:
+    digest = hashlib.sha256()
+    for page in pages:
+        digest.update(page.get('sha256') or hashlib.sha256(page['html'].encode('utf-8')).hexdigest().encode())
+    return digest.hexdigest()[:16]
+
+def compare(results: List[dict], baseline: dict, tolerance: float) -> List[str]:
+    """Describe every tracked metric that got worse than the baseline by more than ``tolerance``."""
+    regressions = []
+    previous = {row['extractor']: row for row in baseline.get('results', [])}
+    for row in results:
+        old = previous.get(row['extractor'])
+        if old is None:
+            continue
+        for metric, higher_is_better in TRACKED_METRICS.items():
+            before, after = old.get(metric), row.get(metric)
+            if before is None or after is None:
+                continue
+            if metric == 'correct':
+                worse = after < before
+            elif higher_is_better:
+                worse = after < before * (1 - tolerance)
+            else:
+                worse = after > before * (1 + tolerance)
+            if worse:
+                regressions.append(f"{row['extractor']} {metric}: {before} -> {after}")
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per page (best is kept)')
+    parser.add_argument('--json', dest='json_path', help='also write results to this JSON file')
+    parser.add_argument('--baseline', help='earlier --json output to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed relative slowdown before flagging')
+    args = parser.parse_args()
+
+    pages = load_corpus()
+    source = 'recorded'
+    if not pages:
+        print("no recorded corpus (run benchmarks/record_corpus.py); using synthetic fixture pages")
+        pages = synthetic_corpus()
+        source = 'synthetic'
+
+    results = [
+        measure('scrape', run_scrape, pages, args.repeat),
+        measure('enhanced', run_enhanced, pages, args.repeat),
+    ]
+
+    print(f"{'extractor':<11}{'pages/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'peak KiB':>10}{'correct':>10}")
+    for row in results:
+        print(
+            f"{row['extractor']:<11}{row['pages_per_sec']:>9}{row['ms_p50']:>9}{row['ms_p99']:>9}"
+            f"{row['peak_kib_max']:>10}{row['correct']:>6}/{row['pages']:<3}"
+        )
+        if row['failures']:
+            print(f"  mismatched: {', '.join(row['failures'])}")
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'corpus': source,
+            'corpus_fingerprint': corpus_fingerprint(pages),
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('corpus_fingerprint') != report['meta']['corpus_fingerprint']:
+            print("warning: baseline was measured on a different corpus")
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
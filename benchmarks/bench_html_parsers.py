@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark HTML parser backends on the recipe fixture pages.
+
+Wraps each JSON-LD fixture from tests/test_recipe_parsing.py in a page of
+realistic size (navigation, a long story, the recipe card, comments, footer)
+and reports per-page parse time and peak traced memory for every installed
+backend, with and without partial parsing.
+
+Usage:
+    python benchmarks/bench_html_parsers.py [--repeat 5] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_parsing import PARSER_BACKENDS, _backend_available, make_soup, partial_parsing_supported  # noqa: E402
+from tests.test_recipe_parsing import TOP_25_POPULAR_RECIPE_SITES, _build_recipe_payload  # noqa: E402
+
+def build_fixture_page(domain: str, index: int) -> str:
+    """Embed a fixture payload in a page shaped like a typical recipe blog post."""
+    payload = _build_recipe_payload(domain, index)
+    nav = ''.join(f'<li><a href="/c/{i}">Category {i}</a></li>' for i in range(120))
+    story = ''.join(
+        f'<p>Paragraph {i} about why {domain} loves this dish, with <a href="/p/{i}">links</a> '
+        f'and <em>emphasis</em> scattered through the text.</p>'
+        for i in range(150)
+    )
+    card = (
+        '<div class="wprm-recipe-container"><h2 class="wprm-recipe-name">Fixture</h2>'
+        '<ul class="wprm-recipe-ingredients">'
+        + ''.join(f'<li class="wprm-recipe-ingredient">{i} cup flour</li>' for i in range(12))
+        + '</ul><ol class="wprm-recipe-instructions">'
+        + ''.join(f'<li class="wprm-recipe-instruction">Step {i}: mix well.</li>' for i in range(10))
+        + '</ol></div>'
+    )
+    comments = ''.join(
+        f'<li class="comment"><div class="comment-author">Reader {i}</div>'
+        f'<div class="comment-body"><p>Made this {i} times, so good!</p></div></li>'
+        for i in range(200)
+    )
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Fixture</title>'
+        + ''.join(f'<link rel="stylesheet" href="/s{i}.css">' for i in range(10))
+        + ''.join(f'<script src="/js{i}.js"></script>' for i in range(10))
+        + f'<script type="application/ld+json">{json.dumps(payload)}</script>'
+        + f'</head><body><header><nav><ul>{nav}</ul></nav></header>'
+        + f'<main><article class="post"><h1 class="entry-title">Fixture</h1>'
+        + f'<div class="entry-content">{story}{card}</div></article></main>'
+        + f'<section class="comments"><ol>{comments}</ol></section>'
+        + f'<footer><ul>{nav}</ul></footer></body></html>'
+    )
+
+def measure(pages: list, backend: str, partial: bool, repeat: int) -> dict:
+    times = []
+    peaks = []
+    for page in pages:
+        page_times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            make_soup(page, partial=partial, parser=backend)
+            page_times.append(time.perf_counter() - start)
+        times.append(min(page_times))
+
+        tracemalloc.start()
+        soup = make_soup(page, partial=partial, parser=backend)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del soup
+        peaks.append(peak)
+
+    return {
+        'backend': backend,
+        'partial': partial,
+        'pages': len(pages),
+        'page_bytes_avg': int(statistics.mean(len(p.encode('utf-8')) for p in pages)),
+        'parse_ms_p50': round(statistics.median(times) * 1000, 3),
+        'parse_ms_max': round(max(times) * 1000, 3),
+        'peak_kib_p50': round(statistics.median(peaks) / 1024, 1),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='timed parses per page (best is kept)')
+    parser.add_argument('--json', dest='json_path', help='also write results to this JSON file')
+    args = parser.parse_args()
+
+    pages = [build_fixture_page(domain, index) for index, (domain, _) in enumerate(TOP_25_POPULAR_RECIPE_SITES)]
+    modes = [False, True] if partial_parsing_supported() else [False]
+
+    results = []
+    for backend in PARSER_BACKENDS:
+        if not _backend_available(backend):
+            print(f"skipping {backend}: not installed")
+            continue
+        for partial in modes:
+            if partial and backend == 'html5-parser':
+                continue
+            results.append(measure(pages, backend, partial, args.repeat))
+
+    print(f"{'backend':<14}{'partial':<9}{'p50 ms':>10}{'max ms':>10}{'peak KiB':>11}")
+    for row in results:
+        print(
+            f"{row['backend']:<14}{str(row['partial']):<9}"
+            f"{row['parse_ms_p50']:>10}{row['parse_ms_max']:>10}{row['peak_kib_p50']:>11}"
+        )
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
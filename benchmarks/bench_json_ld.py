@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark the tolerant JSON-LD loader on pathological ld+json payloads.
+
+Each case is generated at several sizes (up to multiple megabytes) and timed
+with scrape._load_json_ld_payloads. Time should grow linearly with size. With
+--compare, the previous retry-from-every-bracket loader is timed too, on the
+smaller sizes only, because it is quadratic (and can hit RecursionError) on
+several of these inputs.
+
+Usage:
+    python benchmarks/bench_json_ld.py [--sizes 65536,1048576,4194304] [--compare] [--json out.json]
+"""
+import argparse
+import html
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrape import _load_json_ld_payloads  # noqa: E402
+
+LEGACY_MAX_SIZE = 32 * 1024
+
+def _repeat_to(unit: str, size: int, prefix: str = '', suffix: str = '') -> str:
+    return prefix + unit * max(1, (size - len(prefix) - len(suffix)) // len(unit)) + suffix
+
+def _graph_node(i: int) -> str:
+    return json.dumps({
+        '@type': 'HowToStep',
+        'name': f'Step {i}',
+        'text': 'Whisk the eggs with the flour until smooth. ' * 3,
+        'image': {'@type': 'ImageObject', 'url': f'https://example.com/step-{i}.jpg', 'width': 1200},
+    })
+
+def _broken_graph(size: int) -> str:
+    """A large Yoast/WPRM-style @graph where one node near the end has a trailing comma."""
+    recipe = json.dumps({'@type': 'Recipe', 'name': 'Pancakes', 'recipeIngredient': ['1 egg'],
+                         'recipeInstructions': ['Mix.']})
+    node = _graph_node(0)
+    count = max(1, size // (len(node) + 1))
+    nodes = [_graph_node(i) for i in range(count)]
+    nodes.insert(count // 2, recipe)
+    nodes.append('{"@type": "WebPage", "name": "broken",}')
+    return '{"@context": "https://schema.org", "@graph": [' + ','.join(nodes) + ']}'
+
+CASES = {
+    # Intact-looking graph that fails to parse as a whole; the recipe must still be found
+    'broken_graph': _broken_graph,
+    # Payload cut off mid-way through nested objects/arrays (truncated response)
+    'nested_unclosed': lambda size: _repeat_to('{"a":[', size),
+    'list_unclosed': lambda size: _repeat_to('[1,', size),
+    # Thousands of small values that each fail to decode
+    'many_broken_objects': lambda size: _repeat_to('{"a":}', size),
+    # A string that never ends, full of escaped quotes
+    'unterminated_string': lambda size: _repeat_to('\\"', size, prefix='{"description": "'),
+    # Raw control characters inside string values (plugin-injected CR/LF)
+    'control_chars': lambda size: '[' + ','.join(
+        ['{"text": "line one\r\nline two\ttabbed"}'] * max(1, size // 40)) + ']',
+    'deep_nesting': lambda size: '[' * (size // 2) + ']' * (size // 2),
+}
+
+def legacy_load_json_ld_payloads(raw_text: str) -> list:
+    """The loader before the single-pass scanner, kept here for comparison."""
+    if not raw_text:
+        return []
+    candidates = []
+    for candidate in [raw_text.strip(), html.unescape(raw_text.strip())]:
+        if candidate and candidate not in candidates:
+            candidates.append(candidate)
+    payloads = []
+    decoder = json.JSONDecoder()
+    for candidate in candidates:
+        attempts = [candidate, re.sub(r'[\x00-\x1F\x7F]', ' ', candidate)]
+        parsed_full_payload = False
+        for attempt in attempts:
+            try:
+                payloads.append(json.loads(attempt))
+                parsed_full_payload = True
+                break
+            except json.JSONDecodeError:
+                continue
+        if parsed_full_payload:
+            continue
+        for attempt in attempts:
+            idx = 0
+            found_any = False
+            while idx < len(attempt):
+                while idx < len(attempt) and attempt[idx] not in "{[":
+                    idx += 1
+                if idx >= len(attempt):
+                    break
+                try:
+                    parsed, end = decoder.raw_decode(attempt, idx)
+                    payloads.append(parsed)
+                    idx = end
+                    found_any = True
+                except json.JSONDecodeError:
+                    idx += 1
+            if found_any:
+                break
+    return payloads
+
+def timed(loader, text: str) -> dict:
+    start = time.perf_counter()
+    try:
+        payloads = loader(text)
+        error = None
+    except RecursionError:
+        payloads, error = [], 'RecursionError'
+    return {'ms': round((time.perf_counter() - start) * 1000, 2), 'payloads': len(payloads), 'error': error}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='65536,1048576,4194304', help='comma-separated payload sizes in bytes')
+    parser.add_argument('--compare', action='store_true', help=f'also time the legacy loader (sizes <= {LEGACY_MAX_SIZE})')
+    parser.add_argument('--json', dest='json_path', help='also write results to this JSON file')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    if args.compare:
+        sizes = sorted(set(sizes) | {8 * 1024, LEGACY_MAX_SIZE})
+
+    results = []
+    print(f"{'case':<22}{'bytes':>10}{'ms':>10}{'us/KiB':>9}{'payloads':>10}{'legacy ms':>12}")
+    for name, build in CASES.items():
+        for size in sizes:
+            text = build(size)
+            row = {'case': name, 'bytes': len(text), **timed(_load_json_ld_payloads, text)}
+            if args.compare and size <= LEGACY_MAX_SIZE:
+                row['legacy'] = timed(legacy_load_json_ld_payloads, text)
+            results.append(row)
+            legacy = row.get('legacy')
+            legacy_cell = '' if not legacy else (legacy['error'] or str(legacy['ms']))
+            per_kib = row['ms'] * 1000 / (len(text) / 1024)
+            print(f"{name:<22}{len(text):>10}{row['ms']:>10}{per_kib:>9.1f}{row['payloads']:>10}{legacy_cell:>12}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Record the offline HTML corpus used by bench_extraction.py.
+
+Fetches the live top-25 recipe pages from tests/test_live_recipe_sites.py and
+stores each one gzip-compressed under benchmarks/corpus/, alongside a
+manifest.json recording the URL, content hash and the recipe that was
+extracted when the page was recorded (title plus ingredient and instruction
+counts). The benchmark checks its extraction against that expectation, so
+re-record deliberately and review the manifest diff when a site changes.
+
+Usage:
+    python benchmarks/record_corpus.py [--only allrecipes.com,delish.com] [--force]
+"""
+import argparse
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_session import get_cloudscraper  # noqa: E402
+from scrape import (  # noqa: E402
+    decode_response_content,
+    get_random_headers,
+    get_structured_data_from_html,
+    looks_blocked,
+    structured_recipe_fields,
+)
+from tests.test_live_recipe_sites import LIVE_TOP_25_RECIPE_URLS  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+MANIFEST_PATH = os.path.join(CORPUS_DIR, 'manifest.json')
+
+def load_manifest() -> Dict[str, Any]:
+    if not os.path.exists(MANIFEST_PATH):
+        return {'pages': []}
+    with open(MANIFEST_PATH) as f:
+        return json.load(f)
+
+def load_corpus() -> List[Dict[str, Any]]:
+    """Manifest entries with their decompressed 'html', skipping files that are missing."""
+    pages = []
+    for entry in load_manifest()['pages']:
+        path = os.path.join(CORPUS_DIR, entry['file'])
+        if not os.path.exists(path):
+            continue
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            pages.append(dict(entry, html=f.read()))
+    return pages
+
+def expected_recipe(html_text: str) -> Optional[Dict[str, Any]]:
+    structured = get_structured_data_from_html(html_text)
+    if not structured:
+        return None
+    fields = structured_recipe_fields(structured)
+    return {
+        'title': fields['title'],
+        'ingredients': len(fields['ingredients']),
+        'instructions': len(fields['instructions']),
+    }
+
+def record(domain: str, url: str) -> Dict[str, Any]:
+    # Plain full-body fetch: fetch_html may stop streaming once the JSON-LD arrives
+    response = get_cloudscraper(url).get(url, headers=get_random_headers(), timeout=30)
+    response.raise_for_status()
+    html_text = decode_response_content(response)
+    if looks_blocked(html_text):
+        raise RuntimeError('blocked page')
+
+    data = html_text.encode('utf-8')
+    filename = f'{domain}.html.gz'
+    with gzip.open(os.path.join(CORPUS_DIR, filename), 'wb', compresslevel=9) as f:
+        f.write(data)
+    return {
+        'domain': domain,
+        'url': url,
+        'file': filename,
+        'bytes': len(data),
+        'sha256': hashlib.sha256(data).hexdigest(),
+        'recorded_at': datetime.date.today().isoformat(),
+        'expected': expected_recipe(html_text),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', help='comma-separated domains to (re-)record')
+    parser.add_argument('--force', action='store_true', help='re-record pages that are already in the corpus')
+    args = parser.parse_args()
+
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    only = set(args.only.split(',')) if args.only else None
+    entries = {entry['domain']: entry for entry in load_manifest()['pages']}
+
+    for domain, url in LIVE_TOP_25_RECIPE_URLS:
+        if only is not None and domain not in only:
+            continue
+        if domain in entries and not args.force and not only:
+            print(f"{domain:<30} kept")
+            continue
+        try:
+            entries[domain] = record(domain, url)
+        except Exception as e:
+            print(f"{domain:<30} FAILED: {e}")
+            continue
+        entry = entries[domain]
+        print(f"{domain:<30} {entry['bytes']:>9} bytes  expected={entry['expected']}")
+
+    order = [domain for domain, _ in LIVE_TOP_25_RECIPE_URLS]
+    pages = sorted(entries.values(), key=lambda entry: order.index(entry['domain']) if entry['domain'] in order else len(order))
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump({'pages': pages}, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+if __name__ == '__main__':
+    main()
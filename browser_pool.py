@@ -0,0 +1,285 @@
+# browser_pool.py
+"""
+Bounded pool of warm headless Chrome instances for the Selenium scrape paths.
+
+Starting Chrome costs seconds and hundreds of MB, so browsers are checked
+out, reused tab-and-all for the next page, and checked back in. A browser is
+recycled (quit and replaced on demand) after SELENIUM_MAX_PAGES pages, when
+its process tree grows past SELENIUM_MAX_RSS_MB, or after a WebDriver error.
+
+Pages are considered loaded as soon as a JSON-LD script or an ingredients
+container is present, instead of sleeping a fixed time.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import urllib3
+
+from rate_limit import rate_limiter
+
+try:
+    import undetected_chromedriver as uc
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    SELENIUM_AVAILABLE = True
+except ImportError:
+    SELENIUM_AVAILABLE = False
+    WebDriverException = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+SELENIUM_POOL_SIZE = int(os.getenv('SELENIUM_POOL_SIZE', '2'))
+# Recycle a browser after this many pages
+SELENIUM_MAX_PAGES = int(os.getenv('SELENIUM_MAX_PAGES', '50'))
+# Recycle a browser whose process tree exceeds this RSS (needs psutil)
+SELENIUM_MAX_RSS_MB = float(os.getenv('SELENIUM_MAX_RSS_MB', '800'))
+# Longest wait for a free browser before giving up
+SELENIUM_CHECKOUT_TIMEOUT = float(os.getenv('SELENIUM_CHECKOUT_TIMEOUT', '30'))
+# Longest wait for recipe content to appear after navigation
+SELENIUM_READY_TIMEOUT = float(os.getenv('SELENIUM_READY_TIMEOUT', '10'))
+
+# Any of these present means the recipe content has rendered
+READY_SELECTORS = (
+    'script[type="application/ld+json"]',
+    '[class*="ingredient"]',
+    '[id*="ingredient"]',
+    '.wprm-recipe-ingredients',
+    '.tasty-recipes-ingredients',
+)
+
+# Errors that mean the browser itself is broken (a lost chromedriver connection
+# surfaces as a urllib3 or connection error). Anything else leaves it reusable.
+BROWSER_ERRORS = tuple(
+    error for error in (WebDriverException, urllib3.exceptions.HTTPError, ConnectionError) if error is not None
+)
+
+class BrowserPoolExhausted(Exception):
+    """Raised when no browser becomes free within the checkout timeout."""
+
+def create_chrome() -> Any:
+    """Start a headless undetected Chrome."""
+    if not SELENIUM_AVAILABLE:
+        raise RuntimeError("Selenium dependencies not available")
+    options = uc.ChromeOptions()
+    options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-blink-features=AutomationControlled')
+    return uc.Chrome(options=options)
+
+def browser_rss_mb(driver: Any) -> Optional[float]:
+    """Resident memory of the browser and its child processes, or None if unknown."""
+    pid = getattr(driver, 'browser_pid', None)
+    if psutil is None or not pid:
+        return None
+    try:
+        process = psutil.Process(pid)
+        processes = [process] + process.children(recursive=True)
+        total = 0
+        for proc in processes:
+            try:
+                total += proc.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+    except psutil.Error:
+        return None
+
+class PooledBrowser:
+    """A pooled driver plus the bookkeeping used to decide when to recycle it."""
+
+    def __init__(self, driver: Any, created_at: float):
+        self.driver = driver
+        self.created_at = created_at
+        self.pages = 0
+
+class BrowserPool:
+    """Checkout/checkin pool of at most ``max_size`` live browsers."""
+
+    def __init__(
+        self,
+        factory: Callable[[], Any] = create_chrome,
+        max_size: int = SELENIUM_POOL_SIZE,
+        max_pages: int = SELENIUM_MAX_PAGES,
+        max_rss_mb: float = SELENIUM_MAX_RSS_MB,
+        memory_probe: Callable[[Any], Optional[float]] = browser_rss_mb,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.factory = factory
+        self.max_size = max(1, max_size)
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.memory_probe = memory_probe
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._idle: List[PooledBrowser] = []
+        self._live = 0
+        self._closed = False
+        self.counters = {'created': 0, 'reused': 0, 'recycled': 0, 'waits': 0}
+
+    def checkout(self, timeout: float = SELENIUM_CHECKOUT_TIMEOUT) -> PooledBrowser:
+        """Take an idle browser, start one if under the limit, or wait for one."""
+        deadline = self._clock() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Browser pool is closed")
+                if self._idle:
+                    self.counters['reused'] += 1
+                    return self._idle.pop()
+                if self._live < self.max_size:
+                    self._live += 1
+                    break
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    raise BrowserPoolExhausted(f"No browser free after {timeout:.0f}s")
+                self.counters['waits'] += 1
+                self._cond.wait(remaining)
+
+        # Start Chrome outside the lock; it takes seconds
+        try:
+            browser = PooledBrowser(self.factory(), self._clock())
+        except Exception:
+            with self._cond:
+                self._live -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.counters['created'] += 1
+        return browser
+
+    def checkin(self, browser: PooledBrowser, healthy: bool = True) -> None:
+        """Return a browser after use, recycling it when worn out or broken."""
+        browser.pages += 1
+        reason = None
+        if not healthy:
+            reason = 'error'
+        elif self.max_pages and browser.pages >= self.max_pages:
+            reason = f'{browser.pages} pages'
+        else:
+            rss = self.memory_probe(browser.driver)
+            if rss is not None and rss > self.max_rss_mb:
+                reason = f'{rss:.0f} MB resident'
+
+        if reason is None and not self._reset_tab(browser):
+            reason = 'tab reset failed'
+
+        if reason is not None:
+            logger.info(f"Recycling browser ({reason})")
+            self._quit(browser)
+            with self._cond:
+                self._live -= 1
+                self.counters['recycled'] += 1
+                self._cond.notify()
+            return
+
+        with self._cond:
+            if self._closed:
+                self._live -= 1
+                self._quit(browser)
+                return
+            self._idle.append(browser)
+            self._cond.notify()
+
+    @contextmanager
+    def browser(self, timeout: float = SELENIUM_CHECKOUT_TIMEOUT) -> Iterator[Any]:
+        """Context manager yielding a driver; WebDriver errors recycle the browser."""
+        pooled = self.checkout(timeout)
+        healthy = True
+        try:
+            yield pooled.driver
+        except BROWSER_ERRORS:
+            healthy = False
+            raise
+        finally:
+            self.checkin(pooled, healthy=healthy)
+
+    def _reset_tab(self, browser: PooledBrowser) -> bool:
+        """Close stray tabs and blank the main one so the next page starts clean."""
+        driver = browser.driver
+        try:
+            handles = list(driver.window_handles)
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.get('about:blank')
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to reset browser tab: {e}")
+            return False
+
+    @staticmethod
+    def _quit(browser: PooledBrowser) -> None:
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error quitting browser: {e}")
+
+    def close(self) -> None:
+        """Quit every idle browser; busy ones are quit when checked in."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._live -= len(idle)
+            self._cond.notify_all()
+        for browser in idle:
+            self._quit(browser)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return dict(self.counters, live=self._live, idle=len(self._idle), max_size=self.max_size)
+
+def wait_until_ready(driver: Any, selectors: Iterable[str] = (), timeout: float = SELENIUM_READY_TIMEOUT) -> bool:
+    """
+    Wait until JSON-LD or an ingredients container is in the DOM.
+    Returns False when the timeout passes first; the caller still gets the page.
+    """
+    css = ', '.join(dict.fromkeys(list(READY_SELECTORS) + list(selectors)))
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.2).until(
+            lambda d: d.find_elements(By.CSS_SELECTOR, css)
+        )
+        return True
+    except TimeoutException:
+        logger.info(f"No recipe content after {timeout:.0f}s, using the page as rendered")
+        return False
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+def get_browser_pool() -> BrowserPool:
+    """The process-wide pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            atexit.register(_pool.close)
+        return _pool
+
+def fetch_rendered_html(
+    url: str,
+    ready_selectors: Iterable[str] = (),
+    ready_timeout: float = SELENIUM_READY_TIMEOUT,
+    max_wait: Optional[float] = None,
+) -> str:
+    """Load a URL in a pooled browser and return the HTML once recipe content is present."""
+    if not SELENIUM_AVAILABLE:
+        raise RuntimeError("Selenium dependencies not available")
+    # Wait for the domain's budget before taking a browser others could be using
+    rate_limiter.acquire(url, max_wait=max_wait)
+    with get_browser_pool().browser() as driver:
+        driver.get(url)
+        wait_until_ready(driver, ready_selectors, ready_timeout)
+        return driver.page_source
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# bulk_ingest.py
+"""
+Bulk recipe ingestion from URL lists and sitemaps.
+
+Each URL goes through the same fetch-once pipeline as /extract-recipe and the
+same OpenAI structuring step, then structured recipes are written to the
+Recipe table in batches. Blocking work runs in a thread pool driven by
+asyncio, bounded by a global and a per-domain concurrency limit (the per-domain
+rate limiter in rate_limit.py still applies on top).
+
+The rate limiter, not the concurrency, sets the pace of a single-site import:
+at the default SCRAPE_DOMAIN_RATE of 0.5 requests/second that is about 30
+pages a minute per domain. Only lists spread over many domains reach hundreds
+per minute. For a site that allows faster crawling, --domain-rate raises the
+limit for this run; a robots.txt Crawl-delay still caps it.
+
+Every finished URL is appended to a JSONL checkpoint, so an interrupted run
+can be restarted with the same command and only does the remaining work.
+
+Usage:
+    python bulk_ingest.py urls.txt [more.txt ...]
+    python bulk_ingest.py --sitemap https://example.com/sitemap.xml
+    python bulk_ingest.py --domain-rate 2 own-site-urls.txt
+    cat urls.txt | python bulk_ingest.py -
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from xml.etree import ElementTree
+
+from http_session import domain_key, get_requests_session
+from local_store import default_store_path
+from rate_limit import rate_limiter
+from recipe_pipeline import extract_recipe
+
+logger = logging.getLogger(__name__)
+
+BULK_CONCURRENCY = int(os.getenv('BULK_CONCURRENCY', '32'))
+BULK_PER_DOMAIN = int(os.getenv('BULK_PER_DOMAIN', '2'))
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', '50'))
+BULK_CHECKPOINT_PATH = os.getenv('BULK_CHECKPOINT_PATH', default_store_path('bulk_ingest.jsonl'))
+# Times a URL is requeued after its domain was rate limited
+RATE_LIMIT_RETRIES = 3
+# Seconds a partial batch waits before being written anyway
+FLUSH_INTERVAL = 5.0
+MAX_SITEMAP_DEPTH = 3
+
+def is_complete_recipe(structured: Dict[str, Any]) -> bool:
+    """The same acceptance check /extract-recipe applies before saving."""
+    return bool(structured.get('title') and structured.get('ingredients') and structured.get('instructions'))
+
+def read_url_file(path: str) -> List[str]:
+    """Read URLs one per line ('-' for stdin), skipping blanks and # comments."""
+    handle = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        return [line.strip() for line in handle if line.strip() and not line.strip().startswith('#')]
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+def parse_sitemap(xml_bytes: bytes) -> tuple[List[str], List[str]]:
+    """Return (page_urls, child_sitemap_urls) from a sitemap or sitemap index."""
+    if xml_bytes[:2] == b'\x1f\x8b':
+        xml_bytes = gzip.decompress(xml_bytes)
+    root = ElementTree.fromstring(xml_bytes)
+    locs = [el.text.strip() for el in root.iter() if el.tag.rsplit('}', 1)[-1] == 'loc' and el.text]
+    if root.tag.rsplit('}', 1)[-1] == 'sitemapindex':
+        return [], locs
+    return locs, []
+
+def fetch_sitemap_urls(url: str, depth: int = 0) -> List[str]:
+    """Fetch a sitemap (following sitemap indexes) and return its page URLs."""
+    rate_limiter.acquire(url)
+    response = get_requests_session(url).get(url, timeout=30)
+    response.raise_for_status()
+    pages, children = parse_sitemap(response.content)
+    if depth < MAX_SITEMAP_DEPTH:
+        for child in children:
+            try:
+                pages.extend(fetch_sitemap_urls(child, depth + 1))
+            except Exception as e:
+                logger.warning(f"Skipping sitemap {child}: {e}")
+    return pages
+
+def dedupe(urls: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(url.strip() for url in urls if url.strip()))
+
+class Checkpoint:
+    """Append-only JSONL log of finished URLs."""
+
+    def __init__(self, path: str = BULK_CHECKPOINT_PATH):
+        self.path = path
+        self.status: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by an interrupted run
+                    self.status[entry['url']] = entry['status']
+
+    def is_done(self, url: str, retry_failed: bool = False) -> bool:
+        status = self.status.get(url)
+        if status is None:
+            return False
+        return not (retry_failed and status == 'failed')
+
+    def record(self, entries: List[Dict[str, Any]]) -> None:
+        if not entries:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                self.status[entry['url']] = entry['status']
+
+class IngestStats:
+    """Counters behind the progress line."""
+
+    def __init__(self, total: int, clock: Callable[[], float] = time.monotonic):
+        self.total = total
+        self.counts: Dict[str, int] = defaultdict(int)
+        self._clock = clock
+        self.started = clock()
+
+    @property
+    def done(self) -> int:
+        return sum(self.counts.values())
+
+    def per_minute(self) -> float:
+        elapsed = self._clock() - self.started
+        return self.done / elapsed * 60 if elapsed > 0 else 0.0
+
+    def line(self) -> str:
+        rate = self.per_minute()
+        remaining = self.total - self.done
+        eta = f"{remaining / rate:.1f} min" if rate > 0 else "?"
+        counts = ' '.join(f"{status}={count}" for status, count in sorted(self.counts.items()))
+        return f"[{self.done}/{self.total}] {counts} | {rate:.0f} pages/min | ETA {eta}"
+
+def structure_recipe_text(raw_text: str, structured_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Structure a recipe like the web app: locally from complete JSON-LD, otherwise with the OpenAI prompt."""
+    from recipe_structuring import structure_recipe
+    return structure_recipe(raw_text, structured_data)
+
+def save_recipes_to_db(recipes: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Insert structured recipes in one transaction, skipping URLs already stored.
+    Returns {url: {'status': 'ok' | 'exists', 'id': ...}}.
+    """
+    from sqlalchemy.exc import IntegrityError
+    from app import app
+    from models import Recipe, db
+
+    results: Dict[str, Dict[str, Any]] = {}
+    with app.app_context():
+        urls = [recipe['url'] for recipe in recipes]
+        existing = dict(db.session.query(Recipe.url, Recipe.id).filter(Recipe.url.in_(urls)).all())
+        rows = []
+        for recipe in recipes:
+            if recipe['url'] in existing:
+                results[recipe['url']] = {'status': 'exists', 'id': existing[recipe['url']]}
+                continue
+            rows.append(Recipe(
+                url=recipe['url'],
+                title=recipe.get('title'),
+                introduction=recipe.get('introduction'),
+                ingredients=recipe.get('ingredients'),
+                instructions=recipe.get('instructions'),
+            ))
+        try:
+            db.session.add_all(rows)
+            db.session.commit()
+            for row in rows:
+                results[row.url] = {'status': 'ok', 'id': row.id}
+        except IntegrityError:
+            # Another writer inserted some of these meanwhile; fall back to one at a time
+            db.session.rollback()
+            for row in rows:
+                try:
+                    db.session.add(row)
+                    db.session.commit()
+                    results[row.url] = {'status': 'ok', 'id': row.id}
+                except IntegrityError:
+                    db.session.rollback()
+                    results[row.url] = {'status': 'exists', 'id': None}
+    return results
+
+def existing_recipe_urls(urls: List[str], chunk_size: int = 500) -> set:
+    """URLs already in the Recipe table."""
+    from app import app
+    from models import Recipe, db
+
+    found = set()
+    with app.app_context():
+        for start in range(0, len(urls), chunk_size):
+            chunk = urls[start:start + chunk_size]
+            found.update(url for (url,) in db.session.query(Recipe.url).filter(Recipe.url.in_(chunk)))
+    return found
+
+class BulkIngester:
+    """Runs extraction and structuring for many URLs with bounded concurrency."""
+
+    def __init__(
+        self,
+        extract: Callable[[str], Any] = extract_recipe,
+        structure: Callable[[str, Optional[Dict[str, Any]]], Dict[str, Any]] = structure_recipe_text,
+        save_batch: Callable[[List[Dict[str, Any]]], Dict[str, Dict[str, Any]]] = save_recipes_to_db,
+        known_urls: Optional[Callable[[List[str]], set]] = existing_recipe_urls,
+        checkpoint: Optional[Checkpoint] = None,
+        concurrency: int = BULK_CONCURRENCY,
+        per_domain: int = BULK_PER_DOMAIN,
+        batch_size: int = BULK_BATCH_SIZE,
+        retry_failed: bool = False,
+        progress_interval: float = 10.0,
+        report: Callable[[str], None] = print,
+    ):
+        self.extract = extract
+        self.structure = structure
+        self.save_batch = save_batch
+        self.known_urls = known_urls
+        self.checkpoint = checkpoint if checkpoint is not None else Checkpoint()
+        self.concurrency = max(1, concurrency)
+        self.per_domain = max(1, per_domain)
+        self.batch_size = max(1, batch_size)
+        self.retry_failed = retry_failed
+        self.progress_interval = progress_interval
+        self.report = report
+        self.stats: Optional[IngestStats] = None
+
+    def process_url(self, url: str) -> Dict[str, Any]:
+        """Extract and structure one URL. Runs in a worker thread."""
+        started = time.monotonic()
+        extraction = self.extract(url)
+        outcome: Dict[str, Any] = {'url': url, 'transport': extraction.transport, 'strategy': extraction.strategy}
+        if not extraction.success:
+            outcome.update(status='failed', error=extraction.error, retry_after=extraction.retry_after)
+        else:
+            structured = self.structure(extraction.to_text(), extraction.structured_data)
+            if is_complete_recipe(structured):
+                outcome.update(status='ok', recipe=dict(structured, url=url))
+            else:
+                outcome.update(status='failed', error='Failed to parse recipe structure properly')
+        outcome['elapsed'] = round(time.monotonic() - started, 3)
+        return outcome
+
+    def pending_urls(self, urls: List[str]) -> List[str]:
+        """Drop URLs finished in an earlier run or already stored."""
+        urls = [url for url in dedupe(urls) if not self.checkpoint.is_done(url, self.retry_failed)]
+        if self.known_urls and urls:
+            stored = self.known_urls(urls)
+            if stored:
+                self.checkpoint.record([{'url': url, 'status': 'exists'} for url in urls if url in stored])
+                urls = [url for url in urls if url not in stored]
+        return urls
+
+    async def _work(self, url: str, queue: asyncio.Queue, global_slots: asyncio.Semaphore,
+                    domain_slots: Dict[str, asyncio.Semaphore]) -> None:
+        domain = domain_key(url)
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            async with global_slots:
+                async with domain_slots[domain]:
+                    try:
+                        outcome = await asyncio.to_thread(self.process_url, url)
+                    except Exception as e:
+                        logger.exception(f"Ingest failed for {url}")
+                        outcome = {'url': url, 'status': 'failed', 'error': str(e)}
+            retry_after = outcome.pop('retry_after', None)
+            if retry_after and attempt < RATE_LIMIT_RETRIES:
+                # Give the slot back while the domain cools down
+                await asyncio.sleep(retry_after)
+                continue
+            break
+        await queue.put(outcome)
+
+    async def _write(self, queue: asyncio.Queue, expected: int) -> None:
+        """Collect outcomes, writing successful recipes in batches and failures right away."""
+        batch: List[Dict[str, Any]] = []
+        received = 0
+        while received < expected:
+            try:
+                outcome = await asyncio.wait_for(queue.get(), timeout=FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                # Slow pages should not hold finished recipes back indefinitely
+                await self._flush(batch)
+                batch = []
+                continue
+            received += 1
+            if outcome['status'] != 'ok':
+                self._record([outcome])
+                continue
+            batch.append(outcome)
+            if len(batch) >= self.batch_size:
+                await self._flush(batch)
+                batch = []
+        await self._flush(batch)
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        try:
+            saved = await asyncio.to_thread(self.save_batch, [outcome['recipe'] for outcome in batch])
+        except Exception as e:
+            logger.exception("Writing a batch of recipes failed")
+            saved = {outcome['url']: {'status': 'failed', 'error': f'database: {e}'} for outcome in batch}
+        entries = []
+        for outcome in batch:
+            entry = {key: value for key, value in outcome.items() if key != 'recipe'}
+            entry.update(saved.get(outcome['url'], {'status': 'failed', 'error': 'not saved'}))
+            entries.append(entry)
+        self._record(entries)
+
+    def _record(self, entries: List[Dict[str, Any]]) -> None:
+        self.checkpoint.record(entries)
+        for entry in entries:
+            self.stats.counts[entry['status']] += 1
+
+    async def _report_progress(self, finished: asyncio.Event) -> None:
+        while not finished.is_set():
+            try:
+                await asyncio.wait_for(finished.wait(), timeout=self.progress_interval)
+            except asyncio.TimeoutError:
+                self.report(self.stats.line())
+
+    async def run(self, urls: List[str]) -> IngestStats:
+        pending = self.pending_urls(urls)
+        self.stats = IngestStats(len(pending))
+        if not pending:
+            return self.stats
+
+        loop = asyncio.get_running_loop()
+        # asyncio.to_thread uses the default executor; size it to the concurrency limit
+        executor = ThreadPoolExecutor(max_workers=self.concurrency + 1, thread_name_prefix='ingest')
+        loop.set_default_executor(executor)
+
+        queue: asyncio.Queue = asyncio.Queue()
+        global_slots = asyncio.Semaphore(self.concurrency)
+        domain_slots: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(self.per_domain))
+        finished = asyncio.Event()
+        progress = asyncio.create_task(self._report_progress(finished))
+        writer = asyncio.create_task(self._write(queue, len(pending)))
+        try:
+            await asyncio.gather(*(self._work(url, queue, global_slots, domain_slots) for url in pending))
+            await writer
+        finally:
+            finished.set()
+            await progress
+            executor.shutdown(wait=False)
+        return self.stats
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='*', help="files with one URL per line ('-' for stdin)")
+    parser.add_argument('--sitemap', action='append', default=[], help='sitemap or sitemap index URL (repeatable)')
+    parser.add_argument('--concurrency', type=int, default=BULK_CONCURRENCY, help='pages processed at once')
+    parser.add_argument('--per-domain', type=int, default=BULK_PER_DOMAIN, help='pages processed at once per domain')
+    parser.add_argument('--domain-rate', type=float,
+                        help=f'requests/second per domain for this run (default {rate_limiter.rate:g})')
+    parser.add_argument('--batch-size', type=int, default=BULK_BATCH_SIZE, help='recipes per database commit')
+    parser.add_argument('--checkpoint', default=BULK_CHECKPOINT_PATH, help='JSONL file recording finished URLs')
+    parser.add_argument('--retry-failed', action='store_true', help='retry URLs the checkpoint marks as failed')
+    parser.add_argument('--limit', type=int, help='only process the first N pending URLs')
+    parser.add_argument('--progress-interval', type=float, default=10.0, help='seconds between progress lines')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.domain_rate:
+        rate_limiter.set_rate(args.domain_rate)
+
+    urls: List[str] = []
+    for path in args.inputs:
+        urls.extend(read_url_file(path))
+    for sitemap in args.sitemap:
+        found = fetch_sitemap_urls(sitemap)
+        print(f"📄 {sitemap}: {len(found)} URLs")
+        urls.extend(found)
+    if not urls:
+        parser.error('no URLs given')
+
+    ingester = BulkIngester(
+        checkpoint=Checkpoint(args.checkpoint),
+        concurrency=args.concurrency,
+        per_domain=args.per_domain,
+        batch_size=args.batch_size,
+        retry_failed=args.retry_failed,
+        progress_interval=args.progress_interval,
+    )
+    if args.limit:
+        pending = ingester.pending_urls(urls)[:args.limit]
+        ingester.known_urls = None
+        urls = pending
+
+    print(f"🔄 Ingesting {len(dedupe(urls))} URLs (concurrency {args.concurrency}, {args.per_domain} per domain, "
+          f"{rate_limiter.rate:g} requests/s per domain)")
+    stats = asyncio.run(ingester.run(urls))
+    print(f"✅ Done. {stats.line()}")
+    print(f"📝 Checkpoint: {args.checkpoint}")
+
+if __name__ == '__main__':
+    main()
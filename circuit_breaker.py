@@ -0,0 +1,295 @@
+# circuit_breaker.py
+"""
+Fail-fast protection for URLs and domains that keep failing.
+
+Two layers sit in front of every scrape:
+
+* A negative cache remembers URLs that just failed, so a user re-submitting a
+  page with no recipe (or one we were blocked on) gets the answer instantly.
+* A per-domain circuit breaker counts consecutive blocking failures (401/403/
+  429/503 responses, bot-challenge pages) and server or network errors.
+  Other 4xx responses only mean that one URL is bad, so they go to the
+  negative cache and leave the domain alone.
+  Once tripped it is *open*: requests fail immediately with CircuitOpenError.
+  After a cool-down it goes *half-open* and lets a single probe through; a
+  success closes it again, a failure re-opens it for twice as long. A probe
+  that proves nothing either way (a bad URL, or our own rate limit stopping
+  it) frees the slot for the next request.
+
+Gunicorn runs one worker, so the state lives in process like rate_limit.py.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from html_cache import normalize_url
+from http_session import domain_key
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failures (of any kind) that open a domain's circuit
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '3'))
+# Consecutive blocking failures that open it sooner
+CIRCUIT_BLOCK_THRESHOLD = int(os.getenv('CIRCUIT_BLOCK_THRESHOLD', '2'))
+CIRCUIT_OPEN_SECONDS = float(os.getenv('CIRCUIT_OPEN_SECONDS', '300'))
+CIRCUIT_MAX_OPEN_SECONDS = float(os.getenv('CIRCUIT_MAX_OPEN_SECONDS', '3600'))
+# A half-open probe that never reports back frees the slot after this long
+CIRCUIT_PROBE_TIMEOUT = float(os.getenv('CIRCUIT_PROBE_TIMEOUT', '120'))
+NEGATIVE_CACHE_TTL = float(os.getenv('NEGATIVE_CACHE_TTL', '600'))
+NEGATIVE_CACHE_MAX_ENTRIES = int(os.getenv('NEGATIVE_CACHE_MAX_ENTRIES', '5000'))
+
+# HTTP statuses that mean the site is refusing us rather than the page being bad
+BLOCKING_STATUSES = {401, 403, 429, 503}
+
+SCRAPE_FAILURE_MARKERS = (
+    "error scraping recipe:",
+    "failed to extract recipe content",
+    "no recipe content found",
+    "access denied",
+    "cloudflare",
+)
+# Text only found on bot-challenge and block pages; merely mentioning Cloudflare or
+# a captcha (every reCAPTCHA comment form does) is not enough
+CHALLENGE_PAGE_MARKERS = (
+    "just a moment...",
+    "cf-challenge",
+    "cf_chl_",
+    "you have been blocked",
+    "attention required! | cloudflare",
+)
+BLOCKING_MARKERS = ("access denied", "blocked page") + CHALLENGE_PAGE_MARKERS
+NO_RECIPE_MARKERS = ("no recipe content found", "failed to extract recipe content", "failed to parse recipe")
+_STATUS_RE = re.compile(r'\b(\d{3}) (?:client|server) error', re.I)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+class CircuitOpenError(Exception):
+    """Raised instead of scraping a URL that recently failed or a domain whose circuit is open."""
+
+    def __init__(self, url: str, message: str, retry_in: float):
+        self.url = url
+        self.retry_in = retry_in
+        super().__init__(message)
+
+def is_scrape_failure(raw_text: str) -> bool:
+    """
+    Detect scraper failure payloads so we do not send them into LLM parsing.
+    """
+    if not raw_text:
+        return True
+
+    normalized = raw_text.strip().lower()
+    return any(marker in normalized for marker in SCRAPE_FAILURE_MARKERS)
+
+def classify_failure(text: Optional[str] = None, status: Optional[int] = None) -> str:
+    """
+    Return 'blocked', 'no_recipe', 'bad_url' (a 4xx that is not a block, such as
+    404) or 'error' for a failed scrape.
+    """
+    if status is None and text:
+        match = _STATUS_RE.search(text)
+        status = int(match.group(1)) if match else None
+    if status in BLOCKING_STATUSES:
+        return 'blocked'
+    if status is not None and 400 <= status < 500:
+        return 'bad_url'
+    normalized = (text or '').lower()
+    if any(marker in normalized for marker in BLOCKING_MARKERS):
+        return 'blocked'
+    if status is None and any(marker in normalized for marker in NO_RECIPE_MARKERS):
+        return 'no_recipe'
+    return 'error'
+
+class NegativeCache:
+    """Bounded URL -> (reason, expiry) map of recent failures."""
+
+    def __init__(self, ttl: float = NEGATIVE_CACHE_TTL, max_entries: int = NEGATIVE_CACHE_MAX_ENTRIES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self.hits = 0
+
+    def add(self, url: str, reason: str, ttl: Optional[float] = None) -> None:
+        if self.ttl <= 0:
+            return
+        key = normalize_url(url)
+        with self._lock:
+            self._entries[key] = (reason, self._clock() + (ttl if ttl is not None else self.ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, url: str) -> Optional[tuple]:
+        """(reason, seconds_left) for a URL that failed recently, else None."""
+        key = normalize_url(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            reason, expires_at = entry
+            remaining = expires_at - self._clock()
+            if remaining <= 0:
+                del self._entries[key]
+                return None
+            self.hits += 1
+            return reason, remaining
+
+    def discard(self, url: str) -> None:
+        with self._lock:
+            self._entries.pop(normalize_url(url), None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits}
+
+class _DomainCircuit:
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.blocks = 0
+        self.opened_at = 0.0
+        self.open_for = 0.0
+        self.probe_started: Optional[float] = None
+
+class CircuitBreaker:
+    """Per-domain closed/open/half-open breaker."""
+
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        block_threshold: int = CIRCUIT_BLOCK_THRESHOLD,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+        max_open_seconds: float = CIRCUIT_MAX_OPEN_SECONDS,
+        probe_timeout: float = CIRCUIT_PROBE_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.block_threshold = block_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.probe_timeout = probe_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._circuits: Dict[str, _DomainCircuit] = {}
+        self.counters = {'rejected': 0, 'opened': 0, 'probes': 0}
+
+    def before_request(self, url: str) -> None:
+        """Raise CircuitOpenError unless the URL's domain may be scraped now."""
+        key = domain_key(url)
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit is None or circuit.state == CLOSED:
+                return
+            now = self._clock()
+            if circuit.state == OPEN:
+                remaining = circuit.opened_at + circuit.open_for - now
+                if remaining > 0:
+                    self.counters['rejected'] += 1
+                    raise CircuitOpenError(url, f"{key} is failing or blocking us; not retrying for {remaining:.0f}s", remaining)
+                circuit.state = HALF_OPEN
+                circuit.probe_started = None
+            # Half-open: one probe at a time
+            if circuit.probe_started is not None and now - circuit.probe_started < self.probe_timeout:
+                self.counters['rejected'] += 1
+                raise CircuitOpenError(url, f"{key} is being re-checked after repeated failures; try again shortly", 5.0)
+            circuit.probe_started = now
+            self.counters['probes'] += 1
+            logger.info(f"Circuit for {key} half-open, sending a probe")
+
+    def record_success(self, url: str) -> None:
+        key = domain_key(url)
+        with self._lock:
+            circuit = self._circuits.pop(key, None)
+        if circuit is not None and circuit.state != CLOSED:
+            logger.info(f"Circuit for {key} closed")
+
+    def release_probe(self, url: str) -> None:
+        """Let the next request probe a half-open domain; the last probe said nothing about it."""
+        with self._lock:
+            circuit = self._circuits.get(domain_key(url))
+            if circuit is not None and circuit.state == HALF_OPEN:
+                circuit.probe_started = None
+
+    def record_failure(self, url: str, blocked: bool = False) -> None:
+        key = domain_key(url)
+        with self._lock:
+            circuit = self._circuits.setdefault(key, _DomainCircuit())
+            now = self._clock()
+            if circuit.state == HALF_OPEN:
+                self._open(key, circuit, now, min(max(circuit.open_for, self.open_seconds) * 2, self.max_open_seconds))
+                return
+            circuit.failures += 1
+            circuit.blocks = circuit.blocks + 1 if blocked else 0
+            if circuit.failures >= self.failure_threshold or circuit.blocks >= self.block_threshold:
+                self._open(key, circuit, now, self.open_seconds)
+
+    def _open(self, key: str, circuit: _DomainCircuit, now: float, duration: float) -> None:
+        circuit.state = OPEN
+        circuit.opened_at = now
+        circuit.open_for = duration
+        circuit.probe_started = None
+        self.counters['opened'] += 1
+        logger.warning(f"Circuit for {key} opened for {duration:.0f}s")
+
+    def state(self, url: str) -> str:
+        with self._lock:
+            circuit = self._circuits.get(domain_key(url))
+            return circuit.state if circuit else CLOSED
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            open_domains = sorted(key for key, circuit in self._circuits.items() if circuit.state != CLOSED)
+            return dict(self.counters, open_domains=open_domains)
+
+negative_cache = NegativeCache()
+circuit_breaker = CircuitBreaker()
+
+def guard(url: str) -> None:
+    """Raise CircuitOpenError if the URL failed recently or its domain's circuit is open."""
+    cached = negative_cache.get(url)
+    if cached is not None:
+        reason, remaining = cached
+        raise CircuitOpenError(url, f"{reason} (recently failed; retry in {remaining:.0f}s)", remaining)
+    circuit_breaker.before_request(url)
+
+def record_result(url: str, failure: Optional[str] = None) -> None:
+    """
+    Feed a scrape's outcome back: None for success, otherwise the failure kind
+    from classify_failure, or 'rate_limited' when our own limiter stopped the
+    scrape. A page without a recipe still proves the domain works; a bad URL
+    or a scrape that never ran says nothing about the domain either way.
+    """
+    if failure is None:
+        negative_cache.discard(url)
+        circuit_breaker.record_success(url)
+        return
+    if failure == 'no_recipe':
+        negative_cache.add(url, "No recipe content found on this page")
+        circuit_breaker.record_success(url)
+        return
+    if failure == 'bad_url':
+        negative_cache.add(url, "This page could not be found")
+        circuit_breaker.release_probe(url)
+        return
+    if failure == 'rate_limited':
+        circuit_breaker.release_probe(url)
+        return
+    negative_cache.add(url, "Could not fetch this page", ttl=min(NEGATIVE_CACHE_TTL, CIRCUIT_OPEN_SECONDS))
+    circuit_breaker.record_failure(url, blocked=failure == 'blocked')
+
+def guarded_scrape(url: str, scrape: Callable[[], str]) -> str:
+    """Run a text-returning scraper behind the negative cache and circuit breaker."""
+    try:
+        guard(url)
+    except CircuitOpenError as e:
+        return f"Error scraping recipe: {e}"
+    text = scrape()
+    record_result(url, classify_failure(text) if is_scrape_failure(text) else None)
+    return text
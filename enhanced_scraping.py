@@ -6,6 +6,7 @@ This module provides more robust scraping capabilities for recipe websites.
 
 import requests
 from bs4 import BeautifulSoup
+import soupsieve as sv
 import time
 import json
 import re
@@ -14,22 +15,24 @@ import logging
 from typing import Optional, Dict, Any, List
 from urllib.parse import urlparse
 from fake_useragent import UserAgent
-import cloudscraper
 import brotli
 import gzip
 import io
-import os
+import threading
+from functools import partial
 
-# Try to import Selenium dependencies
-try:
-	import undetected_chromedriver as uc
-	from selenium.webdriver.common.by import By
-	from selenium.webdriver.support.ui import WebDriverWait
-	from selenium.webdriver.support import expected_conditions as EC
-	from selenium.webdriver.chrome.options import Options
-	SELENIUM_AVAILABLE = True
-except ImportError:
-	SELENIUM_AVAILABLE = False
+from browser_pool import SELENIUM_AVAILABLE, fetch_rendered_html
+from circuit_breaker import guarded_scrape
+from hedging import HEDGE_DEADLINE, SCRAPE_HEDGED, hedged_race, transport_stats
+from html_cache import html_cache
+from html_parsing import HTML_PARTIAL_PARSE, make_soup, partial_parsing_supported
+from http_session import get_cloudscraper, get_requests_session
+from rate_limit import rate_limiter
+import site_extractors
+from scrape import fetch_html, get_structured_data, get_structured_data_from_html, structured_recipe_fields
+
+# Selenium dependencies are optional
+if not SELENIUM_AVAILABLE:
 	logging.warning("Selenium dependencies not available")
 
 # Set up logging
@@ -40,15 +43,8 @@ class EnhancedRecipeScraper:
 	"""Enhanced recipe scraper with multiple fallback methods and site-specific parsers."""
 	
 	def __init__(self):
-		self.session = requests.Session()
-		self.scraper = cloudscraper.create_scraper(
-			browser={
-				'browser': 'chrome',
-				'platform': 'windows',
-				'mobile': False
-			},
-			delay=10
-		)
+		# HTTP sessions come from the process-wide pool in http_session, keyed by
+		# domain, so connections and challenge cookies survive across instances.
 		
 		# Rotate user agents
 		self.user_agents = [
@@ -58,59 +54,6 @@ class EnhancedRecipeScraper:
 			'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15',
 			'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
 		]
-		
-		# Site-specific configurations
-		self.site_configs = {
-			'allrecipes.com': {
-				'selectors': {
-					'title': ['h1.recipe-title', 'h1.recipe-header__title', 'h1'],
-					'ingredients': ['.ingredients-item-name', '.ingredients-list li', '.recipe-ingredients li'],
-					'instructions': ['.instructions li', '.recipe-directions li', '.directions li']
-				},
-				'wait_time': 2
-			},
-			'foodnetwork.com': {
-				'selectors': {
-					'title': ['h1.o-AssetTitle__a-Headline', 'h1.recipe-title', 'h1'],
-					'ingredients': ['.o-Ingredients__a-Ingredient', '.ingredients li', '.recipe-ingredients li'],
-					'instructions': ['.o-Method__m-Step', '.directions li', '.recipe-directions li']
-				},
-				'wait_time': 3
-			},
-			'epicurious.com': {
-				'selectors': {
-					'title': ['h1.recipe-title', 'h1.title', 'h1'],
-					'ingredients': ['.ingredients li', '.recipe-ingredients li'],
-					'instructions': ['.instructions li', '.recipe-directions li']
-				},
-				'wait_time': 2
-			},
-			'maangchi.com': {
-				'selectors': {
-					'title': ['h1.recipe-title', 'h1.entry-title', 'h1'],
-					'ingredients': ['.ingredients li', '.recipe-ingredients li', '.ingredients-list li'],
-					'instructions': ['.instructions li', '.recipe-directions li', '.directions li']
-				},
-				'wait_time': 2
-			},
-			'seriouseats.com': {
-				'selectors': {
-					'title': ['h1.recipe-title', 'h1.title', 'h1'],
-					'ingredients': ['.ingredients li', '.recipe-ingredients li'],
-					'instructions': ['.instructions li', '.recipe-directions li']
-				},
-				'wait_time': 2
-			}
-		}
-		# Add site-specific config for 10000recipe.com (Korean)
-		self.site_configs['10000recipe.com'] = {
-			'selectors': {
-				'title': ['h3.view2_tit', 'h1.recipe-title', 'h1'],
-				'ingredients': ['.ready_ingre3 li', '#divConfirmedMaterialArea li', '.cont_ingre li', '.ingre_list li', '.ingredient_list li'],
-				'instructions': ['.view_step .media .media-body', '.view_step .step_text', '.view_step li']
-			},
-			'wait_time': 2
-		}
 	
 	def get_random_headers(self, url: str) -> Dict[str, str]:
 		"""Generate random headers with referer."""
@@ -136,153 +79,47 @@ class EnhancedRecipeScraper:
 	
 	def get_site_config(self, url: str) -> Dict[str, Any]:
 		"""Get site-specific configuration based on domain."""
-		domain = urlparse(url).netloc.lower()
-		
-		# Remove www. prefix
-		if domain.startswith('www.'):
-			domain = domain[4:]
-		
-		# Find matching site config
-		for site_domain, config in self.site_configs.items():
-			if site_domain in domain:
-				return config
-		
-		# Default config
-		return {
-			'selectors': {
-				'title': ['h1.recipe-title', 'h1.title', 'h1'],
-				'ingredients': ['.ingredients li', '.recipe-ingredients li', '.ingredients-list li'],
-				'instructions': ['.instructions li', '.recipe-directions li', '.directions li']
-			},
-			'wait_time': 2
-		}
+		profile = site_extractors.lookup(url)
+		return {'name': profile.name, 'selectors': profile.selectors}
 	
-	def extract_with_selectors(self, soup: BeautifulSoup, selectors: List[str]) -> List[str]:
-		"""Extract content using multiple CSS selectors."""
+	def extract_with_selectors(self, soup: BeautifulSoup, selectors: List[Any]) -> List[str]:
+		"""Extract content using multiple CSS selectors (strings or precompiled soupsieve patterns)."""
 		for selector in selectors:
-			elements = soup.select(selector)
+			elements = sv.select(selector, soup)
 			if elements:
-				texts: List[str] = []
-				for elem in elements:
-					text = elem.get_text(" ", strip=True)
-					text = re.sub(r'\s*구매\s*$', '', text)
-					if text:
-						texts.append(text)
-				return texts
+				return self._element_texts(elements)
 		return []
 	
+	def _element_texts(self, elements: List[Any]) -> List[str]:
+		texts: List[str] = []
+		for elem in elements:
+			text = elem.get_text(" ", strip=True)
+			text = re.sub(r'\s*구매\s*$', '', text)
+			if text:
+				texts.append(text)
+		return texts
+	
 	def extract_structured_data(self, soup: BeautifulSoup) -> Optional[Dict[str, Any]]:
 		"""Extract structured data (JSON-LD) from the page."""
-		try:
-			# Look for JSON-LD scripts
-			scripts = soup.find_all('script', {'type': 'application/ld+json'})
-			
-			for script in scripts:
-				try:
-					if not script.string:
-						continue
-					data = json.loads(script.string)
-					
-					# Handle both single objects and arrays
-					if isinstance(data, list):
-						for item in data:
-							if isinstance(item, dict):
-								atype = item.get('@type')
-								if atype == 'Recipe' or (isinstance(atype, list) and 'Recipe' in atype):
-									return item
-								if '@graph' in item and isinstance(item['@graph'], list):
-									for g in item['@graph']:
-										if isinstance(g, dict):
-											gat = g.get('@type')
-											if gat == 'Recipe' or (isinstance(gat, list) and 'Recipe' in gat):
-												return g
-					elif isinstance(data, dict):
-						atype = data.get('@type')
-						if atype == 'Recipe' or (isinstance(atype, list) and 'Recipe' in atype):
-							return data
-						if '@graph' in data and isinstance(data['@graph'], list):
-							for g in data['@graph']:
-								if isinstance(g, dict):
-									gat = g.get('@type')
-									if gat == 'Recipe' or (isinstance(gat, list) and 'Recipe' in gat):
-										return g
-						
-				except json.JSONDecodeError:
-					continue
-			
-		except Exception as e:
-			logger.warning(f"Error parsing structured data: {str(e)}")
-		
-		return None
+		# Shares scrape.py's tolerant JSON-LD loader (broken escapes, @graph, nested payloads)
+		return get_structured_data(soup)
+	
+	def extract_structured_data_from_html(self, html: str) -> Optional[Dict[str, Any]]:
+		"""Find a complete JSON-LD Recipe in raw HTML without building a DOM."""
+		return get_structured_data_from_html(html)
 	
 	def parse_structured_recipe(self, data: Dict[str, Any]) -> Dict[str, Any]:
 		"""Parse structured recipe data into our format."""
-		recipe = {
-			'title': '',
-			'ingredients': [],
-			'instructions': [],
-			'description': ''
-		}
-		
-		# Extract title
-		if 'name' in data:
-			recipe['title'] = data['name']
-		
-		# Extract description
-		if 'description' in data:
-			recipe['description'] = data['description']
-		
-		# Extract ingredients
-		if 'recipeIngredient' in data:
-			recipe['ingredients'] = data['recipeIngredient']
-		
-		# Extract instructions
-		if 'recipeInstructions' in data:
-			instructions = data['recipeInstructions']
-			if isinstance(instructions, list):
-				for step in instructions:
-					if isinstance(step, dict) and 'text' in step:
-						recipe['instructions'].append(step['text'])
-					elif isinstance(step, str):
-						recipe['instructions'].append(step)
-		
-		return recipe
+		return structured_recipe_fields(data)
 	
 	def scrape_with_selenium(self, url: str) -> Optional[str]:
-		"""Scrape using Selenium with undetected-chromedriver."""
+		"""Scrape using a pooled undetected-chromedriver browser."""
 		if not SELENIUM_AVAILABLE:
 			return None
 		
 		try:
-			options = uc.ChromeOptions()
-			options.add_argument('--headless')
-			options.add_argument('--no-sandbox')
-			options.add_argument('--disable-dev-shm-usage')
-			options.add_argument('--disable-blink-features=AutomationControlled')
-			# Remove problematic experimental options for older Chrome versions
-			# options.add_experimental_option("excludeSwitches", ["enable-automation"])
-			# options.add_experimental_option('useAutomationExtension', False)
-			
-			driver = uc.Chrome(options=options)
-			# Remove problematic script execution for older Chrome versions
-			# driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-			
-			# Get site config for wait time
-			site_config = self.get_site_config(url)
-			wait_time = site_config.get('wait_time', 2)
-			
-			driver.get(url)
-			time.sleep(wait_time)  # Wait for content to load
-			
-			# Wait for body to be present
-			WebDriverWait(driver, 10).until(
-				EC.presence_of_element_located((By.TAG_NAME, "body"))
-			)
-			
-			html = driver.page_source
-			driver.quit()
-			
-			return html
+			# Ready as soon as JSON-LD or one of this site's ingredient selectors renders
+			return fetch_rendered_html(url, site_extractors.lookup(url).selectors['ingredients'])
 			
 		except Exception as e:
 			logger.error(f"Selenium scraping failed: {str(e)}")
@@ -293,13 +130,8 @@ class EnhancedRecipeScraper:
 		try:
 			headers = self.get_random_headers(url)
 			
-			# Add delay to respect rate limits
-			time.sleep(random.uniform(1, 3))
-			
-			response = self.scraper.get(url, headers=headers, timeout=30)
-			response.raise_for_status()
-			
-			return response.text
+			# Goes through the shared HTML cache and per-domain rate limiter
+			return fetch_html(url, get_cloudscraper(url), headers, timeout=30)
 			
 		except Exception as e:
 			logger.error(f"Cloudscraper failed: {str(e)}")
@@ -310,18 +142,24 @@ class EnhancedRecipeScraper:
 		try:
 			headers = self.get_random_headers(url)
 			
-			# Add delay to respect rate limits
-			time.sleep(random.uniform(1, 2))
-			
-			response = self.session.get(url, headers=headers, timeout=15)
-			response.raise_for_status()
-			
-			return response.text
+			# Goes through the shared HTML cache and per-domain rate limiter
+			return fetch_html(url, get_requests_session(url), headers, timeout=15)
 			
 		except Exception as e:
 			logger.error(f"Regular requests failed: {str(e)}")
 			return None
 	
+	def extract_with_site_selectors(self, soup: BeautifulSoup, url: str) -> Dict[str, Any]:
+		"""Extract the recipe using only the selectors configured for the URL's site."""
+		profile = site_extractors.lookup(url)
+		title = self._element_texts(profile.select(soup, 'title'))
+		return {
+			'title': title[0] if title else '',
+			'ingredients': self._element_texts(profile.select(soup, 'ingredients')),
+			'instructions': self._element_texts(profile.select(soup, 'instructions')),
+			'description': ''
+		}
+	
 	def extract_recipe_content(self, soup: BeautifulSoup, url: str) -> Dict[str, Any]:
 		"""Extract recipe content using multiple methods."""
 		# First try structured data
@@ -330,14 +168,11 @@ class EnhancedRecipeScraper:
 			logger.info("Found structured data")
 			return self.parse_structured_recipe(structured_data)
 		
-		# Get site-specific configuration
-		site_config = self.get_site_config(url)
-		selectors = site_config['selectors']
-		
 		# Extract using site-specific selectors
-		title = self.extract_with_selectors(soup, selectors['title'])
-		ingredients = self.extract_with_selectors(soup, selectors['ingredients'])
-		instructions = self.extract_with_selectors(soup, selectors['instructions'])
+		site_recipe = self.extract_with_site_selectors(soup, url)
+		title = [site_recipe['title']] if site_recipe['title'] else []
+		ingredients = site_recipe['ingredients']
+		instructions = site_recipe['instructions']
 		
 		# Fallback to general selectors if no content found
 		if not title:
@@ -356,50 +191,111 @@ class EnhancedRecipeScraper:
 			'description': ''
 		}
 	
-	def scrape_recipe(self, url: str, max_retries: int = 3) -> Dict[str, Any]:
-		"""Main scraping method with multiple fallback strategies."""
+	def extract_recipe_from_html(self, html: str, url: str) -> Dict[str, Any]:
+		"""Parse the page (recipe subtrees first, full document on a miss) and extract the recipe."""
+		extra_selectors = site_extractors.lookup(url).all_selectors()
+		passes = [True, False] if HTML_PARTIAL_PARSE and partial_parsing_supported() else [False]
+		
+		recipe: Dict[str, Any] = {}
+		for partial_pass in passes:
+			soup = make_soup(html, partial=partial_pass, extra_selectors=extra_selectors)
+			
+			# Remove unwanted elements
+			for element in soup.find_all(['script', 'style', 'iframe', 'noscript']):
+				element.decompose()
+			
+			recipe = self.extract_recipe_content(soup, url)
+			if not partial_pass or (recipe['ingredients'] and recipe['instructions']):
+				return recipe
+			logger.info("Partial parse missed recipe sections, parsing the full document")
+		return recipe
+	
+	def _recipe_from_html(self, html: str, url: str) -> Optional[Dict[str, Any]]:
+		"""Extract a recipe from fetched HTML, or None when it has no ingredients or instructions."""
+		# Fast path: a complete JSON-LD Recipe needs no DOM at all
+		structured_data = self.extract_structured_data_from_html(html)
+		if structured_data:
+			recipe = self.parse_structured_recipe(structured_data)
+			if recipe['ingredients'] or recipe['instructions']:
+				return recipe
+		
+		recipe = self.extract_recipe_from_html(html, url)
+		if recipe['ingredients'] or recipe['instructions']:
+			return recipe
+		return None
+	
+	def try_method(self, method_name: str, method_func, url: str, max_retries: int,
+			cancel: Optional[threading.Event] = None) -> Optional[Dict[str, Any]]:
+		"""Run one transport with retries. Stops early once ``cancel`` is set."""
+		logger.info(f"Trying {method_name}...")
+		
+		for attempt in range(max_retries):
+			if cancel is not None and cancel.is_set():
+				return None
+			try:
+				html = method_func(url)
+				
+				if html:
+					recipe = self._recipe_from_html(html, url)
+					if recipe:
+						logger.info(f"Successfully extracted recipe using {method_name}")
+						return recipe
+					# A cached copy that did not yield a recipe should not be reused by the retry
+					html_cache.invalidate(url)
+				
+				# Back off this domain briefly before retrying
+				if attempt < max_retries - 1:
+					rate_limiter.note_failure(url, attempt)
+					
+			except Exception as e:
+				logger.error(f"{method_name} attempt {attempt + 1} failed: {str(e)}")
+				if attempt < max_retries - 1:
+					rate_limiter.note_failure(url, attempt)
+		
+		return None
+	
+	def scrape_recipe(self, url: str, max_retries: int = 3, hedged: Optional[bool] = None) -> Dict[str, Any]:
+		"""
+		Main scraping method with multiple fallback strategies.
+		In hedged mode the cheap HTTP transports race (staggered by SCRAPE_HEDGE_DELAY)
+		and Selenium only runs if both fail; otherwise transports run one after another.
+		"""
 		logger.info(f"Scraping recipe from: {url}")
+		hedged = SCRAPE_HEDGED if hedged is None else hedged
 		
-		# Try different scraping methods
-		methods = [
-			('selenium', self.scrape_with_selenium),
+		http_methods = [
 			('cloudscraper', self.scrape_with_cloudscraper),
 			('requests', self.scrape_with_requests)
 		]
 		
-		for method_name, method_func in methods:
-			logger.info(f"Trying {method_name}...")
+		if hedged:
+			started = time.monotonic()
+			winner = hedged_race(
+				[(name, partial(self.try_method, name, func, url, max_retries)) for name, func in http_methods],
+				deadline=HEDGE_DEADLINE,
+			)
+			if winner:
+				method_name, recipe = winner
+				return {'success': True, 'method': method_name, 'recipe': recipe}
 			
-			for attempt in range(max_retries):
-				try:
-					html = method_func(url)
-					
-					if html:
-						soup = BeautifulSoup(html, 'html.parser')
-						
-						# Remove unwanted elements
-						for element in soup.find_all(['script', 'style', 'iframe', 'noscript']):
-							element.decompose()
-						
-						# Extract recipe content
-						recipe = self.extract_recipe_content(soup, url)
-						
-						if recipe['ingredients'] or recipe['instructions']:
-							logger.info(f"Successfully extracted recipe using {method_name}")
-							return {
-								'success': True,
-								'method': method_name,
-								'recipe': recipe
-							}
-					
-					# Add delay between retries
-					if attempt < max_retries - 1:
-						time.sleep(random.uniform(2, 5))
-						
-				except Exception as e:
-					logger.error(f"{method_name} attempt {attempt + 1} failed: {str(e)}")
-					if attempt < max_retries - 1:
-						time.sleep(random.uniform(2, 5))
+			# Selenium is slow and heavy; only start it if there is time left in the budget
+			if SELENIUM_AVAILABLE and time.monotonic() - started < HEDGE_DEADLINE:
+				methods = [('selenium', self.scrape_with_selenium)]
+			else:
+				methods = []
+		else:
+			methods = [('selenium', self.scrape_with_selenium)] + http_methods
+		
+		for method_name, method_func in methods:
+			method_started = time.monotonic()
+			recipe = self.try_method(method_name, method_func, url, max_retries)
+			transport_stats.record(method_name, recipe is not None, time.monotonic() - method_started)
+			if recipe:
+				return {
+					'success': True,
+					'method': method_name,
+					'recipe': recipe
+				}
 		
 		# If all methods failed
 		return {
@@ -413,33 +309,38 @@ class EnhancedRecipeScraper:
 			}
 		}
 
+def format_recipe_text(recipe: Dict[str, Any]) -> str:
+	"""Format an extracted recipe dict like the original scraper's text output."""
+	content_parts = []
+	
+	if recipe['title']:
+		content_parts.append(f"Title: {recipe['title']}")
+	
+	if recipe['description']:
+		content_parts.append(f"Description: {recipe['description']}")
+	
+	if recipe['ingredients']:
+		content_parts.append("Ingredients:\n" + "\n".join(f"- {ing}" for ing in recipe['ingredients']))
+	
+	if recipe['instructions']:
+		content_parts.append("Instructions:\n" + "\n".join(f"{i+1}. {step}" for i, step in enumerate(recipe['instructions'])))
+	
+	return "\n\n".join(content_parts)
+
 # Convenience function for backward compatibility
 def scrape_recipe_page_enhanced(url: str, max_retries: int = 3) -> str:
 	"""Enhanced version of the original scrape_recipe_page function."""
-	scraper = EnhancedRecipeScraper()
-	result = scraper.scrape_recipe(url, max_retries)
-	
-	if result['success']:
-		recipe = result['recipe']
-		
-		# Format the output similar to the original function
-		content_parts = []
-		
-		if recipe['title']:
-			content_parts.append(f"Title: {recipe['title']}")
-		
-		if recipe['description']:
-			content_parts.append(f"Description: {recipe['description']}")
+	def scrape() -> str:
+		scraper = EnhancedRecipeScraper()
+		result = scraper.scrape_recipe(url, max_retries)
 		
-		if recipe['ingredients']:
-			content_parts.append("Ingredients:\n" + "\n".join(f"- {ing}" for ing in recipe['ingredients']))
-		
-		if recipe['instructions']:
-			content_parts.append("Instructions:\n" + "\n".join(f"{i+1}. {step}" for i, step in enumerate(recipe['instructions'])))
-		
-		return "\n\n".join(content_parts)
-	else:
-		return f"Error scraping recipe: {result['error']}"
+		if result['success']:
+			return format_recipe_text(result['recipe'])
+		else:
+			return f"Error scraping recipe: {result['error']}"
+	
+	# Skip the whole retry ladder for URLs that just failed and blocked domains
+	return guarded_scrape(url, scrape)
 
 if __name__ == "__main__":
 	# Test the enhanced scraper
@@ -26,4 +26,21 @@ preload_app = False
 # Log configs
 accesslog = "-"
 errorlog = "-"
-loglevel = "warning"  # Reduce logging to save memory 
\ No newline at end of file
+loglevel = "warning"  # Reduce logging to save memory 
+
+# Audio worker: runs as its own process (the Procfile's worker line). Hosts that
+# only start the web process can opt in to AUDIO_WORKER_IN_WEB=1, which works the
+# queue on a daemon thread of the web worker (see audio_worker.py). The app is
+# loaded after the fork, so start it once the worker has imported it.
+def post_worker_init(worker):
+    from audio_worker import AUDIO_WORKER_IN_WEB, BackgroundWorker
+    if not AUDIO_WORKER_IN_WEB:
+        return
+    from app import app, generate_recipe_audio
+    worker.audio_worker = BackgroundWorker(app, generate_recipe_audio).start()
+
+# Hand a half-finished job back to the queue when max_requests recycles the worker
+def worker_exit(server, worker):
+    audio_worker = getattr(worker, 'audio_worker', None)
+    if audio_worker is not None:
+        audio_worker.stop()
@@ -0,0 +1,169 @@
+# hedging.py
+"""
+Hedged execution of scrape transports and per-transport outcome stats.
+
+``hedged_race`` starts the first attempt immediately and each further attempt
+after ``hedge_delay`` seconds (or as soon as every running attempt has
+failed). The first result accepted by the caller wins; the others are told to
+stop through a shared ``threading.Event`` and their results are discarded.
+Threads cannot be killed, so attempts should check the event between steps.
+
+``transport_stats`` records attempts, wins and latency per transport so the
+hedge delay can be tuned from real traffic (see the /scrape-stats endpoint).
+"""
+import logging
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Race the HTTP transports instead of trying them strictly one after another
+SCRAPE_HEDGED = os.getenv('SCRAPE_HEDGED', '1') == '1'
+# Seconds to wait on a transport before starting the next one alongside it
+HEDGE_DELAY = float(os.getenv('SCRAPE_HEDGE_DELAY', '2.0'))
+# Overall budget for one hedged scrape; keep below gunicorn's 60s worker timeout
+HEDGE_DEADLINE = float(os.getenv('SCRAPE_HEDGE_DEADLINE', '40'))
+# Latency samples kept per transport
+STATS_WINDOW = int(os.getenv('SCRAPE_STATS_WINDOW', '200'))
+
+Attempt = Tuple[str, Callable[[threading.Event], Any]]
+
+class StrategyStats:
+    """Thread-safe attempt/win/latency counters keyed by transport name."""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def _entry(self, name: str) -> Dict[str, Any]:
+        entry = self._stats.get(name)
+        if entry is None:
+            entry = {'attempts': 0, 'wins': 0, 'failures': 0, 'cancelled': 0,
+                     'latencies': deque(maxlen=self.window), 'win_latencies': deque(maxlen=self.window)}
+            self._stats[name] = entry
+        return entry
+
+    def record(self, name: str, won: bool, latency: float) -> None:
+        """Record a finished attempt."""
+        with self._lock:
+            entry = self._entry(name)
+            entry['attempts'] += 1
+            entry['latencies'].append(latency)
+            if won:
+                entry['wins'] += 1
+                entry['win_latencies'].append(latency)
+            else:
+                entry['failures'] += 1
+
+    def record_cancelled(self, name: str) -> None:
+        """Record an attempt abandoned because another transport won first."""
+        with self._lock:
+            entry = self._entry(name)
+            entry['attempts'] += 1
+            entry['cancelled'] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-transport win rate and latency percentiles in milliseconds."""
+        with self._lock:
+            return {name: self._summarize(entry) for name, entry in self._stats.items()}
+
+    @staticmethod
+    def _summarize(entry: Dict[str, Any]) -> Dict[str, Any]:
+        summary = {
+            'attempts': entry['attempts'],
+            'wins': entry['wins'],
+            'failures': entry['failures'],
+            'cancelled': entry['cancelled'],
+            'win_rate': round(entry['wins'] / entry['attempts'], 3) if entry['attempts'] else 0.0,
+        }
+        for key, samples in (('latency', entry['latencies']), ('win_latency', entry['win_latencies'])):
+            ordered = sorted(samples)
+            summary[f'{key}_ms_p50'] = round(statistics.median(ordered) * 1000, 1) if ordered else None
+            summary[f'{key}_ms_p95'] = round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 1) if ordered else None
+        return summary
+
+transport_stats = StrategyStats()
+
+def hedged_race(
+    attempts: Sequence[Attempt],
+    accept: Callable[[Any], bool] = bool,
+    hedge_delay: float = HEDGE_DELAY,
+    deadline: float = HEDGE_DEADLINE,
+    stats: Optional[StrategyStats] = None,
+    clock: Callable[[], float] = time.monotonic,
+) -> Optional[Tuple[str, Any]]:
+    """
+    Run ``attempts`` with staggered starts and return (name, result) of the first
+    accepted result, or None when every attempt failed or the deadline passed.
+    Each attempt callable receives the cancel event. ``accept`` may raise to
+    end the race early; that attempt is recorded as a loss and the error is
+    passed on.
+    """
+    if not attempts:
+        return None
+
+    stats = stats if stats is not None else transport_stats
+    cancel = threading.Event()
+    started = clock()
+    queue: List[Attempt] = list(attempts)
+    running: Dict[Any, Tuple[str, float]] = {}
+    executor = ThreadPoolExecutor(max_workers=len(queue), thread_name_prefix='hedge')
+
+    def launch() -> None:
+        name, func = queue.pop(0)
+        logger.info(f"Hedged scrape: starting {name}")
+        running[executor.submit(func, cancel)] = (name, clock())
+
+    try:
+        launch()
+        next_launch = clock() + hedge_delay
+        while running:
+            now = clock()
+            remaining = deadline - (now - started)
+            if remaining <= 0:
+                logger.warning(f"Hedged scrape hit its {deadline:.0f}s deadline")
+                break
+            timeout = remaining
+            if queue:
+                timeout = min(timeout, max(next_launch - now, 0.0))
+
+            done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, launched_at = running.pop(future)
+                latency = clock() - launched_at
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning(f"Hedged scrape: {name} raised {e}")
+                    result = None
+                try:
+                    accepted = result is not None and accept(result)
+                except Exception:
+                    stats.record(name, False, latency)
+                    raise
+                if accepted:
+                    stats.record(name, True, latency)
+                    logger.info(f"Hedged scrape: {name} won after {latency:.2f}s")
+                    return name, result
+                stats.record(name, False, latency)
+
+            # Start the next transport when the hedge delay expires or nothing is left running
+            if queue and (not running or clock() >= next_launch):
+                launch()
+                next_launch = clock() + hedge_delay
+        return None
+    finally:
+        cancel.set()
+        for name, _ in running.values():
+            stats.record_cancelled(name)
+        executor.shutdown(wait=False, cancel_futures=True)
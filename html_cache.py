@@ -0,0 +1,272 @@
+# html_cache.py
+"""
+On-disk cache of raw recipe HTML with HTTP revalidation.
+
+Bodies are stored zlib-compressed in SQLite together with their ETag and
+Last-Modified validators. Fresh entries are served without touching the
+network; stale entries are revalidated with If-None-Match/If-Modified-Since
+so an unchanged page costs a 304 instead of a full download. The cache is
+bounded by total compressed size and evicts least-recently-used entries.
+
+A body whose download was cut short (see scrape.read_html_stream) is stored
+as a partial entry. Only callers that would have stopped reading at the same
+point may be served it.
+"""
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from local_store import default_store_path, open_sqlite
+
+logger = logging.getLogger(__name__)
+
+HTML_CACHE_ENABLED = os.getenv('HTML_CACHE_ENABLED', '1') == '1'
+HTML_CACHE_PATH = os.getenv('HTML_CACHE_PATH', default_store_path('html_cache.db'))
+# Total compressed bytes kept on disk before LRU eviction kicks in.
+HTML_CACHE_MAX_BYTES = int(os.getenv('HTML_CACHE_MAX_BYTES', str(100 * 1024 * 1024)))
+# Freshness lifetime used when the response carries no Cache-Control max-age.
+HTML_CACHE_DEFAULT_TTL = int(os.getenv('HTML_CACHE_TTL', '3600'))
+
+# Query parameters that never change page content.
+TRACKING_PARAM_PREFIXES = ('utm_',)
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'ref', 'ref_src', 'igshid'}
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL for use as a cache key.
+    Lower-cases scheme and host, drops fragments, default ports and tracking
+    parameters, and sorts the remaining query string.
+    """
+    try:
+        parsed = urlparse(url.strip())
+    except Exception:
+        return url
+    scheme = (parsed.scheme or 'https').lower()
+    host = (parsed.hostname or '').lower()
+    port = parsed.port
+    if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+        host = f"{host}:{port}"
+    query = [
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PARAM_PREFIXES)
+    ]
+    path = parsed.path or '/'
+    return urlunparse((scheme, host, path, '', urlencode(sorted(query)), ''))
+
+def _freshness_lifetime(headers: Mapping[str, str], default_ttl: int) -> Optional[int]:
+    """
+    Return how long a response may be served without revalidation.
+    Returns None when the response must not be stored at all.
+    """
+    cache_control = (headers.get('Cache-Control') or '').lower()
+    if 'no-store' in cache_control:
+        return None
+    if 'no-cache' in cache_control:
+        return 0
+    match = re.search(r'(?:s-maxage|max-age)\s*=\s*(\d+)', cache_control)
+    if match:
+        return int(match.group(1))
+    return default_ttl
+
+class CacheEntry:
+    """A cached page and its validators."""
+
+    def __init__(
+        self,
+        url: str,
+        text: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        expires_at: float,
+        complete: bool = True,
+    ):
+        self.url = url
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+        # False when the body was truncated on download
+        self.complete = complete
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.time()) < self.expires_at
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers that turn the next request into a revalidation."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+class HtmlCache:
+    """SQLite-backed, size-bounded LRU cache of page bodies."""
+
+    def __init__(
+        self,
+        path: str = HTML_CACHE_PATH,
+        max_bytes: int = HTML_CACHE_MAX_BYTES,
+        default_ttl: int = HTML_CACHE_DEFAULT_TTL,
+        enabled: bool = HTML_CACHE_ENABLED,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._conn = None
+        self.counters = {
+            'hits': 0,
+            'misses': 0,
+            'stale': 0,
+            'revalidated': 0,
+            'stores': 0,
+            'evictions': 0,
+        }
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        """
+        Return the cached entry for a URL (fresh or stale), or None.
+        Fresh lookups count as hits; stale ones are counted until revalidated.
+        """
+        if not self.enabled:
+            return None
+        key = normalize_url(url)
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute(
+                    'SELECT body, etag, last_modified, expires_at, complete FROM pages WHERE url_key = ?',
+                    (key,),
+                ).fetchone()
+                if row is None:
+                    self.counters['misses'] += 1
+                    return None
+                conn.execute('UPDATE pages SET last_access = ? WHERE url_key = ?', (now, key))
+                conn.commit()
+            entry = CacheEntry(url, zlib.decompress(row[0]).decode('utf-8'), row[1], row[2], row[3], bool(row[4]))
+        except Exception as e:
+            logger.warning(f"HTML cache read failed for {url}: {e}")
+            return None
+
+        with self._lock:
+            self.counters['hits' if entry.is_fresh(now) else 'stale'] += 1
+        return entry
+
+    def put(self, url: str, text: str, headers: Optional[Mapping[str, str]] = None, complete: bool = True) -> None:
+        """
+        Store a page body with the validators from its response headers.
+        Pass ``complete=False`` when the body is only the start of the page.
+        """
+        if not self.enabled or not text:
+            return
+        headers = headers or {}
+        lifetime = _freshness_lifetime(headers, self.default_ttl)
+        if lifetime is None:
+            return
+        now = time.time()
+        body = zlib.compress(text.encode('utf-8'), 6)
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    'INSERT OR REPLACE INTO pages '
+                    '(url_key, url, body, etag, last_modified, fetched_at, expires_at, last_access, size, complete) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (
+                        normalize_url(url), url, body,
+                        headers.get('ETag'), headers.get('Last-Modified'),
+                        now, now + lifetime, now, len(body), int(complete),
+                    ),
+                )
+                conn.commit()
+                self.counters['stores'] += 1
+                self._evict_locked(conn)
+        except Exception as e:
+            logger.warning(f"HTML cache write failed for {url}: {e}")
+
+    def refresh(self, url: str, headers: Optional[Mapping[str, str]] = None) -> None:
+        """Mark a stale entry fresh again after a 304 Not Modified."""
+        if not self.enabled:
+            return
+        headers = headers or {}
+        lifetime = _freshness_lifetime(headers, self.default_ttl) or 0
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    'UPDATE pages SET expires_at = ?, last_access = ?, '
+                    'etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) '
+                    'WHERE url_key = ?',
+                    (now + lifetime, now, headers.get('ETag'), headers.get('Last-Modified'), normalize_url(url)),
+                )
+                conn.commit()
+                self.counters['revalidated'] += 1
+        except Exception as e:
+            logger.warning(f"HTML cache refresh failed for {url}: {e}")
+
+    def invalidate(self, url: str) -> None:
+        """Drop a URL from the cache."""
+        if not self.enabled:
+            return
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute('DELETE FROM pages WHERE url_key = ?', (normalize_url(url),))
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"HTML cache invalidate failed for {url}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the hit rate for this process."""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self.counters)
+        lookups = stats['hits'] + stats['misses'] + stats['stale']
+        served = stats['hits'] + stats['revalidated']
+        stats['hit_rate'] = round(served / lookups, 3) if lookups else 0.0
+        return stats
+
+    def _connection(self):
+        """Open the database on first use. Caller must hold the lock."""
+        if self._conn is None:
+            self._conn = open_sqlite(self.path)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS pages ('
+                'url_key TEXT PRIMARY KEY, url TEXT, body BLOB, etag TEXT, last_modified TEXT, '
+                'fetched_at REAL, expires_at REAL, last_access REAL, size INTEGER, '
+                'complete INTEGER NOT NULL DEFAULT 1)'
+            )
+            columns = {row[1] for row in self._conn.execute('PRAGMA table_info(pages)')}
+            if 'complete' not in columns:
+                self._conn.execute('ALTER TABLE pages ADD COLUMN complete INTEGER NOT NULL DEFAULT 1')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)')
+            self._conn.commit()
+        return self._conn
+
+    def _evict_locked(self, conn) -> None:
+        """Delete least-recently-used pages until the cache fits its budget."""
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% so we are not evicting on every single write.
+        target = int(self.max_bytes * 0.9)
+        rows = conn.execute('SELECT url_key, size FROM pages ORDER BY last_access ASC').fetchall()
+        doomed = []
+        for url_key, size in rows:
+            if total <= target:
+                break
+            doomed.append((url_key,))
+            total -= size
+        conn.executemany('DELETE FROM pages WHERE url_key = ?', doomed)
+        conn.commit()
+        self.counters['evictions'] += len(doomed)
+
+html_cache = HtmlCache()
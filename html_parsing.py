@@ -0,0 +1,131 @@
+# html_parsing.py
+"""
+HTML parser backend selection and partial parsing for the scrapers.
+
+BeautifulSoup's pure-Python ``html.parser`` builder is the slowest option and
+builds a tree for every ad, comment and footer link on the page. This module
+picks a C-backed builder when one is installed (lxml, or html5-parser for
+html5-compatible trees) and can restrict tree building to the parts of a page
+recipe extraction actually reads: ``<head>``, ld+json scripts, ``main`` and
+``article``, headings and recipe-looking containers.
+"""
+import logging
+import os
+import re
+from typing import Iterable, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+logger = logging.getLogger(__name__)
+
+# 'auto' picks the fastest installed backend; or force 'lxml', 'html5-parser', 'html.parser'
+HTML_PARSER = os.getenv('HTML_PARSER', 'auto').strip().lower()
+# Parse only recipe-relevant subtrees first (callers retry with a full tree on a miss)
+HTML_PARTIAL_PARSE = os.getenv('HTML_PARTIAL_PARSE', '1') == '1'
+
+PARSER_BACKENDS = ('lxml', 'html5-parser', 'html.parser')
+
+# Tags whose whole subtree is kept by the partial parse.
+RECIPE_TAGS = frozenset({'head', 'title', 'main', 'article', 'h1'})
+# Class/id fragments that mark recipe containers across common recipe plugins and themes.
+RECIPE_CONTAINER_HINTS = (
+    'recipe', 'ingredient', 'instruction', 'direction', 'method', 'step',
+    'entry-content', 'post-content', 'wprm', 'tasty', 'mv-create',
+)
+# Containers used by the site-specific extractors in scrape.py.
+SITE_CONTAINER_SELECTORS = (
+    'h3.view2_tit', '.ready_ingre3 li', '#divConfirmedMaterialArea li', '.cont_ingre li',
+    '.ingre_list li', '.ingredient_list li', '.view_step li', 'ul.wp-block-list', 'ol.wp-block-list',
+)
+
+_SELECTOR_TOKEN_RE = re.compile(r'([.#])([\w-]+)')
+
+def _backend_available(name: str) -> bool:
+    if name == 'html.parser':
+        return True
+    try:
+        if name == 'lxml':
+            import lxml  # noqa: F401
+        elif name == 'html5-parser':
+            import html5_parser  # noqa: F401
+        else:
+            return False
+        return True
+    except ImportError:
+        return False
+
+def resolve_parser(preferred: Optional[str] = None) -> str:
+    """Return the backend to use: the requested one if installed, else the fastest available."""
+    preferred = (preferred or HTML_PARSER).strip().lower()
+    if preferred != 'auto':
+        if _backend_available(preferred):
+            return preferred
+        logger.warning(f"HTML parser '{preferred}' is not installed, picking the fastest available")
+    for name in PARSER_BACKENDS:
+        if _backend_available(name):
+            return name
+    return 'html.parser'
+
+def selector_tokens(selectors: Iterable[str]) -> tuple[set, set]:
+    """Collect the class and id names mentioned in CSS selectors."""
+    classes, ids = set(), set()
+    for selector in selectors:
+        for kind, token in _SELECTOR_TOKEN_RE.findall(selector):
+            (classes if kind == '.' else ids).add(token.lower())
+    return classes, ids
+
+class RecipeStrainer(SoupStrainer):
+    """
+    SoupStrainer that keeps only recipe-relevant subtrees.
+    A kept tag brings all of its descendants with it.
+    """
+
+    def __init__(self, extra_selectors: Iterable[str] = ()):
+        super().__init__()
+        self.classes, self.ids = selector_tokens(list(SITE_CONTAINER_SELECTORS) + list(extra_selectors))
+
+    def keep(self, name: str, attrs) -> bool:
+        if name in RECIPE_TAGS:
+            return True
+        attrs = attrs or {}
+        if name == 'script':
+            return str(attrs.get('type', '')).strip().lower() == 'application/ld+json'
+        if name == 'meta':
+            return True
+        element_id = str(attrs.get('id', '') or '').lower()
+        raw_class = attrs.get('class', '') or ''
+        class_names = [c.lower() for c in (raw_class if isinstance(raw_class, list) else str(raw_class).split())]
+        if element_id and (element_id in self.ids or any(hint in element_id for hint in RECIPE_CONTAINER_HINTS)):
+            return True
+        for class_name in class_names:
+            if class_name in self.classes or any(hint in class_name for hint in RECIPE_CONTAINER_HINTS):
+                return True
+        return False
+
+    # Beautiful Soup >= 4.13 asks this before creating each tag.
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        return self.keep(name, attrs)
+
+def partial_parsing_supported() -> bool:
+    """Partial parsing relies on the tag-creation hook added in Beautiful Soup 4.13."""
+    return hasattr(SoupStrainer, 'allow_tag_creation')
+
+def make_soup(
+    html_text: str,
+    partial: bool = False,
+    extra_selectors: Iterable[str] = (),
+    parser: Optional[str] = None,
+) -> BeautifulSoup:
+    """
+    Build a BeautifulSoup tree with the configured backend.
+    With ``partial`` only recipe-relevant subtrees are materialized (see RecipeStrainer).
+    """
+    backend = resolve_parser(parser)
+    if backend == 'html5-parser':
+        # html5-parser builds the soup itself and does not support SoupStrainer
+        from html5_parser import parse as html5_parse
+        return html5_parse(html_text, treebuilder='soup')
+
+    if partial and partial_parsing_supported():
+        return BeautifulSoup(html_text, backend, parse_only=RecipeStrainer(extra_selectors))
+    return BeautifulSoup(html_text, backend)
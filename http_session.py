@@ -0,0 +1,210 @@
+# http_session.py
+"""
+Process-wide pool of HTTP sessions keyed by domain.
+
+Scrapers used to build a fresh cloudscraper/requests session for every URL,
+which meant a new DNS lookup, TCP connection and TLS handshake per extraction
+and re-solving Cloudflare challenges for domains we had just visited.
+Sessions handed out here are reused across requests to the same domain so
+keep-alive connections, challenge cookies and TLS sessions carry over.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+from urllib.parse import urlparse
+
+import cloudscraper
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of domains kept warm per session kind.
+SESSION_POOL_MAX_SIZE = int(os.getenv('SCRAPE_SESSION_POOL_SIZE', '32'))
+# Sessions unused for this many seconds are closed on the next pool access.
+SESSION_IDLE_TIMEOUT = float(os.getenv('SCRAPE_SESSION_IDLE_SECONDS', '300'))
+# Connections kept alive per host inside one session.
+SESSION_CONNECTIONS_PER_HOST = int(os.getenv('SCRAPE_SESSION_CONNECTIONS', '4'))
+
+def domain_key(url: str) -> str:
+    """
+    Return the pool key for a URL: the lower-cased host (with port, if any).
+    Falls back to the raw value so malformed URLs still get a stable key.
+    """
+    try:
+        netloc = urlparse(url).netloc.lower().strip()
+    except Exception:
+        netloc = ""
+    return netloc or str(url).lower()
+
+def _resize_keepalive_pools(session: requests.Session) -> None:
+    """
+    Size the connection pools so concurrent requests to one host reuse sockets.
+    The session's own adapters are resized in place rather than replaced, so
+    cloudscraper keeps its CipherSuiteAdapter and TLS fingerprint.
+    """
+    for adapter in session.adapters.values():
+        if not isinstance(adapter, HTTPAdapter):
+            continue
+        adapter._pool_connections = 1
+        adapter._pool_maxsize = SESSION_CONNECTIONS_PER_HOST
+        adapter.init_poolmanager(1, SESSION_CONNECTIONS_PER_HOST, block=adapter._pool_block)
+
+def create_cloudscraper_session() -> requests.Session:
+    """Build a cloudscraper session configured like the original per-request scraper."""
+    scraper = cloudscraper.create_scraper(
+        browser={
+            'browser': 'chrome',
+            'platform': 'windows',
+            'mobile': False
+        },
+        delay=10,
+        debug=False
+    )
+    # Configure session to handle compression properly
+    scraper.headers.update({
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8'
+    })
+    _resize_keepalive_pools(scraper)
+    return scraper
+
+def create_requests_session() -> requests.Session:
+    """Build a plain requests session with keep-alive adapters."""
+    session = requests.Session()
+    _resize_keepalive_pools(session)
+    return session
+
+class SessionPool:
+    """
+    Thread-safe, size-bounded pool of sessions keyed by domain.
+
+    Entries are kept in least-recently-used order. When the pool is full the
+    least recently used session is closed, and sessions idle for longer than
+    ``idle_timeout`` seconds are closed whenever the pool is accessed.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], requests.Session],
+        max_size: int = SESSION_POOL_MAX_SIZE,
+        idle_timeout: float = SESSION_IDLE_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.factory = factory
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        # domain -> [session, last_used]
+        self._sessions: "OrderedDict[str, list]" = OrderedDict()
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def get(self, url: str) -> requests.Session:
+        """Return the pooled session for the URL's domain, creating it if needed."""
+        key = domain_key(url)
+        now = self._clock()
+        to_close = []
+
+        with self._lock:
+            to_close.extend(self._pop_idle(now))
+
+            entry = self._sessions.get(key)
+            if entry is not None:
+                entry[1] = now
+                self._sessions.move_to_end(key)
+                self.reused += 1
+                session = entry[0]
+            else:
+                session = self.factory()
+                self._sessions[key] = [session, now]
+                self.created += 1
+                while len(self._sessions) > self.max_size:
+                    _, (old_session, _) = self._sessions.popitem(last=False)
+                    to_close.append(old_session)
+                    self.evicted += 1
+
+        # Close outside the lock so a slow socket shutdown never blocks other threads.
+        for old_session in to_close:
+            self._close_session(old_session)
+        return session
+
+    def evict_idle(self) -> int:
+        """Close every session that has been idle past the timeout. Returns the count."""
+        with self._lock:
+            to_close = self._pop_idle(self._clock())
+        for session in to_close:
+            self._close_session(session)
+        return len(to_close)
+
+    def close(self) -> None:
+        """Close and forget every pooled session."""
+        with self._lock:
+            sessions = [entry[0] for entry in self._sessions.values()]
+            self._sessions.clear()
+        for session in sessions:
+            self._close_session(session)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool counters for diagnostics."""
+        with self._lock:
+            return {
+                'size': len(self._sessions),
+                'max_size': self.max_size,
+                'created': self.created,
+                'reused': self.reused,
+                'evicted': self.evicted,
+            }
+
+    def __contains__(self, url: str) -> bool:
+        with self._lock:
+            return domain_key(url) in self._sessions
+
+    def _pop_idle(self, now: float) -> list:
+        """Remove idle entries from the LRU end. Caller must hold the lock."""
+        expired = []
+        if self.idle_timeout <= 0:
+            return expired
+        while self._sessions:
+            key, (session, last_used) = next(iter(self._sessions.items()))
+            if now - last_used < self.idle_timeout:
+                break
+            del self._sessions[key]
+            expired.append(session)
+            self.evicted += 1
+        return expired
+
+    @staticmethod
+    def _close_session(session: requests.Session) -> None:
+        try:
+            session.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled session: {e}")
+
+_cloudscraper_pool = SessionPool(create_cloudscraper_session)
+_requests_pool = SessionPool(create_requests_session)
+
+def get_cloudscraper(url: str) -> requests.Session:
+    """Return the shared cloudscraper session for the URL's domain."""
+    return _cloudscraper_pool.get(url)
+
+def get_requests_session(url: str) -> requests.Session:
+    """Return the shared plain requests session for the URL's domain."""
+    return _requests_pool.get(url)
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Return counters for every session pool."""
+    return {
+        'cloudscraper': _cloudscraper_pool.stats(),
+        'requests': _requests_pool.stats(),
+    }
+
+def close_all_sessions() -> None:
+    """Close every pooled session (used on shutdown and in tests)."""
+    _cloudscraper_pool.close()
+    _requests_pool.close()
@@ -0,0 +1,146 @@
+# llm_cache.py
+"""
+Persistent memo of LLM structuring results keyed by recipe content.
+
+The same recipe text reaches the LLM under many URLs (tracking parameters,
+AMP pages, syndicated copies, retries after a failed insert). Results are
+stored in a SQLite file shared by every gunicorn worker, keyed by a SHA-256
+of the whitespace-normalized input plus the prompt/model version, so editing
+the prompt or switching models never serves stale answers. Entries expire
+after LLM_CACHE_TTL seconds and the least recently used ones are evicted
+beyond LLM_CACHE_MAX_ENTRIES.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Callable, Dict, Optional
+
+from local_store import default_store_path, open_sqlite
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', '1') == '1'
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', default_store_path('llm_cache.db'))
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', str(30 * 86400)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '20000'))
+
+def normalize_text(text: str) -> str:
+    """NFKC-normalize and collapse runs of spaces so cosmetic differences share a key."""
+    text = unicodedata.normalize('NFKC', text or '')
+    lines = (re.sub(r'[ \t\r\f\v]+', ' ', line).strip() for line in text.split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+def content_key(text: str, version: str) -> str:
+    return hashlib.sha256(f"{version}\n{normalize_text(text)}".encode('utf-8')).hexdigest()
+
+class LlmCache:
+    """SQLite-backed TTL + LRU map of content hash -> JSON result."""
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        ttl: int = LLM_CACHE_TTL,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        enabled: bool = LLM_CACHE_ENABLED,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = None
+        self.counters = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        now = self._clock()
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute('SELECT value, created_at FROM results WHERE key = ?', (key,)).fetchone()
+                if row is None or now - row[1] > self.ttl:
+                    self.counters['misses'] += 1
+                    return None
+                conn.execute('UPDATE results SET last_access = ? WHERE key = ?', (now, key))
+                conn.commit()
+                self.counters['hits'] += 1
+            return json.loads(row[0])
+        except Exception as e:
+            logger.warning(f"LLM cache read failed: {e}")
+            return None
+
+    def put(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+        now = self._clock()
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    'INSERT OR REPLACE INTO results (key, value, created_at, last_access) VALUES (?, ?, ?, ?)',
+                    (key, json.dumps(value, ensure_ascii=False), now, now),
+                )
+                conn.commit()
+                self.counters['stores'] += 1
+                self._evict_locked(conn, now)
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+    def memoize(self, func: Callable[[str], Any], version: str,
+                cacheable: Callable[[Any], bool] = bool) -> Callable[[str], Any]:
+        """Wrap a text -> result function; only results passing ``cacheable`` are stored."""
+        def wrapper(text: str) -> Any:
+            key = content_key(text, version)
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+            result = func(text)
+            if cacheable(result):
+                self.put(key, result)
+            return result
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and hit rate for this process."""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self.counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+
+    def _connection(self):
+        """Open the database on first use. Caller must hold the lock."""
+        if self._conn is None:
+            self._conn = open_sqlite(self.path)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, value TEXT, created_at REAL, last_access REAL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)')
+            self._conn.commit()
+        return self._conn
+
+    def _evict_locked(self, conn, now: float) -> None:
+        """Drop expired entries, then least-recently-used ones beyond the entry budget."""
+        expired = conn.execute('DELETE FROM results WHERE created_at < ?', (now - self.ttl,)).rowcount
+        count = conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        evicted = 0
+        if count > self.max_entries:
+            # Evict down to 90% so we are not evicting on every single write.
+            evicted = conn.execute(
+                'DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_access ASC LIMIT ?)',
+                (count - int(self.max_entries * 0.9),),
+            ).rowcount
+        conn.commit()
+        self.counters['evictions'] += max(expired, 0) + max(evicted, 0)
+
+llm_cache = LlmCache()
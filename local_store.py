@@ -0,0 +1,29 @@
+# local_store.py
+"""
+Helpers for the small SQLite files the app keeps next to its main database.
+
+These stores hold caches and counters that several gunicorn workers (and the
+CLI tools) share on one host, so they use WAL mode and a busy timeout rather
+than in-process dictionaries.
+"""
+import os
+import sqlite3
+
+INSTANCE_DIR = os.getenv('LOCAL_STORE_DIR', 'instance')
+
+def default_store_path(filename: str) -> str:
+    """Return the path of a store file inside the instance directory."""
+    return os.path.join(INSTANCE_DIR, filename)
+
+def open_sqlite(path: str) -> sqlite3.Connection:
+    """
+    Open (creating if needed) a SQLite database shared between processes.
+    The connection may be used from several threads; callers serialize access.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
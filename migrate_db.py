@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """
-Database migration script to ensure all tables exist.
+Database migration script to ensure all tables and columns exist.
 Run this before starting the app on a fresh database.
 """
 
@@ -19,6 +19,23 @@ def get_database_url():
         return database_url
     return 'sqlite:///recipes.db'
 
+def add_missing_columns(db):
+    """Add model columns that an existing table does not have yet (create_all never alters tables)."""
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as connection:
+                connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+            print(f"➕ Added column {table.name}.{column.name}")
+
 def main():
     """Create all database tables."""
     print("🔄 Starting database migration...")
@@ -33,6 +50,7 @@ def main():
         with app.app_context():
             db.create_all()
             print("✅ Database tables created successfully!")
+            add_missing_columns(db)
             
     except Exception as e:
         print(f"❌ Migration failed: {e}")
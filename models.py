@@ -1,8 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from datetime import datetime, timezone
 
 db = SQLAlchemy()
 
+def utcnow() -> datetime:
+    """Current UTC time as the naive datetime the DateTime columns store."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class Recipe(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     url = db.Column(db.String(500), unique=True, nullable=False)
@@ -12,5 +16,22 @@ class Recipe(db.Model):
     instructions = db.Column(db.JSON)
     audio_filename = db.Column(db.String(500))
     audio_url = db.Column(db.String(500))
+    audio_manifest = db.Column(db.JSON)  # per-step segments of the audio; see narration.py
     views = db.Column(db.Integer, default=0)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow) 
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=utcnow) 
+class AudioJob(db.Model):
+    """Audio generation queued for the background worker; see audio_jobs.py."""
+    id = db.Column(db.Integer, primary_key=True)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id'), nullable=False, index=True)
+    # One job per recipe text: "<recipe id>:<narration filename>"
+    dedupe_key = db.Column(db.String(200), unique=True, nullable=False)
+    status = db.Column(db.String(20), default='queued', nullable=False, index=True)  # queued, running, done, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    progress_done = db.Column(db.Integer, default=0)
+    progress_total = db.Column(db.Integer, default=0)
+    segment_urls = db.Column(db.JSON)  # narration segments stored so far, in order, for early playback
+    audio_url = db.Column(db.String(500))
+    error = db.Column(db.Text)
+    locked_until = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=utcnow)
+    updated_at = db.Column(db.DateTime, default=utcnow, onupdate=utcnow)
@@ -0,0 +1,152 @@
+# mp3_utils.py
+"""
+Frame-level MP3 concatenation.
+
+Each TTS call returns a complete MP3 file: maybe an ID3v2 tag in front, a
+Xing/Info (or VBRI) header frame that records that file's frame count and
+duration, the audio frames, and maybe an ID3v1 tag at the end. Joining such
+files byte for byte leaves stray tags mid-stream, and the first file's
+Xing header tells players the whole thing is only as long as the first
+chunk. concat_mp3() strips the tags and header frames from every part and
+joins the audio frames, so the result needs no re-encoding. Mp3FrameFilter
+does the same incrementally for audio that is still being streamed.
+"""
+from typing import Iterable, Optional, Tuple
+
+# Kilobits per second by [MPEG-1?][bitrate index], Layer III
+_BITRATES = {
+    True: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    False: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Hz by version bits, then sample-rate index
+_SAMPLE_RATES = {
+    0b11: (44100, 48000, 32000),  # MPEG-1
+    0b10: (22050, 24000, 16000),  # MPEG-2
+    0b00: (11025, 12000, 8000),   # MPEG-2.5
+}
+
+def _frame_header(data: bytes, offset: int) -> Optional[Tuple[int, int, float]]:
+    """(frame length, side-info length, seconds of audio) of a Layer III frame at ``offset``, or None."""
+    if offset + 4 > len(data) or data[offset] != 0xFF or (data[offset + 1] & 0xE0) != 0xE0:
+        return None
+    version = (data[offset + 1] >> 3) & 0b11
+    layer = (data[offset + 1] >> 1) & 0b11
+    bitrate_index = data[offset + 2] >> 4
+    rate_index = (data[offset + 2] >> 2) & 0b11
+    if version not in _SAMPLE_RATES or layer != 0b01 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 0b11
+    padding = (data[offset + 2] >> 1) & 1
+    mono = (data[offset + 3] >> 6) == 0b11
+    bitrate = _BITRATES[mpeg1][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    length = (144 if mpeg1 else 72) * bitrate // sample_rate + padding
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    samples = 1152 if mpeg1 else 576
+    return length, side_info, samples / sample_rate
+
+def parse_frame_header(data: bytes, offset: int) -> Optional[Tuple[int, int]]:
+    """(frame length, side-info length) of a Layer III frame starting at ``offset``, or None."""
+    header = _frame_header(data, offset)
+    return header[:2] if header else None
+
+def mp3_duration(frames: bytes) -> float:
+    """Seconds of audio in a run of frames as returned by audio_frames()."""
+    seconds = 0.0
+    offset = 0
+    while offset < len(frames):
+        header = _frame_header(frames, offset)
+        if header is None:
+            break
+        seconds += header[2]
+        offset += header[0]
+    return seconds
+
+def _id3v2_size(data: bytes) -> int:
+    """Bytes taken by a leading ID3v2 tag (0 if there is none)."""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return 0
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+def _is_info_frame(data: bytes, offset: int, side_info: int) -> bool:
+    """True for the Xing/Info/VBRI frame encoders put first to describe the whole file."""
+    tag_at = offset + 4 + side_info
+    return data[tag_at:tag_at + 4] in (b'Xing', b'Info') or data[offset + 36:offset + 40] == b'VBRI'
+
+class Mp3FrameFilter:
+    """
+    Incremental audio_frames(): feed() MP3 bytes as they arrive and get back
+    the whole audio frames seen so far, minus ID3 tags and the Xing/Info frame.
+    Data without any recognisable frame is returned unchanged by flush().
+    """
+
+    def __init__(self):
+        self._buffer = b''
+        self._raw = []
+        self._tag_skipped = False
+        self._first = True
+        self._found = False
+
+    def feed(self, data: bytes) -> bytes:
+        if not self._found:
+            self._raw.append(data)
+        buffer = self._buffer + data
+        if not self._tag_skipped:
+            if len(buffer) < 10:
+                self._buffer = buffer
+                return b''
+            tag_size = _id3v2_size(buffer)
+            if len(buffer) < tag_size:
+                self._buffer = buffer
+                return b''
+            buffer = buffer[tag_size:]
+            self._tag_skipped = True
+
+        frames = []
+        offset = 0
+        while offset < len(buffer):
+            if buffer[offset:offset + 3] == b'TAG' and len(buffer) - offset <= 128:
+                # Possibly the trailing ID3v1 tag; wait for more data or flush()
+                break
+            header = parse_frame_header(buffer, offset)
+            if header is None:
+                if len(buffer) - offset < 4:
+                    break
+                # Resynchronise on the next frame header (skips padding or junk between frames)
+                next_sync = buffer.find(b'\xff', offset + 1)
+                offset = next_sync if next_sync >= 0 else len(buffer)
+                continue
+            length, side_info = header
+            if offset + length > len(buffer):
+                break
+            if not (self._first and _is_info_frame(buffer, offset, side_info)):
+                frames.append(buffer[offset:offset + length])
+            self._first = False
+            self._found = True
+            offset += length
+        self._buffer = buffer[offset:]
+        if self._found:
+            self._raw = []
+        return b''.join(frames)
+
+    def flush(self) -> bytes:
+        """Drop a trailing tag or truncated frame; pass through data that never contained a frame."""
+        if self._found:
+            return b''
+        return b''.join(self._raw)
+
+def audio_frames(data: bytes) -> bytes:
+    """
+    The MPEG audio frames of one MP3 file, without ID3 tags or a Xing/Info header frame.
+    Data without any recognisable frame is returned unchanged.
+    """
+    frames = Mp3FrameFilter()
+    return frames.feed(data) + frames.flush()
+
+def concat_mp3(parts: Iterable[bytes]) -> bytes:
+    """Join MP3 files into one stream of frames, without re-encoding."""
+    return b''.join(audio_frames(part) for part in parts)
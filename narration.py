@@ -0,0 +1,174 @@
+# narration.py
+"""
+Recipe narration assembled from per-step audio segments.
+
+A recipe is read as an introduction, the ingredient list and one segment per
+instruction step. Each segment goes through the content-addressed AudioCache
+on its own, so when a recipe changes only the segments whose text changed
+are synthesized again; the rest are read back from storage. The segments'
+MP3 frames are joined into one file per recipe, and a manifest records each
+segment's byte offset, start time and duration in it so players can jump to
+a step. The manifest is stored on the Recipe.
+
+Formats other than MP3 cannot be joined frame by frame; they are narrated as
+a single segment.
+"""
+import hashlib
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from mp3_utils import Mp3FrameFilter, mp3_duration
+from tts import AudioCache
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+def _text_of(value: Any) -> str:
+    return str(value or '').strip()
+
+def _ingredient_text(ingredient: Any) -> str:
+    if isinstance(ingredient, str):
+        return ingredient.strip()
+    if not isinstance(ingredient, dict):
+        return ''
+    quantity = _text_of(ingredient.get('quantity') or ingredient.get('amount'))
+    item = _text_of(ingredient.get('item') or ingredient.get('text') or ingredient.get('name'))
+    return ' '.join(part for part in (quantity, item) if part)
+
+def _step_text(step: Any) -> str:
+    if isinstance(step, str):
+        return step.strip()
+    if not isinstance(step, dict):
+        return ''
+    return _text_of(step.get('text') or step.get('instruction') or step.get('name'))
+
+def _recipe_parts(recipe: Dict[str, Any]):
+    ingredients = recipe.get('ingredients') if isinstance(recipe.get('ingredients'), list) else []
+    steps = recipe.get('instructions') if isinstance(recipe.get('instructions'), list) else []
+    return _text_of(recipe.get('title')), _text_of(recipe.get('introduction')), ingredients, steps
+
+def narration_text(recipe: Dict[str, Any]) -> str:
+    """The text read aloud for a recipe; mirrors buildAudioText() in the templates."""
+    title, introduction, ingredients, steps = _recipe_parts(recipe)
+    lines: List[str] = []
+    if title:
+        lines += [f"Recipe: {title}", '']
+    if introduction:
+        lines += [introduction, '']
+    if ingredients:
+        lines.append('Ingredients:')
+        lines += [line for line in map(_ingredient_text, ingredients) if line]
+        lines.append('')
+    if steps:
+        lines.append('Instructions:')
+        lines += [f"Step {index}: {text}" for index, text in enumerate(map(_step_text, steps), 1) if text]
+    return '\n'.join(lines).strip()
+
+def narration_segments(recipe: Dict[str, Any]) -> List[Dict[str, str]]:
+    """The narration as [{'label', 'text'}]: introduction, ingredients, then one segment per step."""
+    title, introduction, ingredients, steps = _recipe_parts(recipe)
+    segments = []
+    intro = '\n'.join(line for line in (f"Recipe: {title}" if title else '', introduction) if line)
+    if intro:
+        segments.append({'label': 'Introduction', 'text': intro})
+    if ingredients:
+        lines = [line for line in map(_ingredient_text, ingredients) if line]
+        segments.append({'label': 'Ingredients', 'text': '\n'.join(['Ingredients:', *lines])})
+    for index, text in enumerate(map(_step_text, steps), 1):
+        if text:
+            segments.append({'label': f"Step {index}", 'text': f"Step {index}: {text}"})
+    return segments
+
+def narration_filename(segment_filenames: List[str], fmt: str) -> str:
+    """Content-addressed name of the joined narration, derived from its segments."""
+    digest = hashlib.sha256('\n'.join(segment_filenames).encode('utf-8')).hexdigest()
+    return f"narration_{digest}.{fmt}"
+
+class Narration:
+    """One recipe's narration: synthesizes missing segments, joins and stores the audio."""
+
+    def __init__(self, cache: AudioCache, recipe: Dict[str, Any]):
+        self.cache = cache
+        self.mp3 = cache.fmt == 'mp3'
+        if self.mp3:
+            self.segments = narration_segments(recipe)
+        else:
+            self.segments = [{'label': 'Recipe', 'text': narration_text(recipe)}]
+        self.segment_filenames = [cache.filename(segment['text']) for segment in self.segments]
+        self.filename = narration_filename(self.segment_filenames, cache.fmt)
+        self.manifest: Optional[Dict[str, Any]] = None
+        self._opened = None
+
+    def is_current(self, manifest: Optional[Dict[str, Any]]) -> bool:
+        """True when ``manifest`` describes exactly this recipe text."""
+        return bool(manifest) and manifest.get('audio_filename') == self.filename
+
+    def start(self) -> None:
+        """Start synthesizing every segment that is not stored yet, in narration order."""
+        if self._opened is None:
+            self._opened = [self.cache.open(segment['text']) for segment in self.segments]
+
+    def stream(self, on_segment: Optional[Callable[[int, int, str], None]] = None) -> Iterator[bytes]:
+        """
+        Yield the joined audio one segment at a time as each is ready, then
+        store it and set ``manifest``. ``on_segment(done, total, url)`` is
+        called after each segment with the URL it is stored under. Raises if
+        a segment fails.
+        """
+        self.start()
+        parts: List[bytes] = []
+        entries = []
+        offset, start = 0, 0.0
+        reused = 0
+        for segment, (filename, url, live) in zip(self.segments, self._opened):
+            if live is None:
+                reused += 1
+                stored = self.cache.storage.load_audio(filename)
+                if stored is None:
+                    raise RuntimeError(f"Stored audio segment {filename} could not be read")
+                sources = [stored]
+            else:
+                live.wait()
+                sources = [live.content()]
+
+            frames = Mp3FrameFilter() if self.mp3 else None
+            audio: List[bytes] = []
+            for data in sources:
+                output = frames.feed(data) if frames else data
+                if output:
+                    audio.append(output)
+                    yield output
+            tail = frames.flush() if frames else b''
+            if tail:
+                audio.append(tail)
+                yield tail
+
+            segment_audio = b''.join(audio)
+            duration = mp3_duration(segment_audio) if self.mp3 else None
+            entries.append({
+                'label': segment['label'],
+                'filename': filename,
+                'url': url or live.url,
+                'offset': offset,
+                'bytes': len(segment_audio),
+                'start': round(start, 3),
+                'duration': round(duration, 3) if duration is not None else None,
+            })
+            parts.append(segment_audio)
+            offset += len(segment_audio)
+            start += duration or 0.0
+            if on_segment:
+                on_segment(len(entries), len(self.segments), entries[-1]['url'])
+
+        audio_url = self.cache.storage.save_audio(b''.join(parts), self.filename)
+        if not audio_url:
+            raise RuntimeError('Failed to save audio')
+        logger.info(f"Narration {self.filename}: {len(entries)} segments, {reused} reused from storage")
+        self.manifest = {
+            'version': MANIFEST_VERSION,
+            'audio_filename': self.filename,
+            'audio_url': audio_url,
+            'duration': round(start, 3) if self.mp3 else None,
+            'segments': entries,
+        }
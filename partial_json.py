@@ -0,0 +1,91 @@
+# partial_json.py
+"""
+Incremental parsing of a JSON document that is still arriving.
+
+Streamed chat completions deliver the structured recipe a few characters at
+a time. IncrementalJsonParser scans each chunk once, tracking string/escape
+state and the stack of open objects and arrays, and remembers the last
+position where a value was complete. snapshot() closes the open containers
+at that point and decodes the result, so callers see every finished field
+(and every finished list item) while later ones are still being generated.
+Half-written strings and numbers are never exposed.
+"""
+import json
+from typing import Any, List, Optional
+
+class IncrementalJsonParser:
+    """Feed text chunks; snapshot() returns the completed prefix as a Python value."""
+
+    def __init__(self):
+        self.buffer = ''
+        self._stack: List[str] = []
+        # Per open container: True while an object expects a key next
+        self._expect_key: List[bool] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_is_key = False
+        self._safe_end = 0
+        self._safe_closers = ''
+        self._snapshot_end = -1
+        self._snapshot: Any = None
+
+    def feed(self, chunk: str) -> None:
+        start = len(self.buffer)
+        self.buffer += chunk
+        for offset, char in enumerate(chunk):
+            self._consume(start + offset, char)
+
+    def _mark_safe(self, end: int) -> None:
+        if self._stack:
+            self._safe_end = end
+            self._safe_closers = ''.join('}' if opener == '{' else ']' for opener in reversed(self._stack))
+
+    def _consume(self, index: int, char: str) -> None:
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif char == '\\':
+                self._escaped = True
+            elif char == '"':
+                self._in_string = False
+                if not self._string_is_key:
+                    self._mark_safe(index + 1)
+            return
+        if char == '"':
+            self._in_string = True
+            self._string_is_key = bool(self._expect_key) and self._expect_key[-1]
+        elif char in '{[':
+            self._stack.append(char)
+            self._expect_key.append(char == '{')
+        elif char in '}]':
+            if self._stack:
+                self._stack.pop()
+                self._expect_key.pop()
+            if self._stack:
+                self._mark_safe(index + 1)
+            else:
+                self._safe_end, self._safe_closers = index + 1, ''
+        elif char == ':':
+            if self._expect_key:
+                self._expect_key[-1] = False
+        elif char == ',':
+            # A number or literal before the comma is complete now
+            self._mark_safe(index)
+            if self._stack and self._stack[-1] == '{':
+                self._expect_key[-1] = True
+
+    def snapshot(self) -> Optional[Any]:
+        """The document with every incomplete trailing part dropped, or None before anything is complete."""
+        if self._safe_end == self._snapshot_end:
+            return self._snapshot
+        text = self.buffer[:self._safe_end].rstrip().rstrip(',')
+        try:
+            self._snapshot = json.loads(text + self._safe_closers)
+        except json.JSONDecodeError:
+            return self._snapshot
+        self._snapshot_end = self._safe_end
+        return self._snapshot
+
+    def result(self) -> Any:
+        """Decode the complete buffer; raises json.JSONDecodeError if it is not valid JSON."""
+        return json.loads(self.buffer)
@@ -1,8 +1,14 @@
 # process_recipe.py
+import hashlib
 import json
 from openai import OpenAI
 import os
 from dotenv import load_dotenv
+from typing import Iterator
+
+from llm_cache import content_key, llm_cache
+from partial_json import IncrementalJsonParser
+from prompt_compaction import COMPACTION_VERSION, PROMPT_MAP_REDUCE_FACTOR, PROMPT_TOKEN_BUDGET, compact_for_prompt
 
 # Load environment variables first
 load_dotenv()
@@ -17,12 +23,9 @@ else:
     # Initialize the client with the API key
     client = OpenAI(api_key=api_key)
 
-def parse_and_structure_recipe(raw_text: str) -> dict:
-    """
-    Sends the raw recipe text (or JSON-LD) to OpenAI and requests a structured JSON response.
-    """
+STRUCTURE_MODEL = "gpt-4o-mini"  # Cost-effective model, works great for structured JSON parsing
 
-    prompt = f"""
+PROMPT_TEMPLATE = """
     You are a helpful assistant. I have some raw text extracted from a recipe webpage below.
     Please read the content and extract the following in JSON format:
 
@@ -49,18 +52,46 @@ def parse_and_structure_recipe(raw_text: str) -> dict:
     {raw_text}
     """
 
+# Cached results are keyed on this, so editing the prompt, model or compaction invalidates them
+PROMPT_VERSION = hashlib.sha256(
+    f"{STRUCTURE_MODEL}\n{PROMPT_TOKEN_BUDGET}\n{PROMPT_MAP_REDUCE_FACTOR}\n{COMPACTION_VERSION}\n"
+    f"{PROMPT_TEMPLATE}".encode("utf-8")
+).hexdigest()[:16]
+
+def _is_cacheable(recipe_data: dict) -> bool:
+    """Only cache real results, never the error placeholders returned below."""
+    return bool(recipe_data.get("title") and recipe_data.get("ingredients") and recipe_data.get("instructions"))
+
+def _build_prompt(raw_text: str) -> str:
+    # Drop life stories, comments and ads so only recipe lines are sent
+    compacted_text, tokens_before, tokens_after = compact_for_prompt(raw_text)
+    print(f"Prompt input tokens: {tokens_before} -> {tokens_after}")
+    return PROMPT_TEMPLATE.format(raw_text=compacted_text)
+
+def _configuration_error() -> dict:
+    return {
+        "title": "Configuration Error",
+        "introduction": "OpenAI API key not configured. Please set the OPENAI_API_KEY environment variable.",
+        "ingredients": [],
+        "instructions": []
+    }
+
+def _parsing_error() -> dict:
+    return {
+        "title": "Error parsing recipe",
+        "introduction": "There was an error processing this recipe.",
+        "ingredients": [],
+        "instructions": []
+    }
+
+def _structure_with_openai(raw_text: str) -> dict:
     try:
         if client is None:
-            return {
-                "title": "Configuration Error",
-                "introduction": "OpenAI API key not configured. Please set the OPENAI_API_KEY environment variable.",
-                "ingredients": [],
-                "instructions": []
-            }
+            return _configuration_error()
         
         response = client.chat.completions.create(
-            model="gpt-4o-mini",  # Cost-effective model, works great for structured JSON parsing
-            messages=[{"role": "user", "content": prompt}],
+            model=STRUCTURE_MODEL,
+            messages=[{"role": "user", "content": _build_prompt(raw_text)}],
             response_format={"type": "json_object"},  # Ensures valid JSON response
             temperature=0.1  # Lower temperature for more consistent parsing
         )
@@ -75,9 +106,56 @@ def parse_and_structure_recipe(raw_text: str) -> dict:
         return recipe_data
     except Exception as e:
         print(f"Error in parse_and_structure_recipe: {str(e)}")
-        return {
-            "title": "Error parsing recipe",
-            "introduction": "There was an error processing this recipe.",
-            "ingredients": [],
-            "instructions": []
-        }
+        return _parsing_error()
+
+_cached_structure = llm_cache.memoize(_structure_with_openai, PROMPT_VERSION, cacheable=_is_cacheable)
+
+def parse_and_structure_recipe(raw_text: str) -> dict:
+    """
+    Sends the raw recipe text (or JSON-LD) to OpenAI and requests a structured JSON response.
+    Identical content (after whitespace normalization) is answered from llm_cache.
+    """
+    return _cached_structure(raw_text)
+
+def stream_parse_and_structure_recipe(raw_text: str) -> Iterator[dict]:
+    """
+    Like parse_and_structure_recipe, but streams the completion and yields the
+    recipe parsed so far each time another field or list item is complete.
+    The last value yielded is the final result.
+    """
+    key = content_key(raw_text, PROMPT_VERSION)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+    if client is None:
+        yield _configuration_error()
+        return
+
+    parser = IncrementalJsonParser()
+    last = None
+    try:
+        stream = client.chat.completions.create(
+            model=STRUCTURE_MODEL,
+            messages=[{"role": "user", "content": _build_prompt(raw_text)}],
+            response_format={"type": "json_object"},
+            temperature=0.1,
+            stream=True,
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            parser.feed(chunk.choices[0].delta.content or "")
+            snapshot = parser.snapshot()
+            if isinstance(snapshot, dict) and snapshot != last:
+                last = snapshot
+                yield snapshot
+        recipe_data = parser.result()
+    except Exception as e:
+        print(f"Error in stream_parse_and_structure_recipe: {str(e)}")
+        yield _parsing_error()
+        return
+
+    if isinstance(recipe_data, dict) and _is_cacheable(recipe_data):
+        llm_cache.put(key, recipe_data)
+    yield recipe_data
@@ -0,0 +1,195 @@
+# prompt_compaction.py
+"""
+Trim scraped page text to the recipe before it goes into the LLM prompt.
+
+When a page has no usable JSON-LD, the generic extractor can return the whole
+article: life story, ads, comments and all. compact_for_prompt() splits that
+text into line blocks and scores each one for recipe relevance:
+
+* quantity/unit density ("2 cups", "1/2 tsp", "200 g"),
+* imperative cooking verbs at the start of a line ("Preheat", "Whisk"),
+* proximity to an Ingredients/Instructions heading,
+* minus boilerplate such as comment, share and newsletter lines.
+
+The best blocks are kept, in page order, until PROMPT_TOKEN_BUDGET is
+reached. Pages more than PROMPT_MAP_REDUCE_FACTOR times over budget are first
+cut into budget-sized chunks. Each chunk is reduced on its own (map) to its
+relevant lines, so scoring stays local to the chunk, and the combined result
+is trimmed to the budget once more (reduce). Token counts use tiktoken when it
+is installed and a characters/4 estimate otherwise.
+"""
+import logging
+import os
+import re
+from typing import Callable, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', '1500'))
+PROMPT_MAP_REDUCE_FACTOR = float(os.getenv('PROMPT_MAP_REDUCE_FACTOR', '4'))
+# Part of the LLM cache key: bump it when scoring or selection changes what compaction keeps
+COMPACTION_VERSION = '1'
+# Lines after a recipe heading that still get a proximity bonus
+HEADING_REACH = 40
+
+# A number followed by a unit anywhere, or a number opening the line ("3 large eggs")
+_QUANTITY_RE = re.compile(
+    r'(?:\d+(?:[./]\d+)?|[½⅓⅔¼¾⅛])\s*(?:-\s*\d+\s*)?'
+    r'(?:(?:cups?|tbsps?|tablespoons?|tsps?|teaspoons?|oz|ounces?|lbs?|pounds?|g|grams?|kg|ml|l|liters?|'
+    r'cloves?|cans?|pinch|sticks?|slices?|inch(?:es)?|degrees|minutes?|mins?|hours?)\b|°[CF]?|개|큰술|작은술|컵)'
+    r'|^(?:\d+(?:[./]\d+)?|[½⅓⅔¼¾⅛])\s',
+    re.IGNORECASE,
+)
+_RECIPE_HEADING_RE = re.compile(
+    r'^\W*(?:ingredients?|instructions?|directions?|method|steps|preparation|how to make|'
+    r'for the [\w ]{1,30}|재료|양념|만드는 ?법|조리 ?순서)\W*$',
+    re.IGNORECASE,
+)
+_OTHER_HEADING_RE = re.compile(
+    r'^\W*(?:comments?|reviews?|related( posts| recipes)?|you may also like|more recipes|'
+    r'about (me|the author)|leave a (reply|comment)|newsletter|footer|share this)\W*$',
+    re.IGNORECASE,
+)
+_BOILERPLATE_RE = re.compile(
+    r'\b(?:reply|subscribe|newsletter|cookie|privacy policy|copyright|all rights reserved|'
+    r'pin (?:it|this)|jump to recipe|print recipe|rate this|share on|sign up|affiliate|advertisement)\b',
+    re.IGNORECASE,
+)
+_COOKING_VERBS = frozenset("""
+    add arrange bake baste beat blend boil bring broil brown brush chill chop coat combine cook cool cover
+    crack cut dice divide drain drizzle dust flip fold fry garnish grate grease grill heat knead layer let
+    line marinate mash measure melt mince mix place pour preheat press pulse reduce refrigerate remove rinse
+    roast roll saute sauté scoop season serve set shred sift simmer slice soak spoon spread sprinkle squeeze
+    stir strain stuff taste toast top toss transfer trim turn wash whisk wrap
+""".split())
+# Lines the extractors emit that must survive compaction
+_ALWAYS_KEEP_RE = re.compile(r'^(?:Title|Description|Ingredients|Instructions):', re.IGNORECASE)
+
+_encoding = None
+
+def estimate_tokens(text: str) -> int:
+    """Prompt tokens for ``text`` (tiktoken's o200k encoding when installed, else ~4 chars per token)."""
+    global _encoding
+    if not text:
+        return 0
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding('o200k_base')
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def split_blocks(text: str) -> List[str]:
+    """Non-empty lines with their whitespace collapsed."""
+    blocks = []
+    for line in text.splitlines():
+        line = re.sub(r'[ \t\r\f\v]+', ' ', line).strip()
+        if line:
+            blocks.append(line)
+    return blocks
+
+def score_blocks(blocks: List[str]) -> List[float]:
+    """Recipe relevance of each block; higher is more likely to be part of the recipe."""
+    scores = []
+    since_heading: Optional[int] = None
+    for block in blocks:
+        if _ALWAYS_KEEP_RE.match(block) or _RECIPE_HEADING_RE.match(block):
+            scores.append(float('inf'))
+            since_heading = 0
+            continue
+        if _OTHER_HEADING_RE.match(block):
+            scores.append(-5.0)
+            since_heading = None
+            continue
+
+        score = 0.0
+        words = block.split()
+        quantities = len(_QUANTITY_RE.findall(block))
+        score += 2.0 * min(quantities, 3) + min(quantities / max(len(words), 1) * 10, 3.0)
+        first_word = re.sub(r'\W', '', words[0]).lower() if words else ''
+        if first_word in _COOKING_VERBS:
+            score += 3.0
+        score += 0.5 * min(sum(1 for word in words[1:] if word.lower().strip('.,;:') in _COOKING_VERBS), 4)
+        if since_heading is not None:
+            since_heading += 1
+            score += 3.0 * max(0.0, 1 - since_heading / HEADING_REACH)
+        if _BOILERPLATE_RE.search(block):
+            score -= 4.0
+        if len(block) > 400 and quantities == 0:
+            # Long story paragraphs rarely carry recipe details
+            score -= 1.0
+        scores.append(score)
+    return scores
+
+def select_blocks(blocks: List[str], budget: int) -> List[str]:
+    """The highest-scoring blocks that fit in ``budget`` tokens, in their original order."""
+    scores = score_blocks(blocks)
+    ranked = sorted(range(len(blocks)), key=lambda i: (-scores[i], i))
+    chosen = set()
+    used = 0
+    for index in ranked:
+        if scores[index] <= 0 and used:
+            break
+        cost = estimate_tokens(blocks[index]) + 1
+        if used + cost > budget and scores[index] != float('inf'):
+            continue
+        chosen.add(index)
+        used += cost
+    return [blocks[i] for i in sorted(chosen)]
+
+def chunk_blocks(blocks: List[str], budget: int) -> List[List[str]]:
+    """Consecutive runs of blocks of about ``budget`` tokens each."""
+    chunks: List[List[str]] = [[]]
+    used = 0
+    for block in blocks:
+        cost = estimate_tokens(block) + 1
+        if chunks[-1] and used + cost > budget:
+            chunks.append([])
+            used = 0
+        chunks[-1].append(block)
+        used += cost
+    return chunks
+
+def _local_map(chunk: str, budget: int) -> str:
+    return '\n'.join(select_blocks(split_blocks(chunk), budget))
+
+def compact_for_prompt(
+    text: str,
+    budget: int = PROMPT_TOKEN_BUDGET,
+    mapper: Optional[Callable[[str, int], str]] = None,
+) -> Tuple[str, int, int]:
+    """
+    Trim ``text`` to about ``budget`` tokens of recipe-relevant lines.
+    ``mapper(chunk, chunk_budget)`` reduces one chunk of a very long page; it
+    defaults to local scoring. Returns (text, tokens_before, tokens_after).
+    """
+    before = estimate_tokens(text)
+    if budget <= 0 or before <= budget:
+        return text, before, before
+
+    blocks = split_blocks(text)
+    chunks = 0
+    if before > budget * PROMPT_MAP_REDUCE_FACTOR:
+        pieces = ['\n'.join(chunk) for chunk in chunk_blocks(blocks, budget)]
+        chunks = len(pieces)
+        map_chunk = mapper or _local_map
+        # Scoring is pure Python, so a thread pool would only add overhead under the GIL
+        mapped = [_safe_map(map_chunk, piece, budget) for piece in pieces]
+        blocks = split_blocks('\n'.join(mapped))
+
+    compacted = '\n'.join(select_blocks(blocks, budget))
+    after = estimate_tokens(compacted)
+    detail = f" (map-reduce over {chunks} chunks)" if chunks else ""
+    logger.info(f"Prompt compaction: {before} -> {after} input tokens{detail}")
+    return compacted, before, after
+
+def _safe_map(mapper: Callable[[str, int], str], chunk: str, budget: int) -> str:
+    try:
+        return mapper(chunk, budget)
+    except Exception as e:
+        logger.warning(f"Chunk reduction failed, scoring it locally: {e}")
+        return _local_map(chunk, budget)
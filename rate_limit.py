@@ -0,0 +1,267 @@
+# rate_limit.py
+"""
+Per-domain token-bucket rate limiting for the scrapers.
+
+Instead of sleeping a fixed 1-5 seconds before every fetch, callers ask the
+limiter for permission. A domain we have not touched recently goes straight
+through; we only wait when we are about to exceed that domain's budget, when
+the site told us to back off (``Retry-After`` on 429/503), or when its
+robots.txt asks for a crawl delay. robots.txt is read in the background, so
+the first request to a domain is never held up by it.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+from urllib.robotparser import RobotFileParser
+
+from http_session import domain_key, get_requests_session
+
+logger = logging.getLogger(__name__)
+
+# Sustained requests per second allowed to a single domain.
+DEFAULT_DOMAIN_RATE = float(os.getenv('SCRAPE_DOMAIN_RATE', '0.5'))
+# Requests that may be sent back-to-back to an idle domain.
+DEFAULT_DOMAIN_BURST = float(os.getenv('SCRAPE_DOMAIN_BURST', '3'))
+# Upper bound on how long we honour a Retry-After header.
+MAX_RETRY_AFTER_SECONDS = float(os.getenv('SCRAPE_MAX_RETRY_AFTER', '300'))
+# Whether to fetch robots.txt and honour its Crawl-delay.
+RESPECT_CRAWL_DELAY = os.getenv('SCRAPE_RESPECT_CRAWL_DELAY', '1') == '1'
+# Domains tracked at once; the least recently used idle ones are forgotten first.
+MAX_TRACKED_DOMAINS = int(os.getenv('SCRAPE_RATE_LIMIT_DOMAINS', '1024'))
+ROBOTS_TIMEOUT_SECONDS = 3
+ROBOTS_CACHE_SECONDS = 6 * 60 * 60
+
+class RateLimitedError(Exception):
+    """Raised when a domain cannot be fetched within the caller's maximum wait."""
+
+    def __init__(self, domain: str, wait_seconds: float):
+        self.domain = domain
+        self.wait_seconds = wait_seconds
+        super().__init__(f"{domain} is rate limited for another {wait_seconds:.0f}s")
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Parse a Retry-After header into a number of seconds.
+    Accepts both the delta-seconds and HTTP-date forms.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    current = datetime.fromtimestamp(now if now is not None else time.time(), tz=timezone.utc)
+    return max(0.0, (retry_at - current).total_seconds())
+
+def fetch_robots_crawl_delay(url: str) -> Optional[float]:
+    """Fetch robots.txt for the URL's domain and return its Crawl-delay, if any."""
+    key = domain_key(url)
+    scheme = url.split('://', 1)[0] if '://' in url else 'https'
+    robots_url = f"{scheme}://{key}/robots.txt"
+    try:
+        response = get_requests_session(url).get(robots_url, timeout=ROBOTS_TIMEOUT_SECONDS)
+        if response.status_code != 200:
+            return None
+        parser = RobotFileParser()
+        parser.parse(response.text.splitlines())
+        delay = parser.crawl_delay('*')
+        return float(delay) if delay else None
+    except Exception as e:
+        logger.debug(f"Could not read robots.txt for {key}: {e}")
+        return None
+
+def _start_daemon(target: Callable[[], None]) -> None:
+    threading.Thread(target=target, name='robots-fetch', daemon=True).start()
+
+class _TokenBucket:
+    """Token bucket that allows reservations to go into debt."""
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def reserve(self, now: float) -> float:
+        """Take one token and return how long the caller must wait to use it."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def release(self) -> None:
+        """Return a reserved token that was not used."""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+class DomainRateLimiter:
+    """Thread-safe registry of per-domain token buckets."""
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_DOMAIN_RATE,
+        burst: float = DEFAULT_DOMAIN_BURST,
+        respect_crawl_delay: bool = RESPECT_CRAWL_DELAY,
+        crawl_delay_fetcher: Callable[[str], Optional[float]] = fetch_robots_crawl_delay,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        max_domains: int = MAX_TRACKED_DOMAINS,
+        spawn: Callable[[Callable[[], None]], None] = _start_daemon,
+    ):
+        self.rate = max(rate, 1e-6)
+        self.burst = max(burst, 1.0)
+        self.respect_crawl_delay = respect_crawl_delay
+        self._crawl_delay_fetcher = crawl_delay_fetcher
+        self._clock = clock
+        self._sleep = sleep
+        self.max_domains = max(1, max_domains)
+        self._spawn = spawn
+        self._lock = threading.Lock()
+        # Least recently used first
+        self._buckets: "OrderedDict[str, _TokenBucket]" = OrderedDict()
+        # domain -> (crawl delay or None, checked_at)
+        self._crawl_delays: Dict[str, tuple] = {}
+        self.total_wait_seconds = 0.0
+        self.delayed_requests = 0
+
+    def acquire(self, url: str, max_wait: Optional[float] = None) -> float:
+        """
+        Block until a request to the URL's domain is allowed and return the time waited.
+        Raises RateLimitedError instead of sleeping when the wait exceeds ``max_wait``.
+        """
+        key = domain_key(url)
+        self._ensure_crawl_delay(url, key)
+
+        with self._lock:
+            bucket = self._bucket(key)
+            wait = bucket.reserve(self._clock())
+            if max_wait is not None and wait > max_wait:
+                bucket.release()
+                raise RateLimitedError(key, wait)
+            if wait > 0:
+                self.delayed_requests += 1
+                self.total_wait_seconds += wait
+
+        if wait > 0:
+            logger.info(f"Rate limiting {key}: waiting {wait:.2f}s")
+            self._sleep(wait)
+        return wait
+
+    def note_response(self, url: str, response: Any) -> None:
+        """Honour Retry-After on 429/503 responses by blocking the domain."""
+        status = getattr(response, 'status_code', None)
+        if status not in (429, 503):
+            return
+        headers = getattr(response, 'headers', None) or {}
+        retry_after = parse_retry_after(headers.get('Retry-After'))
+        if retry_after is None:
+            # No hint from the server: back off for a few refill intervals.
+            retry_after = 3 / self.rate
+        self.block(url, retry_after)
+
+    def note_failure(self, url: str, attempt: int) -> None:
+        """Apply a short exponential backoff after a failed attempt."""
+        self.block(url, min(2 ** attempt, 8))
+
+    def block(self, url: str, seconds: float) -> None:
+        """Prevent requests to the URL's domain for the given number of seconds."""
+        seconds = min(max(seconds, 0.0), MAX_RETRY_AFTER_SECONDS)
+        key = domain_key(url)
+        with self._lock:
+            bucket = self._bucket(key)
+            bucket.blocked_until = max(bucket.blocked_until, self._clock() + seconds)
+        logger.info(f"Backing off {key} for {seconds:.1f}s")
+
+    def set_crawl_delay(self, url: str, delay: Optional[float]) -> None:
+        """Cap a domain's rate to one request per ``delay`` seconds."""
+        key = domain_key(url)
+        with self._lock:
+            self._crawl_delays[key] = (delay, self._clock())
+            bucket = self._bucket(key)
+            if delay and delay > 0:
+                bucket.rate = min(self.rate, 1.0 / delay)
+                bucket.capacity = 1.0
+                bucket.tokens = min(bucket.tokens, 1.0)
+            else:
+                bucket.rate = self.rate
+                bucket.capacity = self.burst
+
+    def set_rate(self, rate: float) -> None:
+        """Change the sustained per-domain rate; robots.txt crawl delays still cap it."""
+        with self._lock:
+            self.rate = max(rate, 1e-6)
+            for key, bucket in self._buckets.items():
+                delay = self._crawl_delays.get(key, (None,))[0]
+                bucket.rate = min(self.rate, 1.0 / delay) if delay and delay > 0 else self.rate
+
+    def stats(self) -> Dict[str, Any]:
+        """Return limiter counters for diagnostics."""
+        with self._lock:
+            return {
+                'domains': len(self._buckets),
+                'delayed_requests': self.delayed_requests,
+                'total_wait_seconds': round(self.total_wait_seconds, 3),
+            }
+
+    def _bucket(self, key: str) -> _TokenBucket:
+        """Return the bucket for a domain. Caller must hold the lock."""
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            self._buckets.move_to_end(key)
+            return bucket
+        now = self._clock()
+        bucket = _TokenBucket(self.rate, self.burst, now)
+        self._buckets[key] = bucket
+        if len(self._buckets) > self.max_domains:
+            self._evict(now)
+        return bucket
+
+    def _evict(self, now: float) -> None:
+        """
+        Forget the least recently used domain that is not backing off (the
+        oldest one if every domain is). Caller must hold the lock.
+        """
+        victim = next((key for key, bucket in self._buckets.items() if bucket.blocked_until <= now), None)
+        if victim is None:
+            victim = next(iter(self._buckets))
+        del self._buckets[victim]
+        self._crawl_delays.pop(victim, None)
+
+    def _ensure_crawl_delay(self, url: str, key: str) -> None:
+        """
+        Look up robots.txt Crawl-delay once per domain (refreshed every few
+        hours). The lookup runs in the background; until it finishes the
+        domain gets the default budget.
+        """
+        if not self.respect_crawl_delay:
+            return
+        with self._lock:
+            cached = self._crawl_delays.get(key)
+            if cached and self._clock() - cached[1] < ROBOTS_CACHE_SECONDS:
+                return
+            # Record the lookup up front so concurrent callers do not refetch.
+            self._crawl_delays[key] = (cached[0] if cached else None, self._clock())
+        self._spawn(lambda: self._refresh_crawl_delay(url))
+
+    def _refresh_crawl_delay(self, url: str) -> None:
+        try:
+            delay = self._crawl_delay_fetcher(url)
+        except Exception as e:
+            logger.debug(f"Crawl-delay lookup failed for {domain_key(url)}: {e}")
+            return
+        self.set_crawl_delay(url, delay)
+
+rate_limiter = DomainRateLimiter()
@@ -0,0 +1,430 @@
+# recipe_pipeline.py
+"""
+Fetch-once, parse-once recipe extraction shared by both scrapers.
+
+The page is fetched a single time and wrapped in a RecipeDocument that lazily
+holds the soup-free JSON-LD scan and one parsed tree. Every extraction
+strategy runs against that shared document:
+
+1. JSON-LD Recipe (scrape.get_structured_data_from_html)
+2. Dedicated site handlers (10000recipe, Maangchi)
+3. Site selectors from the site_extractors registry
+4. Generic recipe heuristics
+
+The order of transports and of the site-specific strategies is learned per
+domain (strategy_memory), so a site's usual winner runs first. JSON-LD always
+runs first and the generic heuristics always run last. A different transport
+is only used when it can actually help: when the fetch failed, was slow or
+came back as a block page, or when the page fetched fine but had no recipe
+and a JavaScript-rendering transport is available. The HTTP transports are
+raced with hedging.hedged_race, and the whole run has one deadline.
+"""
+import logging
+import threading
+import time
+from functools import partial
+from itertools import groupby
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from bs4 import BeautifulSoup
+
+from circuit_breaker import BLOCKING_STATUSES, CircuitOpenError, classify_failure, guard, record_result
+from enhanced_scraping import EnhancedRecipeScraper, format_recipe_text
+from hedging import HEDGE_DEADLINE, HEDGE_DELAY, SCRAPE_HEDGED, hedged_race
+from html_cache import html_cache
+from html_parsing import HTML_PARTIAL_PARSE, make_soup, partial_parsing_supported
+from http_session import get_cloudscraper, get_requests_session
+from rate_limit import RateLimitedError, rate_limiter
+from scrape import (
+    IS_PRODUCTION,
+    SELENIUM_AVAILABLE,
+    extract_generic_content,
+    extract_site_specific_content,
+    fetch_html,
+    fetch_with_selenium,
+    format_structured_recipe,
+    get_random_headers,
+    get_structured_data_from_html,
+    looks_blocked,
+    remove_non_content,
+)
+import site_extractors
+from strategy_memory import StrategyMemory, strategy_memory
+
+logger = logging.getLogger(__name__)
+
+NO_CONTENT = "No recipe content found"
+
+_site_scraper = EnhancedRecipeScraper()
+
+class Transport:
+    """A way of fetching a page's HTML."""
+
+    def __init__(self, name: str, fetch: Callable[[str], str], renders_js: bool = False):
+        self.name = name
+        self.fetch = fetch
+        self.renders_js = renders_js
+
+def _browser_headers(url: str) -> Dict[str, str]:
+    headers = get_random_headers()
+    parsed_url = urlparse(url)
+    headers['Referer'] = f"{parsed_url.scheme}://{parsed_url.netloc}/"
+    return headers
+
+def _fetch_cloudscraper(url: str) -> str:
+    return fetch_html(url, get_cloudscraper(url), _browser_headers(url), timeout=30)
+
+def _fetch_requests(url: str) -> str:
+    return fetch_html(url, get_requests_session(url), _browser_headers(url), timeout=15)
+
+def default_transports() -> List[Transport]:
+    """Transports in the order they are tried. Selenium only runs outside production."""
+    transports = [
+        Transport('cloudscraper', _fetch_cloudscraper),
+        Transport('requests', _fetch_requests),
+    ]
+    if SELENIUM_AVAILABLE and not IS_PRODUCTION:
+        transports.append(Transport('selenium', fetch_with_selenium, renders_js=True))
+    return transports
+
+class RecipeDocument:
+    """One fetched page, parsed at most once per pass and shared by every strategy."""
+
+    def __init__(self, url: str, html: str, transport: str):
+        self.url = url
+        self.html = html
+        self.transport = transport
+        self._structured_data: Any = False
+        self._partial_soup: Optional[BeautifulSoup] = None
+        self._full_soup: Optional[BeautifulSoup] = None
+
+    @property
+    def structured_data(self) -> Optional[Dict[str, Any]]:
+        """The first complete JSON-LD Recipe on the page, found without a DOM."""
+        if self._structured_data is False:
+            self._structured_data = get_structured_data_from_html(self.html)
+        return self._structured_data
+
+    def parse_passes(self) -> List[bool]:
+        """Parse modes to try in order: the recipe-subtree parse first when supported, then the full page."""
+        if HTML_PARTIAL_PARSE and partial_parsing_supported():
+            return [True, False]
+        return [False]
+
+    def soup(self, partial: bool) -> BeautifulSoup:
+        """The partial or full tree, parsed on first use."""
+        if partial:
+            if self._partial_soup is None:
+                self._partial_soup = self._parse(partial=True)
+            return self._partial_soup
+        if self._full_soup is None:
+            self._full_soup = self._parse(partial=False)
+        return self._full_soup
+
+    def _parse(self, partial: bool) -> BeautifulSoup:
+        extra_selectors = site_extractors.lookup(self.url).all_selectors()
+        soup = make_soup(self.html, partial=partial, extra_selectors=extra_selectors)
+        remove_non_content(soup)
+        return soup
+
+class ExtractionResult:
+    """Outcome of one pipeline run."""
+
+    def __init__(self):
+        self.success = False
+        self.text = ""
+        self.transport: Optional[str] = None
+        self.strategy: Optional[str] = None
+        self.structured_data: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        # Seconds until the domain may be fetched again when the run was rate limited
+        self.retry_after: Optional[float] = None
+        self.fetches = 0
+        self.elapsed = 0.0
+
+    def to_text(self) -> str:
+        """Recipe text on success, or an 'Error scraping recipe:' message the app treats as a failure."""
+        if self.success:
+            return self.text
+        return f"Error scraping recipe: {self.error or 'Failed to extract recipe content'}"
+
+def _has_recipe_sections(text: str) -> bool:
+    return "Ingredients:" in text and "Instructions:" in text
+
+def _json_ld_strategy(doc: RecipeDocument, partial: bool) -> Optional[str]:
+    return format_structured_recipe(doc.structured_data) if doc.structured_data else None
+
+def _site_handler_strategy(doc: RecipeDocument, partial: bool) -> Optional[str]:
+    return extract_site_specific_content(doc.soup(partial), doc.url)
+
+def _site_selector_strategy(doc: RecipeDocument, partial: bool) -> Optional[str]:
+    recipe = _site_scraper.extract_with_site_selectors(doc.soup(partial), doc.url)
+    if not (recipe['ingredients'] or recipe['instructions']):
+        return None
+    return format_recipe_text(recipe)
+
+def _generic_strategy(doc: RecipeDocument, partial: bool) -> Optional[str]:
+    text = extract_generic_content(doc.soup(partial))
+    return None if text == NO_CONTENT else text
+
+# Default order; strategy_memory reorders the ones between the first and the fallback.
+STRATEGIES: List[Tuple[str, Callable[[RecipeDocument, bool], Optional[str]]]] = [
+    ('json_ld', _json_ld_strategy),
+    ('site_handler', _site_handler_strategy),
+    ('site_selectors', _site_selector_strategy),
+    ('generic', _generic_strategy),
+]
+# Strategies that read raw HTML rather than a parsed tree run in the first pass only.
+SOUP_FREE_STRATEGIES = {'json_ld'}
+# Cheapest and most complete when present, so it is never ranked behind anything
+FIRST_STRATEGY = 'json_ld'
+# Catch-all heuristics: always last, and winning says nothing about the others
+FALLBACK_STRATEGY = 'generic'
+
+def strategy_order(url: str, memory: StrategyMemory) -> List[str]:
+    """JSON-LD, then the site-specific strategies in learned order, then the generic fallback."""
+    ranked = [name for name, _ in STRATEGIES if name not in (FIRST_STRATEGY, FALLBACK_STRATEGY)]
+    return [FIRST_STRATEGY] + memory.rank(url, 'extractor', ranked) + [FALLBACK_STRATEGY]
+
+def first_choice_won(transport: Transport, transports: List[Transport], strategy: str, order: List[str]) -> bool:
+    """
+    Whether the learned ordering picked right: the first-ranked transport won,
+    and, when a ranked strategy won, it was the first-ranked one. JSON-LD and
+    the fallback are never reordered, so their wins only judge the transport.
+    """
+    ranked = order[1:-1]
+    return transport is transports[0] and (strategy not in ranked or strategy == ranked[0])
+
+def run_strategies(doc: RecipeDocument, order: Optional[List[str]] = None) -> Optional[Tuple[str, str]]:
+    """Run extraction strategies (in ``order``, by name) against one document. Returns (strategy, text) or None."""
+    strategies = dict(STRATEGIES)
+    names = order or [name for name, _ in STRATEGIES]
+    passes = doc.parse_passes()
+    for is_partial in passes:
+        for name in names:
+            soup_free = name in SOUP_FREE_STRATEGIES
+            if soup_free and is_partial is not passes[0]:
+                continue
+            try:
+                text = strategies[name](doc, is_partial)
+            except Exception as e:
+                logger.warning(f"Strategy {name} failed on {doc.url}: {e}")
+                continue
+            if not text:
+                continue
+            # A partial tree may be missing sections the full page has
+            if is_partial and not soup_free and not _has_recipe_sections(text):
+                continue
+            return name, text
+        if is_partial:
+            logger.info("Partial parse missed recipe sections, parsing the full document")
+    return None
+
+def _fetch(
+    transport: Transport,
+    url: str,
+    max_retries: int,
+    cancel: Optional[threading.Event] = None,
+) -> Tuple[Optional[str], Optional[str], Optional[int]]:
+    """
+    Fetch with one transport, retrying only transient errors.
+    Returns (html, error, status); client errors and blocking statuses are not retried.
+    """
+    error = None
+    status = None
+    for attempt in range(max_retries):
+        if cancel is not None and cancel.is_set():
+            return None, error or 'cancelled', status
+        try:
+            return transport.fetch(url), None, None
+        except RateLimitedError:
+            raise
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            error = str(e)
+            if status is not None and (status in BLOCKING_STATUSES or 400 <= status < 500):
+                return None, error, status
+        except Exception as e:
+            error = str(e)
+        logger.warning(f"{transport.name} attempt {attempt + 1}/{max_retries} failed for {url}: {error}")
+        if attempt < max_retries - 1:
+            rate_limiter.note_failure(url, attempt)
+    return None, error, status
+
+class TransportAttempt:
+    """What one transport's fetch and extraction produced."""
+
+    def __init__(self, transport: Transport):
+        self.transport = transport
+        self.fetched = False
+        self.doc: Optional[RecipeDocument] = None
+        self.outcome: Optional[Tuple[str, str]] = None
+        self.error: Optional[str] = None
+        self.failure: Optional[str] = None
+        self.rate_limited: Optional[RateLimitedError] = None
+        self.latency = 0.0
+        self.extract_latency = 0.0
+
+def _attempt_transport(
+    transport: Transport,
+    url: str,
+    max_retries: int,
+    order: List[str],
+    need_js: threading.Event,
+    cancel: threading.Event,
+) -> Optional[TransportAttempt]:
+    """Fetch with one transport and run the strategies; None when there was no point in trying."""
+    if need_js.is_set() and not transport.renders_js:
+        # Same HTML again would not help; only a rendering transport can
+        return None
+
+    logger.info(f"Fetching {url} with {transport.name}")
+    attempt = TransportAttempt(transport)
+    started = time.monotonic()
+    try:
+        html, error, status = _fetch(transport, url, max_retries, cancel)
+    except RateLimitedError as e:
+        attempt.rate_limited = e
+        return attempt
+    attempt.fetched = True
+    if html is None:
+        attempt.error, attempt.failure = error, classify_failure(error, status)
+        attempt.latency = time.monotonic() - started
+        return attempt
+
+    doc = RecipeDocument(url, html, transport.name)
+    extract_started = time.monotonic()
+    attempt.outcome = run_strategies(doc, order)
+    attempt.latency = time.monotonic() - started
+    if attempt.outcome:
+        attempt.doc = doc
+        attempt.extract_latency = time.monotonic() - extract_started
+        return attempt
+
+    # Do not let the next transport reread the same page from the cache
+    html_cache.invalidate(url)
+    if looks_blocked(html):
+        attempt.error, attempt.failure = f"{transport.name} received a blocked page", 'blocked'
+    else:
+        attempt.error, attempt.failure = NO_CONTENT, 'no_recipe'
+        need_js.set()
+    return attempt
+
+def _stages(transports: List[Transport]) -> List[List[Transport]]:
+    """Split ranked transports into runs of the same kind; each run is raced, runs go in turn."""
+    return [list(group) for _, group in groupby(transports, key=lambda transport: transport.renders_js)]
+
+_FAILURE_SEVERITY = {'no_recipe': 0, 'bad_url': 1, 'error': 2, 'blocked': 3}
+
+def _worse_failure(current: Optional[str], new: str) -> str:
+    if current is None or _FAILURE_SEVERITY[new] > _FAILURE_SEVERITY[current]:
+        return new
+    return current
+
+def extract_recipe(
+    url: str,
+    max_retries: int = 2,
+    transports: Optional[List[Transport]] = None,
+    memory: Optional[StrategyMemory] = None,
+    hedged: Optional[bool] = None,
+    deadline: float = HEDGE_DEADLINE,
+) -> ExtractionResult:
+    """
+    Fetch the page once and run every extraction strategy on the shared document.
+    Transports and strategies that won on this domain before are tried first.
+    The HTTP transports race each other (staggered by SCRAPE_HEDGE_DELAY unless
+    ``hedged`` is off) and the whole run gives up after ``deadline`` seconds,
+    so a slow site cannot outlast the gunicorn worker timeout.
+    URLs that just failed and domains whose circuit is open fail fast.
+    """
+    result = ExtractionResult()
+    started = time.monotonic()
+    try:
+        guard(url)
+    except CircuitOpenError as e:
+        result.error = str(e)
+        return result
+
+    memory = memory if memory is not None else strategy_memory
+    hedged = SCRAPE_HEDGED if hedged is None else hedged
+    transports = transports if transports is not None else default_transports()
+    transports = memory.rank(url, 'transport', transports, key=lambda transport: transport.name)
+    order = strategy_order(url, memory)
+    outcomes = []
+    need_js = threading.Event()
+    finished: List[TransportAttempt] = []
+    # Worst failure seen: 'blocked' beats 'error' beats 'bad_url' beats 'no_recipe'
+    failure = None
+
+    def settle(attempt: TransportAttempt) -> bool:
+        # Called by hedged_race on this thread for every attempt that finishes in time
+        finished.append(attempt)
+        if attempt.rate_limited is not None:
+            # Ends the race without counting the transport as a winner
+            raise attempt.rate_limited
+        if attempt.fetched:
+            result.fetches += 1
+            outcomes.append(('transport', attempt.transport.name, bool(attempt.outcome), attempt.latency))
+        return bool(attempt.outcome)
+
+    try:
+        for stage in _stages(transports):
+            remaining = deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            if need_js.is_set() and not stage[0].renders_js:
+                continue
+
+            winner = hedged_race(
+                [
+                    (transport.name, partial(_attempt_transport, transport, url, max_retries, order, need_js))
+                    for transport in stage
+                ],
+                accept=settle,
+                hedge_delay=HEDGE_DELAY if hedged else remaining,
+                deadline=remaining,
+            )
+            attempt = winner[1] if winner else None
+            if attempt is None:
+                for done in finished:
+                    if done.failure:
+                        failure = _worse_failure(failure, done.failure)
+                        result.error = done.error
+                finished.clear()
+                continue
+
+            transport = attempt.transport
+            result.success = True
+            result.strategy, result.text = attempt.outcome
+            result.transport = transport.name
+            result.structured_data = attempt.doc.structured_data
+            if result.strategy != FALLBACK_STRATEGY:
+                # Strategies ranked ahead of the winner missed on this page
+                for name in order[:order.index(result.strategy)]:
+                    outcomes.append(('extractor', name, False, 0.0))
+                outcomes.append(('extractor', result.strategy, True, attempt.extract_latency))
+            memory.note_result(first_choice_won(transport, transports, result.strategy, order))
+            record_result(url, None)
+            logger.info(f"Extracted {url} with {transport.name} + {result.strategy}")
+            return result
+        if time.monotonic() - started >= deadline:
+            logger.warning(f"Giving up on {url} after {deadline:.0f}s")
+            result.error = f"Gave up after {deadline:.0f}s"
+            failure = _worse_failure(failure, 'error')
+        memory.note_result(False)
+        record_result(url, failure or 'error')
+    except RateLimitedError as e:
+        result.error = str(e)
+        result.retry_after = e.wait_seconds
+        record_result(url, 'rate_limited')
+    finally:
+        result.elapsed = time.monotonic() - started
+        memory.record(url, outcomes)
+
+    return result
+
+def extract_recipe_text(url: str) -> str:
+    """Pipeline entry point returning text in the format the scrapers always returned."""
+    return extract_recipe(url).to_text()
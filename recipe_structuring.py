@@ -0,0 +1,204 @@
+# recipe_structuring.py
+"""
+Deterministic structuring of schema.org Recipe data.
+
+When the extraction pipeline finds a complete JSON-LD Recipe there is no need
+to flatten it to text and ask the LLM to turn it back into JSON. This module
+builds the same {title, introduction, ingredients[{quantity, item}],
+instructions[]} shape directly. Ingredient lines go through a regex-based
+quantity/item splitter, and each ingredient's quantity is added to the step
+where that ingredient is first used, as the LLM prompt asks for.
+
+Every local result gets a confidence score. structure_recipe() falls back to
+process_recipe.parse_and_structure_recipe when the score is below
+STRUCTURING_MIN_CONFIDENCE or a required field is missing.
+"""
+import logging
+import os
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from scrape import structured_recipe_fields
+
+logger = logging.getLogger(__name__)
+
+STRUCTURING_ENABLED = os.getenv('STRUCTURING_ENABLED', '1') == '1'
+STRUCTURING_MIN_CONFIDENCE = float(os.getenv('STRUCTURING_MIN_CONFIDENCE', '0.75'))
+INTRODUCTION_MAX_CHARS = 300
+
+_FRACTIONS = '½⅓⅔¼¾⅕⅖⅗⅘⅙⅚⅛⅜⅝⅞'
+# Fractions go first, so the "1" of "1/2" is not taken as a whole number
+_NUMBER = rf'(?:\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?(?![/\d])(?:\s*[{_FRACTIONS}])?|[{_FRACTIONS}])'
+_AMOUNT = rf'{_NUMBER}(?:\s*(?:-|–|to|or)\s*{_NUMBER})?'
+_UNITS = (
+    'cups?', 'c', 'tablespoons?', 'tbsps?', 'tbs', 'tbl', 'T', 'teaspoons?', 'tsps?', 't',
+    'ounces?', 'oz', 'fl\\.? ?oz', 'pounds?', 'lbs?', 'grams?', 'g', 'kilograms?', 'kg',
+    'milliliters?', 'millilitres?', 'ml', 'liters?', 'litres?', 'l', 'quarts?', 'qts?', 'pints?', 'pts?',
+    'gallons?', 'pinch(?:es)?', 'dash(?:es)?', 'cloves?', 'cans?', 'jars?', 'packages?', 'pkgs?',
+    'sticks?', 'slices?', 'sprigs?', 'bunch(?:es)?', 'handfuls?', 'heads?', 'stalks?', 'pieces?',
+    'inch(?:es)?', 'cm', 'bags?', 'boxes?', 'bottles?', 'sheets?', 'drops?', 'leaves', 'leaf',
+)
+_UNIT = rf'(?:{"|".join(_UNITS)})\.?(?![\w])'
+_LEADING_QUANTITY_RE = re.compile(
+    rf'^(?P<quantity>{_AMOUNT}(?:\s*\([^)]*\))?(?:[\s-]*{_UNIT})?'
+    rf'|(?:an?\s+)?(?:pinch|dash|handful|splash|few)(?:es)?\b)'
+    rf'(?:\s+of\b)?[\s,]*(?P<item>.*)$',
+    re.IGNORECASE,
+)
+# "양파 1개", "간장 2큰술", "계란 2", "Flour 2 cups": quantity after the item. An English
+# amount needs a unit, so "Juice of 1 lime", "Serves 4" and "Preheat oven to 350" are
+# not split; Korean counters such as 개 and 큰술 are attached to the number
+_TRAILING_QUANTITY_RE = re.compile(
+    rf'^(?P<item>.*?\S)\s+(?P<quantity>{_AMOUNT}\s*{_UNIT}'
+    rf'|(?<=[^\x00-\x7f]\s){_AMOUNT}|{_AMOUNT}[^\x00-\x7f\s\d]{{1,4}})$'
+)
+_TO_TASTE_RE = re.compile(r'^(?P<item>.*?)[,\s]+(?P<quantity>to taste|as needed|for serving|optional)\.?$', re.IGNORECASE)
+_HTML_TAG_RE = re.compile(r'<[a-zA-Z/][^>]*>')
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+')
+_ITEM_NOISE_RE = re.compile(r'\([^)]*\)|,.*$')
+_WORD_RE = re.compile(r'[^\W\d_]{3,}', re.UNICODE)
+
+counters = {'local': 0, 'llm': 0}
+
+def split_ingredient(line: str) -> Dict[str, str]:
+    """Split an ingredient line into {'quantity', 'item'}; quantity is '' when none is found."""
+    text = re.sub(r'\s+', ' ', line or '').strip()
+    match = _LEADING_QUANTITY_RE.match(text)
+    if match and match.group('item'):
+        return {'quantity': match.group('quantity').strip(), 'item': match.group('item').strip()}
+    match = _TO_TASTE_RE.match(text) or _TRAILING_QUANTITY_RE.match(text)
+    if match and match.group('item'):
+        return {'quantity': match.group('quantity').strip(), 'item': match.group('item').strip(' ,')}
+    return {'quantity': '', 'item': text}
+
+def _introduction(description: str) -> str:
+    """The first one or two sentences of the description."""
+    if not description:
+        return ''
+    sentences = _SENTENCE_END_RE.split(description)
+    intro = ' '.join(sentences[:2])
+    if len(intro) > INTRODUCTION_MAX_CHARS:
+        intro = sentences[0]
+    if len(intro) > INTRODUCTION_MAX_CHARS:
+        intro = intro[:INTRODUCTION_MAX_CHARS].rsplit(' ', 1)[0] + '…'
+    return intro
+
+def _ingredient_keys(item: str) -> List[str]:
+    """Words to look for in the steps: the whole item name, then its last word."""
+    name = _ITEM_NOISE_RE.sub('', item).strip().lower()
+    words = _WORD_RE.findall(name)
+    keys = [name] if name else []
+    if words:
+        last = words[-1]
+        keys.append(last[:-1] if last.endswith('s') and len(last) > 3 else last)
+    return keys
+
+def _key_pattern(key: str) -> 're.Pattern[str]':
+    """Whole-word match for an ingredient key, allowing a plural ("egg" finds "eggs", not "eggplant")."""
+    if key[-1].isascii():
+        return re.compile(rf'\b{re.escape(key)}(?:e?s)?\b', re.IGNORECASE)
+    # Korean particles attach to the noun ("양파를"), so the rest of the word goes with it
+    return re.compile(rf'(?<!\w){re.escape(key)}\w*', re.IGNORECASE)
+
+def _mentions_quantity(step: str, quantity: str) -> bool:
+    """True when ``quantity`` appears in ``step`` as a whole amount ("1" is not found in "10" or "1/2")."""
+    tail = r'(?![\d/]|[.,]\d)' + (r'\b' if quantity[-1].isascii() and quantity[-1].isalpha() else '')
+    return re.search(rf'(?<![\d./,]){re.escape(quantity)}{tail}', step, re.IGNORECASE) is not None
+
+def add_first_use_quantities(instructions: List[str], ingredients: List[Dict[str, str]]) -> List[str]:
+    """Mention each ingredient's quantity in the first step that uses it, unless the step already does."""
+    steps = list(instructions)
+    for ingredient in ingredients:
+        quantity = ingredient['quantity']
+        if not quantity or not re.search(r'\d|[' + _FRACTIONS + ']', quantity):
+            continue
+        for key in _ingredient_keys(ingredient['item']):
+            pattern = _key_pattern(key)
+            index = next((i for i, step in enumerate(steps) if pattern.search(step)), None)
+            if index is None:
+                continue
+            if not _mentions_quantity(steps[index], quantity):
+                steps[index] = pattern.sub(lambda m: f"{m.group(0)} ({quantity})", steps[index], count=1)
+            break
+    return steps
+
+def structure_from_json_ld(structured_data: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+    """
+    Build the app's recipe dict from a JSON-LD Recipe.
+    Returns (recipe, confidence in [0, 1]); confidence is 0 when a required field is missing.
+    """
+    fields = structured_recipe_fields(structured_data)
+    ingredients = [split_ingredient(line) for line in fields['ingredients']]
+    recipe = {
+        'title': fields['title'],
+        'introduction': _introduction(fields['description']),
+        'ingredients': ingredients,
+        'instructions': add_first_use_quantities(fields['instructions'], ingredients),
+    }
+    if not (recipe['title'] and ingredients and recipe['instructions']):
+        return recipe, 0.0
+
+    confidence = 1.0
+    if len(ingredients) < 2:
+        confidence -= 0.3
+    if sum(1 for ingredient in ingredients if ingredient['quantity']) < len(ingredients) / 2:
+        # Mostly unquantified lines are often section headings or prose
+        confidence -= 0.3
+    if len(recipe['instructions']) == 1 and len(recipe['instructions'][0]) > 400:
+        # The whole method in one blob; the LLM splits it into steps
+        confidence -= 0.3
+    texts = [recipe['title'], *fields['ingredients'], *fields['instructions']]
+    if any(_HTML_TAG_RE.search(text) for text in texts):
+        confidence -= 0.4
+    if not recipe['introduction']:
+        confidence -= 0.1
+    return recipe, max(confidence, 0.0)
+
+def _confident_local_recipe(structured_data: Optional[Dict[str, Any]], min_confidence: float) -> Optional[Dict[str, Any]]:
+    """The locally structured recipe when it clears ``min_confidence``; counts which path was taken."""
+    if STRUCTURING_ENABLED and structured_data:
+        recipe, confidence = structure_from_json_ld(structured_data)
+        if confidence >= min_confidence:
+            counters['local'] += 1
+            return recipe
+        logger.info(f"Local structuring confidence {confidence:.2f} below {min_confidence}; using the LLM")
+    counters['llm'] += 1
+    return None
+
+def _llm_structure(raw_text: str) -> Dict[str, Any]:
+    from process_recipe import parse_and_structure_recipe
+    return parse_and_structure_recipe(raw_text)
+
+def _llm_stream(raw_text: str) -> Iterator[Dict[str, Any]]:
+    from process_recipe import stream_parse_and_structure_recipe
+    return stream_parse_and_structure_recipe(raw_text)
+
+def structure_recipe(
+    raw_text: str,
+    structured_data: Optional[Dict[str, Any]] = None,
+    llm: Callable[[str], Dict[str, Any]] = _llm_structure,
+    min_confidence: float = STRUCTURING_MIN_CONFIDENCE,
+) -> Dict[str, Any]:
+    """Structure a recipe locally from its JSON-LD when confident enough, otherwise with the LLM."""
+    recipe = _confident_local_recipe(structured_data, min_confidence)
+    if recipe is not None:
+        return recipe
+    return llm(raw_text)
+
+def stream_structure_recipe(
+    raw_text: str,
+    structured_data: Optional[Dict[str, Any]] = None,
+    llm_stream: Callable[[str], Iterator[Dict[str, Any]]] = _llm_stream,
+    min_confidence: float = STRUCTURING_MIN_CONFIDENCE,
+) -> Iterator[Dict[str, Any]]:
+    """Streaming structure_recipe: yields partial recipes as they grow; the last one is final."""
+    recipe = _confident_local_recipe(structured_data, min_confidence)
+    if recipe is not None:
+        yield recipe
+        return
+    yield from llm_stream(raw_text)
+
+def structuring_stats() -> Dict[str, Any]:
+    """How many recipes were structured locally vs. by the LLM."""
+    total = counters['local'] + counters['llm']
+    return dict(counters, local_rate=round(counters['local'] / total, 3) if total else 0.0)
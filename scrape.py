@@ -5,7 +5,8 @@ import time
 import json
 import re
 import html
-from typing import Optional, Dict, Any
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
 from urllib.parse import urlparse
 import logging
 import random
@@ -13,27 +14,43 @@ try:
     from fake_useragent import UserAgent  # optional
 except ImportError:
     UserAgent = None
-import cloudscraper
 import brotli
 import gzip
 import io
 import os
+import codecs
+import zlib
 
-# Try to import Selenium dependencies - they may not be available on Heroku
-try:
-    import undetected_chromedriver as uc
-    from selenium.webdriver.common.by import By
-    from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.webdriver.support import expected_conditions as EC
-    SELENIUM_AVAILABLE = True
-except ImportError:
-    SELENIUM_AVAILABLE = False
+from circuit_breaker import CHALLENGE_PAGE_MARKERS, guarded_scrape
+from html_cache import html_cache
+from html_parsing import HTML_PARTIAL_PARSE, make_soup, partial_parsing_supported
+from http_session import get_cloudscraper
+from rate_limit import RateLimitedError, rate_limiter
+import site_extractors
+
+# Selenium dependencies may not be available on Heroku
+from browser_pool import SELENIUM_AVAILABLE, fetch_rendered_html
+
+if not SELENIUM_AVAILABLE:
     logging.warning("Selenium dependencies not available - will use cloudscraper only")
 
 # Detect if running on Heroku or in a production environment
 IS_HEROKU = os.environ.get('DYNO') is not None
 IS_PRODUCTION = os.environ.get('PYTHON_ENV') == 'production' or IS_HEROKU
 
+# Longest we will wait on a domain's rate limit inside a web request
+RATE_LIMIT_MAX_WAIT = float(os.environ.get('SCRAPE_MAX_RATE_WAIT', '20'))
+
+# Stream page bodies and stop reading once a complete JSON-LD Recipe has arrived
+STREAM_FETCH = os.environ.get('SCRAPE_STREAM_FETCH', '1') == '1'
+# Hard cap on decoded HTML held per request
+MAX_BODY_BYTES = int(os.environ.get('SCRAPE_MAX_BODY_BYTES', str(5 * 1024 * 1024)))
+STREAM_CHUNK_SIZE = 16 * 1024
+
+_JSON_LD_OPEN_RE = re.compile(r'<script\b[^>]*\btype\s*=\s*["\']?application/ld\+json["\']?[^>]*>', re.IGNORECASE)
+_SCRIPT_CLOSE_RE = re.compile(r'</script\s*>', re.IGNORECASE)
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([A-Za-z0-9_\-]+)', re.IGNORECASE)
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -54,12 +71,98 @@ def _is_recipe_type(type_value: Any) -> bool:
         return any(_is_recipe_type(item) for item in type_value)
     return False
 
+# Control characters (invalid inside JSON strings) become spaces, as some recipe
+# plugins inject literal CR/LF into string values.
+_CONTROL_CHAR_TABLE = {code: ' ' for code in list(range(0x20)) + [0x7F]}
+# Outside a value only an opening bracket matters.
+_JSON_OPEN_RE = re.compile(r'[{\[]')
+# Inside a value: a whole string (an unterminated one runs to the end) or a bracket.
+_JSON_TOKEN_RE = re.compile(r'"[^"\\]*+(?:\\.[^"\\]*+)*+(?:"|\\?\Z)|[{}\[\]]', re.S)
+# Levels of a broken value searched for intact nested values (e.g. one bad node in an @graph)
+JSON_LD_RECOVERY_DEPTH = 4
+# Deeper nesting than this is treated as garbage (json itself recurses per level)
+JSON_LD_MAX_NESTING = 512
+
 def _sanitize_json_ld_text(text: str) -> str:
     """
     Remove non-printable control characters that often appear in broken JSON-LD.
     Some recipe plugins inject literal CR/LF inside string values, which is invalid JSON.
     """
-    return re.sub(r'[\x00-\x1F\x7F]', ' ', text)
+    return text.translate(_CONTROL_CHAR_TABLE)
+
+def _scan_json_spans(text: str, start: int = 0, end: Optional[int] = None) -> Iterator[tuple]:
+    """
+    Find JSON array/object boundaries in text[start:end] in one left-to-right pass.
+
+    Yields (start, end, balanced, children) per top-level value. Strings, with
+    their escapes, are skipped as single regex tokens, so brackets inside them
+    are ignored. ``children`` holds the complete values nested up to
+    JSON_LD_RECOVERY_DEPTH levels down, in the same form, so a value that fails
+    to decode can be searched for intact parts without rescanning. A value with
+    mismatched brackets, or still open at the end, has balanced=False and the
+    complete values found inside it as children.
+    """
+    end = len(text) if end is None else end
+    pos = start
+    while pos < end:
+        opener = _JSON_OPEN_RE.search(text, pos, end)
+        if not opener:
+            return
+        pos = opener.end()
+        stack = [opener.group()]
+        starts = [opener.start()]
+        children: list[list] = [[]]
+        while True:
+            if len(stack) > JSON_LD_MAX_NESTING:
+                # Nested absurdly deep: give up on this value and resume scanning here
+                yield starts[0], pos, False, _merge_children(children)
+                break
+            token = _JSON_TOKEN_RE.search(text, pos, end)
+            if token is None:
+                # Still open at the end: keep whatever completed inside it
+                yield starts[0], end, False, _merge_children(children)
+                return
+            pos = token.end()
+            char = token.group()[0]
+            if char == '"':
+                continue
+            if char in '{[':
+                stack.append(char)
+                starts.append(token.start())
+                if len(children) <= JSON_LD_RECOVERY_DEPTH:
+                    children.append([])
+                continue
+            if (char == '}') != (stack[-1] == '{'):
+                yield starts[0], pos, False, _merge_children(children)
+                break
+            depth = len(stack) - 1
+            stack.pop()
+            span_start = starts.pop()
+            own_children = children.pop() if depth < len(children) else []
+            if not stack:
+                yield span_start, pos, True, own_children
+                break
+            if depth <= JSON_LD_RECOVERY_DEPTH:
+                children[depth - 1].append((span_start, pos, True, own_children))
+
+def _merge_children(children: list[list]) -> list:
+    """Complete values found inside a broken value's still-open levels, in document order."""
+    merged = [span for level in children for span in level]
+    merged.sort(key=lambda span: span[0])
+    return merged
+
+def _decode_json_spans(text: str, spans) -> Iterator[Any]:
+    """
+    Decode each span once; for spans that fail, decode their recorded children instead.
+    """
+    for span_start, span_end, balanced, children in spans:
+        if balanced:
+            try:
+                yield json.loads(text[span_start:span_end])
+                continue
+            except (ValueError, RecursionError):
+                pass
+        yield from _decode_json_spans(text, children)
 
 def _load_json_ld_payloads(raw_text: str) -> list[Any]:
     """
@@ -69,51 +172,28 @@ def _load_json_ld_payloads(raw_text: str) -> list[Any]:
     if not raw_text:
         return []
 
-    # Try raw and HTML-unescaped variants.
-    candidates: list[str] = []
-    for candidate in [raw_text.strip(), html.unescape(raw_text.strip())]:
-        if candidate and candidate not in candidates:
-            candidates.append(candidate)
-
-    payloads: list[Any] = []
-    decoder = json.JSONDecoder()
+    # Try the raw text first and the HTML-unescaped variant only if that finds nothing.
+    raw_text = raw_text.strip()
+    candidates = [raw_text]
+    if '&' in raw_text:
+        unescaped = html.unescape(raw_text)
+        if unescaped != raw_text:
+            candidates.append(unescaped)
 
     for candidate in candidates:
-        attempts = [candidate, _sanitize_json_ld_text(candidate)]
+        sanitized = _sanitize_json_ld_text(candidate)
+        # First prefer a full-object parse.
+        try:
+            return [json.loads(sanitized)]
+        except (ValueError, RecursionError):
+            pass
 
-        # First prefer full-object parses.
-        parsed_full_payload = False
-        for attempt in attempts:
-            try:
-                payloads.append(json.loads(attempt))
-                parsed_full_payload = True
-                break
-            except json.JSONDecodeError:
-                continue
+        # Fallback: concatenated or partly broken payloads in one script.
+        payloads = list(_decode_json_spans(sanitized, _scan_json_spans(sanitized)))
+        if payloads:
+            return payloads
 
-        if parsed_full_payload:
-            continue
-
-        # Fallback: parse concatenated JSON payloads in one script.
-        for attempt in attempts:
-            idx = 0
-            found_any = False
-            while idx < len(attempt):
-                while idx < len(attempt) and attempt[idx] not in "{[":
-                    idx += 1
-                if idx >= len(attempt):
-                    break
-                try:
-                    parsed, end = decoder.raw_decode(attempt, idx)
-                    payloads.append(parsed)
-                    idx = end
-                    found_any = True
-                except json.JSONDecodeError:
-                    idx += 1
-            if found_any:
-                break
-
-    return payloads
+    return []
 
 def _normalize_structured_text(value: Any) -> str:
     """Normalize whitespace and decode HTML entities from structured fields."""
@@ -217,56 +297,139 @@ def get_random_headers() -> Dict[str, str]:
         'Pragma': 'no-cache',
     }
 
+# Keys and node types that never lead to a Recipe. Skipping them keeps the
+# search off breadcrumbs, image/organization data and comment threads, which
+# can dwarf the Recipe node in big @graph blocks.
+_NON_RECIPE_KEYS = frozenset({
+    '@context', '@id', 'breadcrumb', 'itemListElement', 'publisher', 'author', 'creator',
+    'image', 'logo', 'thumbnail', 'thumbnailUrl', 'video', 'potentialAction', 'comment',
+    'review', 'aggregateRating', 'interactionStatistic', 'sameAs', 'address', 'contactPoint',
+})
+_NON_RECIPE_TYPES = frozenset({
+    'breadcrumblist', 'listitem', 'imageobject', 'videoobject', 'organization', 'person',
+    'website', 'searchaction', 'comment', 'review', 'aggregaterating', 'howtostep',
+    'howtosection', 'nutritioninformation', 'readaction', 'postaladdress',
+})
+# Containers that usually hold the page's primary entity; searched first
+_PRIORITY_KEYS = ('@graph', 'mainEntity', 'mainEntityOfPage', 'hasPart')
+
+def _is_pruned_type(type_value: Any) -> bool:
+    types = type_value if isinstance(type_value, list) else [type_value]
+    names = [value.rsplit('/', 1)[-1].rsplit(':', 1)[-1].lower() for value in types if isinstance(value, str)]
+    return bool(names) and all(name in _NON_RECIPE_TYPES for name in names)
+
+def _iter_recipe_nodes(data: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Yield every Recipe object in a JSON-LD payload without recursion.
+    Top-level nodes come first, then @graph / mainEntity containers, then any
+    other nested values; branches that cannot hold a Recipe are skipped.
+    """
+    queue = deque([data])
+    while queue:
+        node = queue.popleft()
+        if isinstance(node, list):
+            queue.extendleft(reversed(node))
+            continue
+        if not isinstance(node, dict):
+            continue
+        type_value = node.get('@type')
+        if _is_recipe_type(type_value):
+            yield node
+            continue
+        if _is_pruned_type(type_value):
+            continue
+        priority = [node[key] for key in _PRIORITY_KEYS if isinstance(node.get(key), (dict, list))]
+        queue.extendleft(reversed(priority))
+        queue.extend(
+            value for key, value in node.items()
+            if isinstance(value, (dict, list)) and key not in _NON_RECIPE_KEYS and key not in _PRIORITY_KEYS
+        )
+
+def _pick_recipe(recipes: Iterable[Dict[str, Any]], complete: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    First Recipe with ingredients (and instructions, when ``complete``),
+    falling back to the first Recipe seen when none qualifies and not ``complete``.
+    """
+    first = None
+    for recipe in recipes:
+        if first is None:
+            first = recipe
+        if _is_complete_recipe(recipe) if complete else bool(_extract_recipe_ingredients(recipe)):
+            return recipe
+    return None if complete else first
+
+def _find_recipe_in_data(data: Any) -> Optional[Dict[str, Any]]:
+    """Search JSON-LD data for a Recipe object, preferring one with ingredients."""
+    return _pick_recipe(_iter_recipe_nodes(data))
+
+def _json_ld_text_recipes(text: str) -> Iterator[Dict[str, Any]]:
+    """Lazily yield the Recipe objects found in one ld+json script body."""
+    for data in _load_json_ld_payloads(text):
+        yield from _iter_recipe_nodes(data)
+
+def _is_complete_recipe(structured_data: Optional[Dict[str, Any]]) -> bool:
+    """True when a structured Recipe has both ingredients and instructions."""
+    if not structured_data:
+        return False
+    return bool(_extract_recipe_ingredients(structured_data)) and bool(_extract_recipe_instructions(structured_data))
+
 def get_structured_data(soup: BeautifulSoup) -> Optional[Dict[str, Any]]:
     """
     Extract structured data (JSON-LD) from the page if available.
-    Searches all ld+json script tags and returns the first Recipe object found.
+    Searches all ld+json script tags and returns the first Recipe object with
+    ingredients, or the first Recipe found if none has any.
     Handles @graph arrays used by many WordPress recipe plugins.
     """
-    def find_recipe_in_data(data):
-        """Recursively search for Recipe object in JSON-LD data."""
-        if isinstance(data, dict):
-            # Check if this is a Recipe
-            if _is_recipe_type(data.get('@type')):
-                return data
-            # Check @graph array (used by many WordPress plugins like WPRM)
-            if '@graph' in data:
-                result = find_recipe_in_data(data['@graph'])
-                if result:
-                    return result
-            # Check nested objects
-            for key, value in data.items():
-                if isinstance(value, (dict, list)):
-                    result = find_recipe_in_data(value)
-                    if result:
-                        return result
-        elif isinstance(data, list):
-            for item in data:
-                result = find_recipe_in_data(item)
-                if result:
-                    return result
-        return None
-    
     try:
         scripts = soup.find_all('script', {'type': 'application/ld+json'})
-        for script_tag in scripts:
-            text = script_tag.string or script_tag.get_text(strip=True)
-            if not text:
-                continue
-            payloads = _load_json_ld_payloads(text)
-            for data in payloads:
-                try:
-                    recipe = find_recipe_in_data(data)
-                    if recipe:
-                        logger.info("Found Recipe in JSON-LD structured data")
-                        return recipe
-                except Exception as e:
-                    logger.debug(f"Error scanning structured data payload: {e}")
-                    continue
+        texts = (script_tag.string or script_tag.get_text(strip=True) for script_tag in scripts)
+        recipe = _pick_recipe(recipe for text in texts if text for recipe in _json_ld_text_recipes(text))
+        if recipe:
+            logger.info("Found Recipe in JSON-LD structured data")
+            return recipe
     except Exception as e:
         logger.warning(f"Error parsing structured data: {str(e)}")
     return None
 
+def _find_complete_json_ld_recipe(html_text: str) -> tuple[Optional[Dict[str, Any]], int]:
+    """
+    Scan the complete ld+json blocks in a partial HTML document.
+    Returns (recipe with ingredients and instructions or None, number of
+    characters that have been fully scanned and need not be kept).
+    """
+    position = 0
+    while True:
+        open_match = _JSON_LD_OPEN_RE.search(html_text, position)
+        if not open_match:
+            # Keep a short tail in case an opening tag is split across chunks
+            return None, max(position, len(html_text) - 256)
+        close_match = _SCRIPT_CLOSE_RE.search(html_text, open_match.end())
+        if not close_match:
+            # Block still downloading; resume from its opening tag
+            return None, open_match.start()
+        close_index = close_match.start()
+        recipe = _pick_recipe(_json_ld_text_recipes(html_text[open_match.end():close_index]), complete=True)
+        position = close_index
+        if recipe:
+            return recipe, position
+
+def get_structured_data_from_html(html_text: str) -> Optional[Dict[str, Any]]:
+    """
+    Soup-free fast path: scan the raw HTML for ld+json script bodies and return
+    the first Recipe with both ingredients and instructions, or None.
+    Lets callers skip building a full BeautifulSoup tree for most pages.
+    """
+    if not html_text:
+        return None
+    try:
+        recipe, _ = _find_complete_json_ld_recipe(html_text)
+    except Exception as e:
+        logger.warning(f"Error scanning raw HTML for structured data: {str(e)}")
+        return None
+    if recipe:
+        logger.info("Found complete Recipe in JSON-LD without building a DOM")
+    return recipe
+
 def clean_text(text: str) -> str:
     """
     Clean and normalize text content.
@@ -277,152 +440,186 @@ def clean_text(text: str) -> str:
     text = re.sub(r'[^\w\s\u3131-\uD7A3\uAC00-\uD7A3]', ' ', text)
     return text.strip()
 
+def clean_lines(text: str) -> str:
+    """Collapse whitespace within each line and drop blank lines, keeping line breaks and punctuation."""
+    lines = (re.sub(r'\s+', ' ', line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+def structured_recipe_fields(structured_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalized title, description, ingredients and instructions of a structured Recipe."""
+    return {
+        'title': _normalize_structured_text(structured_data.get('name')),
+        'description': _normalize_structured_text(structured_data.get('description')),
+        'ingredients': _extract_recipe_ingredients(structured_data),
+        'instructions': _extract_recipe_instructions(structured_data),
+    }
+
+def format_structured_recipe(structured_data: Dict[str, Any]) -> str:
+    """Flatten a structured Recipe into the Title/Ingredients/Instructions text we send to the LLM."""
+    content_parts = []
+    ingredients = _extract_recipe_ingredients(structured_data)
+    instructions = _extract_recipe_instructions(structured_data)
+    if 'name' in structured_data:
+        content_parts.append(f"Title: {_normalize_structured_text(structured_data['name'])}\n")
+    if 'description' in structured_data:
+        content_parts.append(f"Description: {_normalize_structured_text(structured_data['description'])}\n")
+    content_parts.append("Ingredients:\n" + "\n".join(f"- {ing}" for ing in ingredients))
+    content_parts.append("Instructions:\n" + "\n".join(f"{i+1}. {step}" for i, step in enumerate(instructions)))
+    return "\n\n".join(content_parts)
+
 def extract_recipe_content(soup: BeautifulSoup, url: str) -> str:
     """
     Extract recipe content using multiple methods.
     """
-    content_parts = []
-    
     # Try to get structured data first
     structured_data = get_structured_data(soup)
     if structured_data:
         logger.info("Found structured data")
-        ingredients = _extract_recipe_ingredients(structured_data)
-        instructions = _extract_recipe_instructions(structured_data)
-        has_ingredients = bool(ingredients)
-        has_instructions = bool(instructions)
-        
         # Only use structured data if it has both ingredients AND instructions
-        if has_ingredients and has_instructions:
-            if 'name' in structured_data:
-                content_parts.append(f"Title: {_normalize_structured_text(structured_data['name'])}\n")
-            if 'description' in structured_data:
-                content_parts.append(f"Description: {_normalize_structured_text(structured_data['description'])}\n")
-            content_parts.append("Ingredients:\n" + "\n".join(f"- {ing}" for ing in ingredients))
-            content_parts.append("Instructions:\n" + "\n".join(f"{i+1}. {step}" for i, step in enumerate(instructions)))
-            return "\n\n".join(content_parts)
+        if _is_complete_recipe(structured_data):
+            return format_structured_recipe(structured_data)
         else:
             logger.info("Structured data incomplete, falling back to site-specific selectors")
 
     # If no structured data (or incomplete), handle site-specific structures
-    if '10000recipe.com' in url:
-        logger.info("Using 10000recipe-specific selectors")
-        # Title
-        title_el = (
-            soup.select_one('h3.view2_tit') or
-            soup.select_one('h1.recipe-title') or
-            soup.find('h1')
-        )
-        if not title_el:
-            og_title = soup.find('meta', attrs={'property': 'og:title'})
-            if og_title and og_title.get('content'):
-                content_parts.append(f"Title: {clean_text(og_title.get('content'))}\n")
-        else:
-            content_parts.append(f"Title: {clean_text(title_el.get_text())}\n")
-
-        # Ingredients
-        ingredient_items = []
-        candidate_lists = []
-        # Common containers on 10000recipe
-        candidate_lists.extend(soup.select('.ready_ingre3 li'))
-        candidate_lists.extend(soup.select('#divConfirmedMaterialArea li'))
-        candidate_lists.extend(soup.select('.cont_ingre li'))
-        candidate_lists.extend(soup.select('.ingre_list li'))
-        candidate_lists.extend(soup.select('.ingredient_list li'))
-
-        if not candidate_lists:
-            # Heuristic: find a heading that contains 재료 or Ingredients and take following list
-            heading = soup.find(lambda tag: tag.name in ['h2', 'h3', 'strong', 'p'] and tag.get_text(strip=True) and (
-                '재료' in tag.get_text() or 'Ingredients' in tag.get_text()))
-            if heading:
-                next_list = heading.find_next(['ul', 'ol'])
-                if next_list:
-                    candidate_lists.extend(next_list.find_all('li'))
-
-        for li in candidate_lists:
-            text = li.get_text(" ", strip=True)
-            # Clean trailing shop prompts like '구매'
-            text = re.sub(r'\s*구매\s*$', '', text)
-            text = re.sub(r'\s*\(선택\)\s*$', '', text)
-            text = clean_text(text)
-            if text and text not in ingredient_items:
-                ingredient_items.append(text)
-
-        if ingredient_items:
-            content_parts.append("Ingredients:\n" + "\n".join(f"- {ing}" for ing in ingredient_items))
-
-        # Instructions
-        steps = []
-        step_containers = []
-        step_containers.extend(soup.select('.view_step .media .media-body'))
-        step_containers.extend(soup.select('.view_step .step_text'))
-        step_containers.extend(soup.select('.view_step li'))
-        if not step_containers:
-            # Heuristic: find heading with 조리순서 or Steps then capture following list/paragraphs
-            step_heading = soup.find(lambda tag: tag.name in ['h2', 'h3', 'strong', 'p'] and tag.get_text(strip=True) and (
-                '조리순서' in tag.get_text() or 'Steps' in tag.get_text()))
-            if step_heading:
-                # Prefer ordered list after heading; fallback to paragraphs
-                ordered = step_heading.find_next('ol')
-                if ordered:
-                    step_containers.extend(ordered.find_all('li'))
-                else:
-                    paras = step_heading.find_all_next(['p', 'li'], limit=20)
-                    step_containers.extend(paras)
-
-        for elem in step_containers:
-            text = elem.get_text(" ", strip=True)
-            text = clean_text(text)
-            if text and len(text) > 2 and text not in steps:
-                steps.append(text)
-
-        if steps:
-            content_parts.append("Instructions:\n" + "\n".join(f"{i+1}. {t}" for i, t in enumerate(steps)))
-
-        if content_parts:
-            return "\n\n".join(content_parts)
-
-    # If no structured data, try specific selectors for Maangchi
-    if 'maangchi.com' in url:
-        logger.info("Using Maangchi-specific selectors")
-        
-        # Get title (h1 or h2 with recipe name)
-        title = soup.find('h1') or soup.find('h2', class_='wp-block-heading')
-        if title:
-            content_parts.append(f"Title: {clean_text(title.get_text())}\n")
-        
-        # Find "Ingredients" heading and get the following ul
-        ingredients_heading = soup.find(['h2', 'h3'], string=lambda x: x and 'Ingredients' in x and 'Buy' not in x and 'Amazon' not in x)
-        if ingredients_heading:
-            # Get the next ul element after the heading
-            ingredients_ul = ingredients_heading.find_next('ul', class_='wp-block-list')
-            if ingredients_ul:
-                ingredient_items = []
-                for li in ingredients_ul.find_all('li'):
-                    text = li.get_text(strip=True)
-                    if text:
-                        ingredient_items.append(text)
-                if ingredient_items:
-                    content_parts.append("Ingredients:\n" + "\n".join(f"- {ing}" for ing in ingredient_items))
-        
-        # Find all instruction steps (ol elements with wp-block-list class, excluding navigation)
-        instructions = []
-        for ol in soup.find_all('ol', class_='wp-block-list'):
-            # Skip navigation lists
-            if 'nav' in str(ol.get('class', [])):
-                continue
-            for li in ol.find_all('li'):
+    site_content = extract_site_specific_content(soup, url)
+    if site_content:
+        return site_content
+
+    return extract_generic_content(soup)
+
+def extract_site_specific_content(soup: BeautifulSoup, url: str) -> Optional[str]:
+    """Run the dedicated handler registered for the URL's site, if any."""
+    handler = site_extractors.lookup(url).handler
+    return handler(soup) if handler else None
+
+@site_extractors.site_handler('10000recipe.com')
+def _extract_10000recipe_content(soup: BeautifulSoup) -> Optional[str]:
+    """Extract a recipe from 10000recipe.com (Korean) markup, or None."""
+    content_parts = []
+    logger.info("Using 10000recipe-specific selectors")
+    # Title
+    title_el = (
+        soup.select_one('h3.view2_tit') or
+        soup.select_one('h1.recipe-title') or
+        soup.find('h1')
+    )
+    if not title_el:
+        og_title = soup.find('meta', attrs={'property': 'og:title'})
+        if og_title and og_title.get('content'):
+            content_parts.append(f"Title: {clean_text(og_title.get('content'))}\n")
+    else:
+        content_parts.append(f"Title: {clean_text(title_el.get_text())}\n")
+
+    # Ingredients
+    ingredient_items = []
+    candidate_lists = []
+    # Common containers on 10000recipe
+    candidate_lists.extend(soup.select('.ready_ingre3 li'))
+    candidate_lists.extend(soup.select('#divConfirmedMaterialArea li'))
+    candidate_lists.extend(soup.select('.cont_ingre li'))
+    candidate_lists.extend(soup.select('.ingre_list li'))
+    candidate_lists.extend(soup.select('.ingredient_list li'))
+
+    if not candidate_lists:
+        # Heuristic: find a heading that contains 재료 or Ingredients and take following list
+        heading = soup.find(lambda tag: tag.name in ['h2', 'h3', 'strong', 'p'] and tag.get_text(strip=True) and (
+            '재료' in tag.get_text() or 'Ingredients' in tag.get_text()))
+        if heading:
+            next_list = heading.find_next(['ul', 'ol'])
+            if next_list:
+                candidate_lists.extend(next_list.find_all('li'))
+
+    for li in candidate_lists:
+        text = li.get_text(" ", strip=True)
+        # Clean trailing shop prompts like '구매'
+        text = re.sub(r'\s*구매\s*$', '', text)
+        text = re.sub(r'\s*\(선택\)\s*$', '', text)
+        text = clean_text(text)
+        if text and text not in ingredient_items:
+            ingredient_items.append(text)
+
+    if ingredient_items:
+        content_parts.append("Ingredients:\n" + "\n".join(f"- {ing}" for ing in ingredient_items))
+
+    # Instructions
+    steps = []
+    step_containers = []
+    step_containers.extend(soup.select('.view_step .media .media-body'))
+    step_containers.extend(soup.select('.view_step .step_text'))
+    step_containers.extend(soup.select('.view_step li'))
+    if not step_containers:
+        # Heuristic: find heading with 조리순서 or Steps then capture following list/paragraphs
+        step_heading = soup.find(lambda tag: tag.name in ['h2', 'h3', 'strong', 'p'] and tag.get_text(strip=True) and (
+            '조리순서' in tag.get_text() or 'Steps' in tag.get_text()))
+        if step_heading:
+            # Prefer ordered list after heading; fallback to paragraphs
+            ordered = step_heading.find_next('ol')
+            if ordered:
+                step_containers.extend(ordered.find_all('li'))
+            else:
+                paras = step_heading.find_all_next(['p', 'li'], limit=20)
+                step_containers.extend(paras)
+
+    for elem in step_containers:
+        text = elem.get_text(" ", strip=True)
+        text = clean_text(text)
+        if text and len(text) > 2 and text not in steps:
+            steps.append(text)
+
+    if steps:
+        content_parts.append("Instructions:\n" + "\n".join(f"{i+1}. {t}" for i, t in enumerate(steps)))
+
+    if content_parts:
+        return "\n\n".join(content_parts)
+    return None
+
+@site_extractors.site_handler('maangchi.com')
+def _extract_maangchi_content(soup: BeautifulSoup) -> Optional[str]:
+    """Extract a recipe from maangchi.com markup, or None."""
+    content_parts = []
+    logger.info("Using Maangchi-specific selectors")
+    
+    # Get title (h1 or h2 with recipe name)
+    title = soup.find('h1') or soup.find('h2', class_='wp-block-heading')
+    if title:
+        content_parts.append(f"Title: {clean_text(title.get_text())}\n")
+    
+    # Find "Ingredients" heading and get the following ul
+    ingredients_heading = soup.find(['h2', 'h3'], string=lambda x: x and 'Ingredients' in x and 'Buy' not in x and 'Amazon' not in x)
+    if ingredients_heading:
+        # Get the next ul element after the heading
+        ingredients_ul = ingredients_heading.find_next('ul', class_='wp-block-list')
+        if ingredients_ul:
+            ingredient_items = []
+            for li in ingredients_ul.find_all('li'):
                 text = li.get_text(strip=True)
-                if text and len(text) > 20:  # Filter out short items
-                    instructions.append(text)
-        
-        if instructions:
-            content_parts.append("Instructions:\n" + "\n".join(f"{i+1}. {step}" for i, step in enumerate(instructions)))
-        
-        if len(content_parts) >= 2:  # At least title + one other section
-            return "\n\n".join(content_parts)
+                if text:
+                    ingredient_items.append(text)
+            if ingredient_items:
+                content_parts.append("Ingredients:\n" + "\n".join(f"- {ing}" for ing in ingredient_items))
+    
+    # Find all instruction steps (ol elements with wp-block-list class, excluding navigation)
+    instructions = []
+    for ol in soup.find_all('ol', class_='wp-block-list'):
+        # Skip navigation lists
+        if 'nav' in str(ol.get('class', [])):
+            continue
+        for li in ol.find_all('li'):
+            text = li.get_text(strip=True)
+            if text and len(text) > 20:  # Filter out short items
+                instructions.append(text)
+    
+    if instructions:
+        content_parts.append("Instructions:\n" + "\n".join(f"{i+1}. {step}" for i, step in enumerate(instructions)))
+    
+    if len(content_parts) >= 2:  # At least title + one other section
+        return "\n\n".join(content_parts)
+    return None
 
-    # Fallback to general recipe selectors
+def extract_generic_content(soup: BeautifulSoup) -> str:
+    """Extract recipe text with general recipe selectors and heuristics."""
+    content_parts = []
     logger.info("Using general recipe selectors")
     recipe_content = (
         soup.find('div', {'id': ['recipe-single', 'recipe-container', 'recipe-card', 'recipe']}) or
@@ -461,10 +658,43 @@ def extract_recipe_content(soup: BeautifulSoup, url: str) -> str:
 
             # If no structured content found, use all content
             if not (ingredients or instructions):
-                content_parts.append(clean_text(recipe_content.get_text(separator="\n")))
+                # Keep one block per line so prompt compaction can score them
+                content_parts.append(clean_lines(recipe_content.get_text(separator="\n")))
 
     return "\n\n".join(content_parts) if content_parts else "No recipe content found"
 
+def remove_non_content(soup: BeautifulSoup) -> None:
+    """Drop styles, frames and scripts in place, keeping JSON-LD scripts for recipe data."""
+    for element in soup.find_all(['style', 'iframe', 'noscript']):
+        element.decompose()
+    for script in soup.find_all('script'):
+        if script.get('type') != 'application/ld+json':
+            script.decompose()
+
+def _has_recipe_sections(content: str) -> bool:
+    return "Ingredients:" in content and "Instructions:" in content
+
+def extract_recipe_from_html(html_text: str, url: str, partial: bool = HTML_PARTIAL_PARSE) -> str:
+    """
+    Extract recipe text from raw HTML as cheaply as possible.
+    Tries the soup-free JSON-LD scan, then a partial parse of recipe-relevant
+    subtrees, and only builds the full DOM when the partial tree falls short.
+    """
+    structured_data = get_structured_data_from_html(html_text)
+    if structured_data:
+        return format_structured_recipe(structured_data)
+
+    passes = [True, False] if partial and partial_parsing_supported() else [False]
+    result = "No recipe content found"
+    for partial_pass in passes:
+        soup = make_soup(html_text, partial=partial_pass)
+        remove_non_content(soup)
+        result = extract_recipe_content(soup, url)
+        if not partial_pass or _has_recipe_sections(result):
+            return result
+        logger.info("Partial parse missed recipe sections, parsing the full document")
+    return result
+
 def decode_response_content(response) -> str:
     """
     Properly decode response content handling various compression formats.
@@ -530,6 +760,188 @@ def decode_response_content(response) -> str:
         # Fallback to response.text
         return response.text
 
+class _StreamDecompressor:
+    """Incrementally undo a response's Content-Encoding."""
+
+    def __init__(self, encoding: str):
+        encoding = (encoding or '').lower().strip()
+        self._brotli = None
+        self._zlib = None
+        self._deflate_probe = False
+        if encoding in ('br', 'brotli'):
+            self._brotli = brotli.Decompressor()
+        elif encoding == 'gzip':
+            self._zlib = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            self._zlib = zlib.decompressobj()
+            self._deflate_probe = True
+
+    def decompress(self, chunk: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(chunk)
+        if self._zlib is not None:
+            try:
+                return self._zlib.decompress(chunk)
+            except zlib.error:
+                # Some servers send raw deflate without the zlib header
+                if self._deflate_probe:
+                    self._deflate_probe = False
+                    self._zlib = zlib.decompressobj(-zlib.MAX_WBITS)
+                    return self._zlib.decompress(chunk)
+                raise
+        return chunk
+
+def _detect_charset(response, first_bytes: bytes) -> str:
+    """Pick a charset from the Content-Type header or a <meta charset> near the top."""
+    content_type = response.headers.get('content-type', '')
+    if 'charset=' in content_type:
+        return content_type.split('charset=')[1].split(';')[0].strip().strip('"\'')
+    match = _META_CHARSET_RE.search(first_bytes[:4096])
+    if match:
+        return match.group(1).decode('ascii', errors='ignore')
+    return 'utf-8'
+
+def read_html_stream(
+    response,
+    max_bytes: int = MAX_BODY_BYTES,
+    stop_at_recipe: bool = True,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> str:
+    """
+    Read a streamed response body incrementally.
+    Decompresses and decodes as bytes arrive, stops as soon as a complete
+    JSON-LD Recipe (ingredients and instructions) has been seen, and never
+    holds more than ``max_bytes`` of decoded HTML.
+    """
+    return _read_html_stream(response, max_bytes, stop_at_recipe, chunk_size)[0]
+
+def _read_html_stream(response, max_bytes: int, stop_at_recipe: bool, chunk_size: int) -> Tuple[str, bool]:
+    """read_html_stream() plus whether the whole body was read."""
+    if getattr(response, '_content_consumed', False):
+        # Something upstream (e.g. a challenge check) already read the body
+        html_content = decode_response_content(response)
+        return html_content[:max_bytes], len(html_content) <= max_bytes
+
+    decompressor = _StreamDecompressor(response.headers.get('content-encoding', ''))
+    decoder = None
+    parts: list[str] = []
+    # Only the not-yet-scanned tail is kept here, so scanning stays linear
+    scan_buffer = ''
+    received = 0
+    stopped_early = False
+
+    try:
+        for raw_chunk in response.raw.stream(chunk_size, decode_content=False):
+            data = decompressor.decompress(raw_chunk)
+            if not data:
+                continue
+            if decoder is None:
+                charset = _detect_charset(response, data)
+                try:
+                    decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+                except LookupError:
+                    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+            received += len(data)
+            if received > max_bytes:
+                data = data[:max(0, len(data) - (received - max_bytes))]
+                parts.append(decoder.decode(data, final=True))
+                logger.warning(f"Response body exceeded {max_bytes} bytes, truncating")
+                stopped_early = True
+                break
+
+            text = decoder.decode(data)
+            parts.append(text)
+            if stop_at_recipe:
+                scan_buffer += text
+                recipe, consumed = _find_complete_json_ld_recipe(scan_buffer)
+                scan_buffer = scan_buffer[consumed:]
+                if recipe:
+                    logger.info(f"Complete JSON-LD Recipe found after {received} bytes, stopping download")
+                    stopped_early = True
+                    break
+        else:
+            if decoder is not None:
+                parts.append(decoder.decode(b'', final=True))
+    finally:
+        if stopped_early:
+            # The rest of the body is unread, so the connection cannot go back to the pool
+            response.close()
+
+    return ''.join(parts), not stopped_early
+
+def fetch_html(
+    url: str,
+    session,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: int = 30,
+    debug: bool = False,
+    stream: bool = STREAM_FETCH,
+) -> str:
+    """
+    Fetch a page's HTML through the on-disk cache.
+    Fresh cache entries are returned without a request; stale ones are
+    revalidated with If-None-Match/If-Modified-Since and reused on a 304.
+    With ``stream`` the body is read incrementally and the download stops
+    once a complete JSON-LD Recipe has arrived (see read_html_stream); such
+    a truncated body is cached as partial and not served to full-page reads.
+    Raises requests exceptions (including HTTP errors) like session.get would.
+    """
+    cached = html_cache.get(url)
+    if cached and not cached.complete and not stream:
+        # Cut short on an earlier streamed read; this caller wants the whole page
+        cached = None
+    if cached and cached.is_fresh():
+        logger.info(f"Serving {url} from HTML cache")
+        return cached.text
+
+    request_headers = dict(headers or {})
+    if cached:
+        request_headers.update(cached.conditional_headers())
+
+    # Only waits when this domain's request budget is exhausted or it asked us to back off
+    rate_limiter.acquire(url, max_wait=RATE_LIMIT_MAX_WAIT)
+    response = session.get(url, headers=request_headers, timeout=timeout, stream=stream)
+    rate_limiter.note_response(url, response)
+
+    if cached and response.status_code == 304:
+        logger.info(f"HTML cache revalidated {url} (304 Not Modified)")
+        response.close()
+        html_cache.refresh(url, response.headers)
+        return cached.text
+
+    if not response.ok:
+        response.close()
+    response.raise_for_status()
+
+    # Properly decode the content
+    if stream:
+        html_content, complete = _read_html_stream(response, MAX_BODY_BYTES, True, STREAM_CHUNK_SIZE)
+    else:
+        html_content, complete = decode_response_content(response), True
+
+    # Print response info for debugging
+    logger.info(f"Response status: {response.status_code}")
+    logger.info(f"Content length: {len(html_content)}")
+    logger.info(f"Content encoding: {response.headers.get('content-encoding', 'none')}")
+    if debug:
+        logger.info(f"Response headers: {dict(response.headers)}")
+
+    html_cache.put(url, html_content, response.headers, complete=complete)
+    return html_content
+
+def looks_blocked(html_text: str) -> bool:
+    """True when a page is a bot-block or Cloudflare challenge page, not one that just mentions Cloudflare."""
+    html_lower = (html_text or '').lower()
+    return any(marker in html_lower for marker in CHALLENGE_PAGE_MARKERS)
+
+def fetch_with_selenium(url: str) -> str:
+    """
+    Load a page in a pooled headless Chrome and return the rendered HTML.
+    Raises if Selenium is unavailable or the browser fails.
+    """
+    return fetch_rendered_html(url, max_wait=RATE_LIMIT_MAX_WAIT)
+
 def scrape_with_selenium(url: str, debug_html: bool = False) -> str:
     """
     Scrape using Selenium with undetected-chromedriver to bypass Cloudflare.
@@ -541,33 +953,16 @@ def scrape_with_selenium(url: str, debug_html: bool = False) -> str:
         return ""
     
     try:
-        options = uc.ChromeOptions()
-        options.add_argument('--headless')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        
-        driver = uc.Chrome(options=options)
-        driver.get(url)
-        
-        # Wait for the content to load
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
-        
-        # Get the page source after JavaScript execution
-        html = driver.page_source
-        driver.quit()
+        html = fetch_with_selenium(url)
         
         # Check for Cloudflare block pages
-        blocked_indicators = ['you have been blocked', 'cloudflare', 'access denied', 'captcha', 'ray id']
-        html_lower = html.lower()
-        if any(indicator in html_lower for indicator in blocked_indicators):
+        if looks_blocked(html):
             logger.warning("Selenium got a blocked/Cloudflare page, will fall back to cloudscraper")
             return ""
         
         if debug_html:
             # Print relevant parts of the HTML for debugging
-            soup = BeautifulSoup(html, "html.parser")
+            soup = make_soup(html)
             
             # Remove script and style tags for cleaner output
             for element in soup.find_all(['script', 'style']):
@@ -605,8 +1000,7 @@ def scrape_with_selenium(url: str, debug_html: bool = False) -> str:
             
             print("\n=== END DEBUG ===\n")
         
-        soup = BeautifulSoup(html, "html.parser")
-        return extract_recipe_content(soup, url)
+        return extract_recipe_from_html(html, url)
     except Exception as e:
         logger.error(f"Error with Selenium scraping: {str(e)}")
         return ""
@@ -614,7 +1008,11 @@ def scrape_with_selenium(url: str, debug_html: bool = False) -> str:
 def scrape_recipe_page(url: str, max_retries: int = 3, debug: bool = False) -> str:
     """
     Scrapes a recipe webpage and returns the raw text content.
+    URLs that just failed and domains whose circuit is open fail fast.
     """
+    return guarded_scrape(url, lambda: _scrape_recipe_page(url, max_retries, debug))
+
+def _scrape_recipe_page(url: str, max_retries: int, debug: bool) -> str:
     # Try with Selenium first (only if available and not on Heroku)
     if SELENIUM_AVAILABLE and not IS_HEROKU and not IS_PRODUCTION:
         logger.info("Attempting to scrape with Selenium")
@@ -626,29 +1024,12 @@ def scrape_recipe_page(url: str, max_retries: int = 3, debug: bool = False) -> s
     else:
         logger.info("Using cloudscraper only (Selenium not available or on Heroku)")
     
-    # Use cloudscraper (this works well on Heroku)
-    scraper = cloudscraper.create_scraper(
-        browser={
-            'browser': 'chrome',
-            'platform': 'windows',
-            'mobile': False
-        },
-        delay=10,
-        debug=False
-    )
-    
-    # Configure session to handle compression properly
-    scraper.headers.update({
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8'
-    })
+    # Use the pooled cloudscraper session for this domain (this works well on Heroku).
+    # Reusing it keeps connections, TLS sessions and Cloudflare cookies warm.
+    scraper = get_cloudscraper(url)
     
     for attempt in range(max_retries):
         try:
-            # Add delay to respect rate limits with jitter
-            delay = 2 * (attempt + 1) + random.uniform(0, 1)
-            time.sleep(delay)
-            
             logger.info(f"Attempting to scrape {url} with cloudscraper (attempt {attempt + 1}/{max_retries})")
             
             # Get fresh headers for each attempt
@@ -658,23 +1039,11 @@ def scrape_recipe_page(url: str, max_retries: int = 3, debug: bool = False) -> s
             parsed_url = urlparse(url)
             headers['Referer'] = f"{parsed_url.scheme}://{parsed_url.netloc}/"
             
-            response = scraper.get(url, headers=headers, timeout=30, stream=False)
-            response.raise_for_status()
-            
-            # Properly decode the content
-            html_content = decode_response_content(response)
-            
-            # Print response info for debugging
-            logger.info(f"Response status: {response.status_code}")
-            logger.info(f"Content length: {len(html_content)}")
-            logger.info(f"Content encoding: {response.headers.get('content-encoding', 'none')}")
-            if debug and attempt == 0:
-                logger.info(f"Response headers: {dict(response.headers)}")
-
-            soup = BeautifulSoup(html_content, "html.parser")
+            html_content = fetch_html(url, scraper, headers, timeout=30, debug=debug and attempt == 0)
 
             # Debug: Print HTML structure from cloudscraper
             if debug and attempt == 0:  # Only debug on first attempt
+                soup = make_soup(html_content)
                 print("=== DEBUG: CLOUDSCRAPER HTML STRUCTURE ===")
                 print("Page title:", soup.find('title').get_text() if soup.find('title') else "No title found")
                 
@@ -724,33 +1093,32 @@ def scrape_recipe_page(url: str, max_retries: int = 3, debug: bool = False) -> s
                 
                 print("\n=== END CLOUDSCRAPER DEBUG ===\n")
 
-            # Remove unwanted elements (but keep JSON-LD scripts for recipe data!)
-            for element in soup.find_all(['style', 'iframe', 'noscript']):
-                element.decompose()
-            # Remove regular scripts but preserve JSON-LD
-            for script in soup.find_all('script'):
-                if script.get('type') != 'application/ld+json':
-                    script.decompose()
-
-            # Extract recipe content
-            result = extract_recipe_content(soup, url)
+            # Extract recipe content (JSON-LD fast path, then partial and full DOM parses)
+            result = extract_recipe_from_html(html_content, url)
             
             if result and result != "No recipe content found":
                 logger.info("Successfully extracted recipe content")
                 return result
             else:
                 logger.warning("No recipe content found, retrying...")
+                # Make the retry refetch instead of re-reading the same cached page
+                html_cache.invalidate(url)
                 continue
 
+        except RateLimitedError as e:
+            logger.warning(f"Giving up on {url}: {str(e)}")
+            return f"Error scraping recipe: {str(e)}"
         except requests.exceptions.RequestException as e:
             logger.error(f"Request error on attempt {attempt + 1}: {str(e)}")
             if attempt == max_retries - 1:
                 return f"Error scraping recipe: {str(e)}"
+            rate_limiter.note_failure(url, attempt)
             continue
         except Exception as e:
             logger.error(f"Unexpected error on attempt {attempt + 1}: {str(e)}")
             if attempt == max_retries - 1:
                 return f"Error scraping recipe: {str(e)}"
+            rate_limiter.note_failure(url, attempt)
             continue
 
     return "Failed to extract recipe content after all attempts"
@@ -0,0 +1,131 @@
+# site_extractors.py
+"""
+Registry of per-site recipe extractors shared by both scrapers.
+
+Each SiteProfile declares its CSS selectors once; they are compiled with
+soupsieve when the profile is created, not on every request. Lookups go
+through a hostname index: the exact host first, then each parent domain
+(``m.allrecipes.com`` -> ``allrecipes.com`` -> ``com``), so dispatch costs a
+few dict lookups no matter how many profiles are registered.
+
+Sites whose markup needs custom code register a handler with
+``@site_handler('example.com')``; see scrape.py.
+"""
+from typing import Callable, Dict, List, Optional, Sequence
+from urllib.parse import urlparse
+
+import soupsieve as sv
+from bs4 import BeautifulSoup
+
+FIELDS = ('title', 'ingredients', 'instructions')
+
+Handler = Callable[[BeautifulSoup], Optional[str]]
+
+class SiteProfile:
+    """Selectors (and optionally a dedicated handler) for one site."""
+
+    def __init__(self, name: str, domains: Sequence[str], selectors: Dict[str, List[str]],
+                 handler: Optional[Handler] = None):
+        self.name = name
+        self.domains = tuple(normalize_host(domain) for domain in domains)
+        self.selectors = {field: list(selectors.get(field, [])) for field in FIELDS}
+        self.compiled = {field: [sv.compile(selector) for selector in group] for field, group in self.selectors.items()}
+        self.handler = handler
+
+    def select(self, soup: BeautifulSoup, field: str) -> list:
+        """Elements matched by the first selector for ``field`` that matches anything."""
+        for pattern in self.compiled[field]:
+            elements = pattern.select(soup)
+            if elements:
+                return elements
+        return []
+
+    def all_selectors(self) -> List[str]:
+        return [selector for group in self.selectors.values() for selector in group]
+
+def normalize_host(value: str) -> str:
+    """Lower-cased host without port or a leading 'www.'; accepts URLs or bare hosts."""
+    host = urlparse(value).hostname if '//' in value else value.split(':', 1)[0]
+    host = (host or '').lower().strip().rstrip('.')
+    return host[4:] if host.startswith('www.') else host
+
+class ExtractorRegistry:
+    """Hostname -> SiteProfile index with exact and parent-domain matching."""
+
+    def __init__(self, default: SiteProfile):
+        self.default = default
+        self._by_host: Dict[str, SiteProfile] = {}
+
+    def register(self, profile: SiteProfile) -> SiteProfile:
+        for domain in profile.domains:
+            self._by_host[domain] = profile
+        return profile
+
+    def lookup(self, url: str) -> SiteProfile:
+        """The profile for a URL's host or its closest registered parent domain."""
+        host = normalize_host(url)
+        profile = self._by_host.get(host)
+        if profile is not None:
+            return profile
+        labels = host.split('.')
+        for start in range(1, len(labels) - 1):
+            profile = self._by_host.get('.'.join(labels[start:]))
+            if profile is not None:
+                return profile
+        return self.default
+
+    def site_handler(self, *domains: str) -> Callable[[Handler], Handler]:
+        """Decorator attaching a custom extraction handler to the profile for ``domains``."""
+        def decorator(func: Handler) -> Handler:
+            for domain in domains:
+                profile = self._by_host.get(normalize_host(domain))
+                if profile is None:
+                    profile = self.register(SiteProfile(normalize_host(domain), [domain], self.default.selectors))
+                profile.handler = func
+            return func
+        return decorator
+
+    def __len__(self) -> int:
+        return len({id(profile) for profile in self._by_host.values()})
+
+GENERIC_PROFILE = SiteProfile('generic', [], {
+    'title': ['h1.recipe-title', 'h1.title', 'h1'],
+    'ingredients': ['.ingredients li', '.recipe-ingredients li', '.ingredients-list li'],
+    'instructions': ['.instructions li', '.recipe-directions li', '.directions li'],
+})
+
+registry = ExtractorRegistry(GENERIC_PROFILE)
+
+registry.register(SiteProfile('allrecipes', ['allrecipes.com'], {
+    'title': ['h1.recipe-title', 'h1.recipe-header__title', 'h1'],
+    'ingredients': ['.ingredients-item-name', '.ingredients-list li', '.recipe-ingredients li'],
+    'instructions': ['.instructions li', '.recipe-directions li', '.directions li'],
+}))
+registry.register(SiteProfile('foodnetwork', ['foodnetwork.com'], {
+    'title': ['h1.o-AssetTitle__a-Headline', 'h1.recipe-title', 'h1'],
+    'ingredients': ['.o-Ingredients__a-Ingredient', '.ingredients li', '.recipe-ingredients li'],
+    'instructions': ['.o-Method__m-Step', '.directions li', '.recipe-directions li'],
+}))
+registry.register(SiteProfile('epicurious', ['epicurious.com'], {
+    'title': ['h1.recipe-title', 'h1.title', 'h1'],
+    'ingredients': ['.ingredients li', '.recipe-ingredients li'],
+    'instructions': ['.instructions li', '.recipe-directions li'],
+}))
+registry.register(SiteProfile('maangchi', ['maangchi.com'], {
+    'title': ['h1.recipe-title', 'h1.entry-title', 'h1'],
+    'ingredients': ['.ingredients li', '.recipe-ingredients li', '.ingredients-list li'],
+    'instructions': ['.instructions li', '.recipe-directions li', '.directions li'],
+}))
+registry.register(SiteProfile('seriouseats', ['seriouseats.com'], {
+    'title': ['h1.recipe-title', 'h1.title', 'h1'],
+    'ingredients': ['.ingredients li', '.recipe-ingredients li'],
+    'instructions': ['.instructions li', '.recipe-directions li'],
+}))
+registry.register(SiteProfile('10000recipe', ['10000recipe.com'], {
+    'title': ['h3.view2_tit', 'h1.recipe-title', 'h1'],
+    'ingredients': ['.ready_ingre3 li', '#divConfirmedMaterialArea li', '.cont_ingre li', '.ingre_list li', '.ingredient_list li'],
+    'instructions': ['.view_step .media .media-body', '.view_step .step_text', '.view_step li'],
+}))
+
+lookup = registry.lookup
+site_handler = registry.site_handler
@@ -78,6 +78,55 @@ class AudioStorage:
             print(f"Error saving to Railway storage: {e}")
             return None
 
+    def audio_url(self, filename: str) -> str:
+        """
+        Public URL of a stored audio file
+        """
+        if self.use_railway_storage:
+            return f"/static/audio/{filename}"
+        return f"https://{self.bucket_name}.s3.amazonaws.com/{filename}"
+
+    def audio_exists(self, filename: str) -> Optional[str]:
+        """
+        Return the URL of an already stored audio file, or None if it is not stored
+        """
+        local_path = os.path.join('static/audio', filename)
+        if not self.use_railway_storage:
+            try:
+                self.s3_client.head_object(Bucket=self.bucket_name, Key=filename)
+                return self.audio_url(filename)
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+                    print(f"Error checking S3 for {filename}: {e}")
+            except Exception as e:
+                print(f"Unexpected error checking S3 for {filename}: {e}")
+        # Uploads that failed over to local storage live here too
+        if os.path.exists(local_path):
+            return f"/static/audio/{filename}"
+        return None
+
+    def load_audio(self, filename: str) -> Optional[bytes]:
+        """
+        Read a stored audio file back, or return None if it is not stored
+        """
+        if not self.use_railway_storage:
+            try:
+                response = self.s3_client.get_object(Bucket=self.bucket_name, Key=filename)
+                return response['Body'].read()
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+                    print(f"Error reading {filename} from S3: {e}")
+            except Exception as e:
+                print(f"Unexpected error reading {filename} from S3: {e}")
+        try:
+            with open(os.path.join('static/audio', filename), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error reading {filename} from Railway storage: {e}")
+            return None
+
     def delete_audio(self, filename: str) -> bool:
         """
         Delete audio file from storage
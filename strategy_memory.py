@@ -0,0 +1,166 @@
+# strategy_memory.py
+"""
+Per-domain memory of which transport and extractor work for a site.
+
+Each extraction records, per domain, whether every transport and extractor it
+tried succeeded and how long it took. The pipeline asks for its candidates in
+ranked order so the historical winner runs first and the rest of the chain
+only runs on a miss. Success and failure counts decay exponentially
+(STRATEGY_MEMORY_HALF_LIFE_DAYS), so a site that changes its markup or starts
+blocking a transport is re-learned within a few requests.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+from http_session import domain_key
+from local_store import default_store_path, open_sqlite
+
+logger = logging.getLogger(__name__)
+
+STRATEGY_MEMORY_ENABLED = os.getenv('STRATEGY_MEMORY_ENABLED', '1') == '1'
+STRATEGY_MEMORY_PATH = os.getenv('STRATEGY_MEMORY_PATH', default_store_path('strategy_memory.db'))
+STRATEGY_MEMORY_HALF_LIFE_DAYS = float(os.getenv('STRATEGY_MEMORY_HALF_LIFE_DAYS', '7'))
+
+# (kind, name, success, latency_seconds)
+Outcome = Tuple[str, str, bool, float]
+
+class StrategyMemory:
+    """SQLite-backed decayed success counts per (domain, kind, name)."""
+
+    def __init__(
+        self,
+        path: str = STRATEGY_MEMORY_PATH,
+        half_life_days: float = STRATEGY_MEMORY_HALF_LIFE_DAYS,
+        enabled: bool = STRATEGY_MEMORY_ENABLED,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.half_life = half_life_days * 86400
+        self.enabled = enabled
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = None
+        self.counters = {'lookups': 0, 'learned': 0, 'first_choice_wins': 0, 'misses': 0}
+
+    def _decay(self, age: float) -> float:
+        if self.half_life <= 0:
+            return 1.0
+        return 0.5 ** (max(age, 0.0) / self.half_life)
+
+    def scores(self, url: str, kind: str) -> Dict[str, Dict[str, float]]:
+        """Decayed successes, failures and mean latency per name for the URL's domain."""
+        if not self.enabled:
+            return {}
+        now = self._clock()
+        try:
+            with self._lock:
+                rows = self._connection().execute(
+                    'SELECT name, successes, failures, latency, updated_at FROM strategies '
+                    'WHERE domain = ? AND kind = ?',
+                    (domain_key(url), kind),
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Strategy memory unavailable: {e}")
+            return {}
+        scores = {}
+        for name, successes, failures, latency, updated_at in rows:
+            factor = self._decay(now - updated_at)
+            scores[name] = {'successes': successes * factor, 'failures': failures * factor, 'latency': latency}
+        return scores
+
+    def rank(self, url: str, kind: str, candidates: Sequence[Any], key: Callable[[Any], str] = str) -> List[Any]:
+        """
+        Order candidates by their smoothed success rate on this domain, fastest first on ties.
+        Unknown candidates rank as a coin flip, so a proven winner moves ahead of
+        them and a proven loser falls behind; otherwise the given order is kept.
+        """
+        scores = self.scores(url, kind)
+        if kind == 'transport':
+            self.counters['lookups'] += 1
+            if scores:
+                self.counters['learned'] += 1
+        if not scores:
+            return list(candidates)
+
+        def sort_key(item: Tuple[int, Any]) -> Tuple[float, float, int]:
+            position, candidate = item
+            entry = scores.get(key(candidate))
+            if entry is None:
+                return (-0.5, float('inf'), position)
+            rate = (entry['successes'] + 1) / (entry['successes'] + entry['failures'] + 2)
+            return (-round(rate, 3), entry['latency'] if entry['successes'] else float('inf'), position)
+
+        return [candidate for _, candidate in sorted(enumerate(candidates), key=sort_key)]
+
+    def record(self, url: str, outcomes: Iterable[Outcome]) -> None:
+        """Fold one extraction's outcomes into the domain's decayed counts."""
+        outcomes = list(outcomes)
+        if not self.enabled or not outcomes:
+            return
+        domain = domain_key(url)
+        now = self._clock()
+        try:
+            with self._lock:
+                conn = self._connection()
+                for kind, name, success, latency in outcomes:
+                    row = conn.execute(
+                        'SELECT successes, failures, latency, updated_at FROM strategies '
+                        'WHERE domain = ? AND kind = ? AND name = ?',
+                        (domain, kind, name),
+                    ).fetchone()
+                    successes, failures, mean_latency = 0.0, 0.0, latency
+                    if row:
+                        factor = self._decay(now - row[3])
+                        successes, failures = row[0] * factor, row[1] * factor
+                        mean_latency = row[2] if row[2] is not None else latency
+                    if success:
+                        # Latency of successful runs only; failures are often fast timeouts or blocks
+                        mean_latency = latency if not successes else 0.7 * mean_latency + 0.3 * latency
+                        successes += 1
+                    else:
+                        failures += 1
+                    conn.execute(
+                        'INSERT OR REPLACE INTO strategies (domain, kind, name, successes, failures, latency, updated_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        (domain, kind, name, successes, failures, mean_latency, now),
+                    )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not record strategy outcomes for {domain}: {e}")
+
+    def note_result(self, first_choice_won: bool) -> None:
+        """Count whether the learned ranking's first choices produced the recipe."""
+        self.counters['first_choice_wins' if first_choice_won else 'misses'] += 1
+
+    def forget(self, url: str) -> None:
+        """Drop everything learned about the URL's domain."""
+        if not self.enabled:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.execute('DELETE FROM strategies WHERE domain = ?', (domain_key(url),))
+            conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self.counters)
+        decided = stats['first_choice_wins'] + stats['misses']
+        stats['first_choice_rate'] = round(stats['first_choice_wins'] / decided, 3) if decided else 0.0
+        return stats
+
+    def _connection(self):
+        """Open the database on first use. Caller must hold the lock."""
+        if self._conn is None:
+            self._conn = open_sqlite(self.path)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS strategies ('
+                'domain TEXT, kind TEXT, name TEXT, successes REAL, failures REAL, latency REAL, '
+                'updated_at REAL, PRIMARY KEY (domain, kind, name))'
+            )
+            self._conn.commit()
+        return self._conn
+
+strategy_memory = StrategyMemory()
@@ -0,0 +1,156 @@
+import unittest
+from datetime import timedelta
+
+from flask import Flask
+
+import audio_jobs
+from audio_jobs import claim, enqueue, fail, job_payload, release
+from audio_worker import BackgroundWorker, run_once
+from models import AudioJob, Recipe, db, utcnow
+
+
+class AudioJobQueueTests(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        recipe = Recipe(url="https://example.com/soup", title="Soup", instructions=["Boil."])
+        db.session.add(recipe)
+        db.session.commit()
+        self.recipe_id = recipe.id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def test_enqueue_is_idempotent_per_recipe_text(self):
+        first, created = enqueue(self.recipe_id, "narration_a.mp3")
+        again, created_again = enqueue(self.recipe_id, "narration_a.mp3")
+        edited, _ = enqueue(self.recipe_id, "narration_b.mp3")
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(first.id, again.id)
+        self.assertNotEqual(first.id, edited.id)
+        self.assertEqual(job_payload(first)["status_url"], f"/audio-jobs/{first.id}")
+
+    def test_a_job_is_claimed_once_until_its_lease_expires(self):
+        job, _ = enqueue(self.recipe_id, "narration_a.mp3")
+
+        claimed = claim()
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual((claimed.status, claimed.attempts), ("running", 1))
+        self.assertIsNone(claim())
+
+        later = utcnow() + timedelta(seconds=audio_jobs.AUDIO_JOB_LEASE_SECONDS + 1)
+        reclaimed = claim(now=later)
+        self.assertEqual((reclaimed.id, reclaimed.attempts), (job.id, 2))
+
+    def test_a_job_whose_worker_keeps_dying_fails_after_max_attempts(self):
+        job, _ = enqueue(self.recipe_id, "narration_a.mp3")
+        now = utcnow()
+        for _ in range(audio_jobs.AUDIO_JOB_MAX_ATTEMPTS):
+            self.assertEqual(claim(now=now).id, job.id)
+            now += timedelta(seconds=audio_jobs.AUDIO_JOB_LEASE_SECONDS + 1)
+
+        self.assertIsNone(claim(now=now))
+        job = db.session.get(AudioJob, job.id)
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job_payload(job)["error"], "Audio generation stopped responding")
+
+    def test_failures_are_retried_then_reported(self):
+        enqueue(self.recipe_id, "narration_a.mp3")
+        for _ in range(audio_jobs.AUDIO_JOB_MAX_ATTEMPTS):
+            job = claim()
+            fail(job, "TTS quota exceeded")
+        self.assertEqual(job.status, "failed")
+        self.assertIsNone(claim())
+
+        requeued, created = enqueue(self.recipe_id, "narration_a.mp3")
+        self.assertFalse(created)
+        self.assertEqual((requeued.status, requeued.attempts), ("queued", 0))
+
+    def test_worker_runs_a_job_and_records_progress(self):
+        job, _ = enqueue(self.recipe_id, "narration_a.mp3")
+
+        seen = []
+
+        def generate(recipe, on_segment):
+            on_segment(1, 2, "/static/audio/intro.mp3")
+            seen.append(job_payload(db.session.get(AudioJob, job.id)))
+            on_segment(2, 2, "/static/audio/step1.mp3")
+            return f"/static/audio/{recipe.title}.mp3"
+
+        self.assertTrue(run_once(generate))
+        self.assertEqual(seen[0]["progress"], {"done": 1, "total": 2})
+        self.assertEqual(seen[0]["segments"], ["/static/audio/intro.mp3"])
+        self.assertFalse(run_once(generate))
+
+        job = db.session.get(AudioJob, job.id)
+        self.assertEqual(job_payload(job)["status"], "done")
+        self.assertEqual(job_payload(job)["progress"], {"done": 2, "total": 2})
+        self.assertEqual(job.audio_url, "/static/audio/Soup.mp3")
+
+    def test_worker_failure_requeues_the_job(self):
+        job, _ = enqueue(self.recipe_id, "narration_a.mp3")
+
+        def broken(recipe, on_segment):
+            raise RuntimeError("TTS unavailable")
+
+        run_once(broken)
+        job = db.session.get(AudioJob, job.id)
+        self.assertEqual((job.status, job.error), ("queued", "TTS unavailable"))
+
+    def test_a_worker_that_lost_its_job_cannot_overwrite_it(self):
+        enqueue(self.recipe_id, "narration_a.mp3")
+        stale = claim()
+        db.session.expunge(stale)  # the other worker has a session of its own
+        later = utcnow() + timedelta(seconds=audio_jobs.AUDIO_JOB_LEASE_SECONDS + 1)
+        current = claim(now=later)
+
+        self.assertFalse(audio_jobs.heartbeat(stale, 1, 2))
+        self.assertFalse(audio_jobs.complete(stale, "/static/audio/old.mp3"))
+        self.assertFalse(fail(stale, "timeout"))
+        job = db.session.get(AudioJob, current.id)
+        self.assertEqual((job.status, job.attempts, job.audio_url), ("running", 2, None))
+
+        self.assertTrue(audio_jobs.complete(current, "/static/audio/new.mp3"))
+        job = db.session.get(AudioJob, current.id)
+        self.assertEqual((job.status, job.audio_url), ("done", "/static/audio/new.mp3"))
+
+    def test_stopping_the_worker_hands_its_job_back(self):
+        job, _ = enqueue(self.recipe_id, "narration_a.mp3")
+        worker = BackgroundWorker(self.app, generate=None)
+        seen = []
+
+        def interrupted(recipe, on_segment):
+            worker.stop()
+            db.session.expire_all()
+            seen.append(db.session.get(AudioJob, job.id).status)
+            raise RuntimeError("process exiting")
+
+        run_once(interrupted, on_claim=worker._track)
+
+        self.assertTrue(worker.stop_event.is_set())
+        self.assertEqual(seen, ["queued"])
+        self.assertIsNone(worker._current)
+        self.assertFalse(release(job.id, 1))
+
+    def test_release_ignores_a_job_claimed_again(self):
+        job, _ = enqueue(self.recipe_id, "narration_a.mp3")
+        claim()
+        later = utcnow() + timedelta(seconds=audio_jobs.AUDIO_JOB_LEASE_SECONDS + 1)
+        claim(now=later)
+
+        self.assertFalse(release(job.id, 1))
+        self.assertTrue(release(job.id, 2))
+        job = db.session.get(AudioJob, job.id)
+        self.assertEqual((job.status, job.attempts, job.locked_until), ("queued", 1, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
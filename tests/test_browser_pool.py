@@ -0,0 +1,120 @@
+import threading
+import unittest
+
+from browser_pool import BrowserPool, BrowserPoolExhausted
+
+
+class _FakeSwitch:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current = handle
+
+
+class _FakeDriver:
+    def __init__(self):
+        self.window_handles = ["main"]
+        self.current = "main"
+        self.switch_to = _FakeSwitch(self)
+        self.visited = []
+        self.quit_called = False
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def close(self):
+        self.window_handles.remove(self.current)
+
+    def quit(self):
+        self.quit_called = True
+
+
+class BrowserPoolTests(unittest.TestCase):
+    def make_pool(self, **kwargs):
+        self.drivers = []
+
+        def factory():
+            driver = _FakeDriver()
+            self.drivers.append(driver)
+            return driver
+
+        kwargs.setdefault("memory_probe", lambda driver: None)
+        return BrowserPool(factory=factory, **kwargs)
+
+    def test_browser_is_reused_and_tab_reset(self):
+        pool = self.make_pool(max_size=2)
+        with pool.browser() as driver:
+            driver.window_handles.append("popup")
+        with pool.browser() as again:
+            pass
+
+        self.assertIs(driver, again)
+        self.assertEqual(len(self.drivers), 1)
+        self.assertEqual(driver.window_handles, ["main"])
+        self.assertEqual(driver.visited[-1], "about:blank")
+        self.assertEqual(pool.stats()["reused"], 1)
+
+    def test_recycled_after_max_pages(self):
+        pool = self.make_pool(max_size=1, max_pages=2)
+        for _ in range(3):
+            with pool.browser():
+                pass
+
+        self.assertTrue(self.drivers[0].quit_called)
+        self.assertEqual(len(self.drivers), 2)
+        self.assertEqual(pool.stats()["recycled"], 1)
+
+    def test_recycled_when_memory_threshold_exceeded(self):
+        pool = self.make_pool(max_size=1, max_rss_mb=100, memory_probe=lambda driver: 500.0)
+        with pool.browser():
+            pass
+
+        self.assertTrue(self.drivers[0].quit_called)
+        self.assertEqual(pool.stats()["live"], 0)
+
+    def test_browser_errors_recycle_the_browser(self):
+        pool = self.make_pool(max_size=1)
+        with self.assertRaises(ConnectionError):
+            with pool.browser():
+                raise ConnectionError("chromedriver went away")
+
+        self.assertTrue(self.drivers[0].quit_called)
+        with pool.browser():
+            pass
+        self.assertEqual(len(self.drivers), 2)
+
+    def test_other_errors_keep_the_warm_browser(self):
+        pool = self.make_pool(max_size=1)
+        with self.assertRaises(ValueError):
+            with pool.browser():
+                raise ValueError("not a browser problem")
+
+        self.assertFalse(self.drivers[0].quit_called)
+        with pool.browser():
+            pass
+        self.assertEqual(len(self.drivers), 1)
+
+    def test_checkout_waits_for_checkin_and_times_out(self):
+        pool = self.make_pool(max_size=1)
+        held = pool.checkout()
+
+        with self.assertRaises(BrowserPoolExhausted):
+            pool.checkout(timeout=0.05)
+
+        threading.Timer(0.05, pool.checkin, args=(held,)).start()
+        self.assertIs(pool.checkout(timeout=2).driver, held.driver)
+
+    def test_close_quits_idle_browsers(self):
+        pool = self.make_pool(max_size=2)
+        with pool.browser():
+            pass
+        pool.close()
+
+        self.assertTrue(self.drivers[0].quit_called)
+        with self.assertRaises(RuntimeError):
+            pool.checkout()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from bulk_ingest import BulkIngester, Checkpoint, parse_sitemap
+
+
+class _Extraction:
+    def __init__(self, url, success=True, retry_after=None):
+        self.success = success
+        self.transport = "requests"
+        self.strategy = "json_ld"
+        self.error = None if success else "No recipe content found"
+        self.retry_after = retry_after
+        self.structured_data = None
+        self.url = url
+
+    def to_text(self):
+        return f"Title: {self.url}"
+
+
+def _structure(raw_text, structured_data=None):
+    return {"title": raw_text, "ingredients": [{"quantity": "1", "item": "egg"}], "instructions": ["Cook."]}
+
+
+class BulkIngesterTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.checkpoint_path = os.path.join(self.tmpdir.name, "checkpoint.jsonl")
+        self.saved_batches = []
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def save_batch(self, recipes):
+        self.saved_batches.append([recipe["url"] for recipe in recipes])
+        return {recipe["url"]: {"status": "ok", "id": i} for i, recipe in enumerate(recipes)}
+
+    def make_ingester(self, extract, **kwargs):
+        kwargs.setdefault("batch_size", 3)
+        return BulkIngester(
+            extract=extract,
+            structure=_structure,
+            save_batch=self.save_batch,
+            known_urls=None,
+            checkpoint=Checkpoint(self.checkpoint_path),
+            report=lambda line: None,
+            **kwargs,
+        )
+
+    def test_recipes_are_saved_in_batches_and_failures_checkpointed(self):
+        urls = [f"https://a{i}.example/r" for i in range(7)] + ["https://bad.example/r"]
+
+        def extract(url):
+            return _Extraction(url, success="bad" not in url)
+
+        stats = asyncio.run(self.make_ingester(extract).run(urls))
+
+        self.assertEqual(stats.counts["ok"], 7)
+        self.assertEqual(stats.counts["failed"], 1)
+        self.assertEqual(sorted(len(batch) for batch in self.saved_batches), [1, 3, 3])
+        self.assertEqual(Checkpoint(self.checkpoint_path).status["https://bad.example/r"], "failed")
+
+    def test_resume_skips_finished_urls(self):
+        calls = []
+
+        def extract(url):
+            calls.append(url)
+            return _Extraction(url, success="bad" not in url)
+
+        urls = ["https://a.example/1", "https://bad.example/2"]
+        asyncio.run(self.make_ingester(extract).run(urls))
+        calls.clear()
+
+        asyncio.run(self.make_ingester(extract).run(urls + ["https://a.example/3"]))
+        self.assertEqual(calls, ["https://a.example/3"])
+
+        asyncio.run(self.make_ingester(extract, retry_failed=True).run(urls))
+        self.assertEqual(calls, ["https://a.example/3", "https://bad.example/2"])
+
+    def test_per_domain_concurrency_is_bounded(self):
+        lock = threading.Lock()
+        active = {}
+        peak = {}
+
+        def extract(url):
+            domain = url.split("/")[2]
+            with lock:
+                active[domain] = active.get(domain, 0) + 1
+                peak[domain] = max(peak.get(domain, 0), active[domain])
+            time.sleep(0.02)
+            with lock:
+                active[domain] -= 1
+            return _Extraction(url)
+
+        urls = [f"https://{domain}.example/{i}" for domain in ("a", "b") for i in range(8)]
+        asyncio.run(self.make_ingester(extract, concurrency=8, per_domain=2).run(urls))
+
+        self.assertEqual(peak, {"a.example": 2, "b.example": 2})
+
+    def test_rate_limited_urls_are_retried(self):
+        attempts = []
+
+        def extract(url):
+            attempts.append(url)
+            return _Extraction(url, success=len(attempts) > 1, retry_after=None if attempts[1:] else 0.01)
+
+        stats = asyncio.run(self.make_ingester(extract).run(["https://a.example/1"]))
+
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(stats.counts["ok"], 1)
+
+
+class SitemapTests(unittest.TestCase):
+    def test_urlset_and_index(self):
+        urlset = (
+            b'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            b'<url><loc>https://a.example/r/1</loc></url><url><loc> https://a.example/r/2 </loc></url></urlset>'
+        )
+        index = (
+            b'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            b'<sitemap><loc>https://a.example/recipes.xml</loc></sitemap></sitemapindex>'
+        )
+
+        self.assertEqual(parse_sitemap(urlset), (["https://a.example/r/1", "https://a.example/r/2"], []))
+        self.assertEqual(parse_sitemap(index), ([], ["https://a.example/recipes.xml"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,224 @@
+import unittest
+from unittest import mock
+
+import circuit_breaker
+import recipe_pipeline
+from circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    NegativeCache,
+    classify_failure,
+    guarded_scrape,
+    is_scrape_failure,
+)
+from rate_limit import RateLimitedError
+from recipe_pipeline import Transport, extract_recipe
+from strategy_memory import StrategyMemory
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        self.breaker = CircuitBreaker(failure_threshold=3, block_threshold=2, open_seconds=60,
+                                      max_open_seconds=200, clock=self.clock)
+        self.url = "https://blocked.example/recipe/1"
+
+    def test_blocking_failures_open_the_circuit(self):
+        self.breaker.record_failure(self.url, blocked=True)
+        self.breaker.before_request(self.url)
+        self.breaker.record_failure(self.url, blocked=True)
+
+        self.assertEqual(self.breaker.state(self.url), OPEN)
+        with self.assertRaises(CircuitOpenError) as ctx:
+            self.breaker.before_request("https://blocked.example/recipe/2")
+        self.assertAlmostEqual(ctx.exception.retry_in, 60)
+
+    def test_half_open_allows_one_probe_and_success_closes(self):
+        for _ in range(3):
+            self.breaker.record_failure(self.url)
+        self.clock.now += 61
+
+        self.breaker.before_request(self.url)  # the probe
+        self.assertEqual(self.breaker.state(self.url), HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request(self.url)
+
+        self.breaker.record_success(self.url)
+        self.assertEqual(self.breaker.state(self.url), CLOSED)
+        self.breaker.before_request(self.url)
+
+    def test_released_probe_lets_the_next_request_probe(self):
+        for _ in range(3):
+            self.breaker.record_failure(self.url)
+        self.clock.now += 61
+        self.breaker.before_request(self.url)
+
+        self.breaker.release_probe(self.url)
+
+        self.breaker.before_request(self.url)
+        self.assertEqual(self.breaker.state(self.url), HALF_OPEN)
+
+    def test_failed_probe_reopens_for_longer(self):
+        self.breaker.record_failure(self.url, blocked=True)
+        self.breaker.record_failure(self.url, blocked=True)
+        self.clock.now += 61
+        self.breaker.before_request(self.url)
+        self.breaker.record_failure(self.url, blocked=True)
+
+        self.clock.now += 100
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request(self.url)
+        self.clock.now += 21
+        self.breaker.before_request(self.url)
+
+    def test_success_resets_the_failure_count(self):
+        self.breaker.record_failure(self.url)
+        self.breaker.record_failure(self.url)
+        self.breaker.record_success(self.url)
+        self.breaker.record_failure(self.url)
+
+        self.assertEqual(self.breaker.state(self.url), CLOSED)
+
+
+class NegativeCacheTests(unittest.TestCase):
+    def test_entries_expire(self):
+        clock = _Clock()
+        cache = NegativeCache(ttl=30, clock=clock)
+        cache.add("https://a.example/r?utm_source=x", "No recipe")
+
+        self.assertEqual(cache.get("https://A.example/r")[0], "No recipe")
+        clock.now += 31
+        self.assertIsNone(cache.get("https://a.example/r"))
+
+
+class FailureClassificationTests(unittest.TestCase):
+    def test_classify(self):
+        self.assertEqual(classify_failure("403 Client Error: Forbidden for url"), "blocked")
+        self.assertEqual(classify_failure(status=429), "blocked")
+        self.assertEqual(classify_failure("Error scraping recipe: Access Denied"), "blocked")
+        self.assertEqual(classify_failure("No recipe content found"), "no_recipe")
+        self.assertEqual(classify_failure("Connection reset by peer"), "error")
+        self.assertEqual(classify_failure("500 Server Error"), "error")
+        self.assertEqual(classify_failure("404 Client Error: Not Found for url"), "bad_url")
+        self.assertEqual(classify_failure(status=410), "bad_url")
+        self.assertEqual(classify_failure("Error scraping recipe: captcha required by cloudflare"), "error")
+
+    def test_is_scrape_failure(self):
+        self.assertTrue(is_scrape_failure(""))
+        self.assertTrue(is_scrape_failure("Error scraping recipe: boom"))
+        self.assertFalse(is_scrape_failure("Title: Pancakes\n\nIngredients:\n- flour"))
+
+
+class GuardedScrapeTests(unittest.TestCase):
+    def setUp(self):
+        for name, value in (("negative_cache", NegativeCache()), ("circuit_breaker", CircuitBreaker(block_threshold=1))):
+            patcher = mock.patch.object(circuit_breaker, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_blocked_domain_fails_fast_for_other_urls(self):
+        calls = []
+
+        def scrape():
+            calls.append(1)
+            return "Error scraping recipe: 403 Client Error: Forbidden"
+
+        guarded_scrape("https://b.example/1", scrape)
+        text = guarded_scrape("https://b.example/2", scrape)
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(is_scrape_failure(text))
+
+    def test_pipeline_skips_fetching_when_circuit_is_open(self):
+        fetches = []
+
+        def forbidden(url):
+            fetches.append(url)
+            raise recipe_pipeline.requests.exceptions.HTTPError(
+                "403 Client Error", response=mock.Mock(status_code=403))
+
+        transports = [Transport("a", forbidden)]
+        memory = StrategyMemory(enabled=False)
+        with mock.patch.object(recipe_pipeline, "html_cache"):
+            first = extract_recipe("https://c.example/1", transports=transports, memory=memory)
+            second = extract_recipe("https://c.example/2", transports=transports, memory=memory)
+
+        self.assertFalse(first.success)
+        self.assertFalse(second.success)
+        self.assertEqual(len(fetches), 1)
+        self.assertEqual(second.fetches, 0)
+        self.assertIn("c.example", second.error)
+
+
+class DomainHealthTests(unittest.TestCase):
+    def setUp(self):
+        for name, value in (("negative_cache", NegativeCache()), ("circuit_breaker", CircuitBreaker())):
+            patcher = mock.patch.object(circuit_breaker, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(recipe_pipeline, "html_cache")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.memory = StrategyMemory(enabled=False)
+
+    def test_pages_mentioning_cloudflare_or_captcha_are_not_blocks(self):
+        page = ('<html><head><title>About us</title></head><body><main><p>Served by Cloudflare. '
+                'Ray ID: 1234.</p><div class="g-recaptcha">captcha</div></main></body></html>')
+        self.assertFalse(recipe_pipeline.looks_blocked(page))
+        self.assertTrue(recipe_pipeline.looks_blocked("<title>Just a moment...</title>"))
+
+        for path in ("/about", "/contact", "/faq"):
+            extract_recipe(f"https://d.example{path}", transports=[Transport("a", lambda url: page)], memory=self.memory)
+
+        self.assertEqual(circuit_breaker.circuit_breaker.state("https://d.example/"), CLOSED)
+
+    def test_dead_urls_do_not_open_the_domain_circuit(self):
+        def not_found(url):
+            raise recipe_pipeline.requests.exceptions.HTTPError(
+                "404 Client Error", response=mock.Mock(status_code=404))
+
+        for index in range(4):
+            result = extract_recipe(f"https://e.example/{index}", transports=[Transport("a", not_found)],
+                                    memory=self.memory)
+            self.assertFalse(result.success)
+
+        self.assertEqual(circuit_breaker.circuit_breaker.state("https://e.example/"), CLOSED)
+        with self.assertRaises(CircuitOpenError):
+            circuit_breaker.guard("https://e.example/0")
+
+    def test_probes_that_prove_nothing_free_the_slot(self):
+        breaker = circuit_breaker.circuit_breaker
+
+        def rate_limited(url):
+            raise RateLimitedError("f.example", 30)
+
+        def not_found(url):
+            raise recipe_pipeline.requests.exceptions.HTTPError(
+                "404 Client Error", response=mock.Mock(status_code=404))
+
+        for fetch in (rate_limited, not_found):
+            with self.subTest(fetch=fetch.__name__):
+                for _ in range(breaker.failure_threshold):
+                    breaker.record_failure("https://f.example/")
+                breaker._circuits["f.example"].open_for = 0  # cool-down over: the next request probes
+
+                extract_recipe("https://f.example/probe", transports=[Transport("a", fetch)], memory=self.memory)
+
+                circuit_breaker.negative_cache.discard("https://f.example/next")
+                circuit_breaker.guard("https://f.example/next")  # not blocked waiting for the probe
+                breaker.record_success("https://f.example/")
+
+
+if __name__ == "__main__":
+    unittest.main()
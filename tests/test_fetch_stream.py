@@ -0,0 +1,124 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import scrape
+from html_cache import HtmlCache
+from scrape import fetch_html, read_html_stream
+
+
+RECIPE = {
+    "@context": "https://schema.org",
+    "@type": "Recipe",
+    "name": "Streamed pancakes",
+    "recipeIngredient": ["1 cup flour", "1 egg"],
+    "recipeInstructions": [{"@type": "HowToStep", "text": "Mix and fry."}],
+}
+
+
+class _FakeRaw:
+    def __init__(self, body, chunk):
+        self.body = body
+        self.chunk = chunk
+        self.read_bytes = 0
+
+    def stream(self, chunk_size, decode_content=True):
+        for start in range(0, len(self.body), self.chunk):
+            piece = self.body[start:start + self.chunk]
+            self.read_bytes += len(piece)
+            yield piece
+
+
+class _FakeResponse:
+    def __init__(self, body, headers, chunk=64):
+        self.raw = _FakeRaw(body, chunk)
+        self.headers = headers
+        self.closed = False
+        self.status_code = 200
+        self.ok = True
+        self.content = body
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def _page(body_padding):
+    return (
+        '<html><head><title>t</title>'
+        f'<script type="application/ld+json">{json.dumps(RECIPE)}</script>'
+        '</head><body>' + ("<p>life story</p>" * body_padding) + '</body></html>'
+    ).encode("utf-8")
+
+
+class ReadHtmlStreamTests(unittest.TestCase):
+    def test_stops_after_complete_json_ld_recipe(self):
+        body = gzip.compress(_page(5000))
+        response = _FakeResponse(body, {"content-encoding": "gzip", "content-type": "text/html; charset=utf-8"})
+
+        html_text = read_html_stream(response)
+
+        self.assertIn("Streamed pancakes", html_text)
+        self.assertLess(response.raw.read_bytes, len(body))
+        self.assertTrue(response.closed)
+
+    def test_reads_whole_body_when_no_recipe(self):
+        body = b"<html><body>" + b"<p>no recipe here</p>" * 100 + b"</body></html>"
+        response = _FakeResponse(body, {"content-type": "text/html"})
+
+        html_text = read_html_stream(response)
+
+        self.assertEqual(html_text.encode("utf-8"), body)
+        self.assertFalse(response.closed)
+
+    def test_enforces_body_size_cap(self):
+        body = b"<html><body>" + b"x" * 10000 + b"</body></html>"
+        response = _FakeResponse(body, {"content-type": "text/html"})
+
+        html_text = read_html_stream(response, max_bytes=1000)
+
+        self.assertEqual(len(html_text), 1000)
+        self.assertTrue(response.closed)
+
+
+class _FakeSession:
+    def __init__(self, body):
+        self.body = body
+        self.calls = 0
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        self.calls += 1
+        return _FakeResponse(self.body, {"content-type": "text/html; charset=utf-8"})
+
+
+class FetchHtmlCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        cache = HtmlCache(path=os.path.join(self.tmpdir.name, "cache.db"), default_ttl=60, enabled=True)
+        patcher = mock.patch.object(scrape, "html_cache", cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def test_truncated_body_is_not_served_as_the_full_page(self):
+        url = "https://a.example/pancakes"
+        session = _FakeSession(_page(5000))
+
+        partial = fetch_html(url, session, stream=True)
+        self.assertEqual(fetch_html(url, session, stream=True), partial)
+        self.assertEqual(session.calls, 1)
+
+        full = fetch_html(url, session, stream=False)
+        self.assertEqual(session.calls, 2)
+        self.assertGreater(len(full), len(partial))
+        self.assertEqual(fetch_html(url, session, stream=True), full)
+        self.assertEqual(session.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
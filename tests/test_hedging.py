@@ -0,0 +1,99 @@
+import threading
+import time
+import unittest
+
+from hedging import StrategyStats, hedged_race
+
+
+def _slow(result, delay, log=None, name=None):
+    def attempt(cancel):
+        if log is not None:
+            log.append(name)
+        cancel.wait(delay)
+        return None if cancel.is_set() else result
+    return attempt
+
+
+class HedgedRaceTests(unittest.TestCase):
+    def test_fast_first_attempt_never_starts_the_hedge(self):
+        stats = StrategyStats()
+        started = []
+        winner = hedged_race(
+            [("a", _slow("A", 0.01, started, "a")), ("b", _slow("B", 0.01, started, "b"))],
+            hedge_delay=1.0,
+            stats=stats,
+        )
+
+        self.assertEqual(winner, ("a", "A"))
+        self.assertEqual(started, ["a"])
+        self.assertEqual(stats.snapshot()["a"]["win_rate"], 1.0)
+
+    def test_hedge_wins_when_first_attempt_is_slow_and_loser_is_cancelled(self):
+        stats = StrategyStats()
+        cancelled = threading.Event()
+
+        def stuck(cancel):
+            cancel.wait(5)
+            if cancel.is_set():
+                cancelled.set()
+            return "late"
+
+        began = time.monotonic()
+        winner = hedged_race([("slow", stuck), ("fast", _slow("B", 0.01))], hedge_delay=0.05, stats=stats)
+
+        self.assertEqual(winner, ("fast", "B"))
+        self.assertLess(time.monotonic() - began, 1.0)
+        self.assertTrue(cancelled.wait(1))
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot["slow"]["cancelled"], 1)
+        self.assertEqual(snapshot["fast"]["wins"], 1)
+
+    def test_failed_attempt_starts_next_without_waiting_for_delay(self):
+        began = time.monotonic()
+        winner = hedged_race(
+            [("a", lambda cancel: None), ("b", lambda cancel: "B")],
+            hedge_delay=5.0,
+            stats=StrategyStats(),
+        )
+
+        self.assertEqual(winner, ("b", "B"))
+        self.assertLess(time.monotonic() - began, 1.0)
+
+    def test_rejected_results_and_errors_lose(self):
+        def boom(cancel):
+            raise RuntimeError("boom")
+
+        stats = StrategyStats()
+        winner = hedged_race(
+            [("a", boom), ("b", lambda cancel: {"ingredients": []})],
+            accept=lambda recipe: bool(recipe["ingredients"]),
+            hedge_delay=0.01,
+            stats=stats,
+        )
+
+        self.assertIsNone(winner)
+        self.assertEqual(stats.snapshot()["a"]["failures"], 1)
+        self.assertEqual(stats.snapshot()["b"]["win_rate"], 0.0)
+
+    def test_an_attempt_that_ends_the_race_is_not_a_win(self):
+        stats = StrategyStats()
+
+        def accept(result):
+            raise LookupError(result)
+
+        with self.assertRaises(LookupError):
+            hedged_race([("a", lambda cancel: "429")], accept=accept, stats=stats)
+
+        snapshot = stats.snapshot()["a"]
+        self.assertEqual((snapshot["wins"], snapshot["failures"]), (0, 1))
+
+    def test_deadline_bounds_total_time(self):
+        began = time.monotonic()
+        winner = hedged_race([("a", _slow("A", 5))], deadline=0.1, stats=StrategyStats())
+
+        self.assertIsNone(winner)
+        self.assertLess(time.monotonic() - began, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import time
+import unittest
+
+from html_cache import HtmlCache, normalize_url
+
+
+class HtmlCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = HtmlCache(path=os.path.join(self.tmpdir.name, "cache.db"), default_ttl=60, enabled=True)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_fresh_entry_is_a_hit(self):
+        self.cache.put("https://a.example/r?utm_source=x", "<html>ok</html>", {"ETag": '"v1"'})
+        entry = self.cache.get("https://A.example/r#top")
+
+        self.assertIsNotNone(entry)
+        self.assertTrue(entry.is_fresh())
+        self.assertEqual(entry.text, "<html>ok</html>")
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_stale_entry_offers_validators_and_revalidates(self):
+        self.cache.put(
+            "https://a.example/r",
+            "<html>ok</html>",
+            {"Cache-Control": "max-age=0", "ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+        )
+        entry = self.cache.get("https://a.example/r")
+
+        self.assertFalse(entry.is_fresh())
+        self.assertEqual(entry.conditional_headers()["If-None-Match"], '"v1"')
+        self.cache.refresh("https://a.example/r", {"Cache-Control": "max-age=120"})
+        self.assertTrue(self.cache.get("https://a.example/r").is_fresh(time.time() + 60))
+
+    def test_no_store_responses_are_not_cached(self):
+        self.cache.put("https://a.example/private", "<html/>", {"Cache-Control": "no-store"})
+        self.assertIsNone(self.cache.get("https://a.example/private"))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_least_recently_used_pages_are_evicted(self):
+        self.cache.max_bytes = 1500
+        body = os.urandom(600).hex()  # incompressible enough to hit the budget
+        self.cache.put("https://a.example/1", body)
+        self.cache.put("https://a.example/2", body)
+        self.cache.get("https://a.example/1")
+        self.cache.put("https://a.example/3", body)
+
+        self.assertIsNone(self.cache.get("https://a.example/2"))
+        self.assertIsNotNone(self.cache.get("https://a.example/3"))
+        self.assertGreater(self.cache.stats()["evictions"], 0)
+
+    def test_normalize_url_sorts_query_and_drops_tracking(self):
+        self.assertEqual(
+            normalize_url("HTTPS://Example.com:443/r?b=2&utm_medium=x&a=1&fbclid=z"),
+            "https://example.com/r?a=1&b=2",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+from http_session import (
+    SESSION_CONNECTIONS_PER_HOST,
+    SessionPool,
+    create_cloudscraper_session,
+    domain_key,
+)
+
+
+class _FakeSession:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SessionPoolTests(unittest.TestCase):
+    def test_same_domain_reuses_session(self):
+        pool = SessionPool(_FakeSession, max_size=4, idle_timeout=60)
+        first = pool.get("https://www.allrecipes.com/recipe/1/")
+        second = pool.get("https://WWW.allrecipes.com/recipe/2/")
+
+        self.assertIs(first, second)
+        self.assertEqual(pool.stats()["created"], 1)
+        self.assertEqual(pool.stats()["reused"], 1)
+
+    def test_least_recently_used_domain_is_evicted_when_full(self):
+        pool = SessionPool(_FakeSession, max_size=2, idle_timeout=0)
+        a = pool.get("https://a.example/")
+        pool.get("https://b.example/")
+        pool.get("https://a.example/")  # refresh a
+        pool.get("https://c.example/")
+
+        self.assertTrue(pool.get("https://a.example/") is a)
+        self.assertNotIn("https://b.example/", pool)
+        self.assertFalse(a.closed)
+
+    def test_idle_sessions_are_closed(self):
+        clock = _FakeClock()
+        pool = SessionPool(_FakeSession, max_size=4, idle_timeout=30, clock=clock)
+        idle = pool.get("https://idle.example/")
+        clock.now = 31
+
+        self.assertEqual(pool.evict_idle(), 1)
+        self.assertTrue(idle.closed)
+        self.assertIsNot(pool.get("https://idle.example/"), idle)
+
+    def test_domain_key_ignores_path_and_case(self):
+        self.assertEqual(domain_key("https://Example.com/a?b=1"), "example.com")
+
+    def test_cloudscraper_keeps_its_cipher_suite_adapter(self):
+        session = create_cloudscraper_session()
+        adapter = session.get_adapter("https://example.com/")
+
+        self.assertEqual(type(adapter).__name__, "CipherSuiteAdapter")
+        self.assertEqual(adapter._pool_maxsize, SESSION_CONNECTIONS_PER_HOST)
+        self.assertIs(adapter.poolmanager.connection_pool_kw["ssl_context"], adapter.ssl_context)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+from llm_cache import LlmCache, content_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class LlmCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+        self.cache = LlmCache(
+            path=os.path.join(self.tmpdir.name, "llm.db"), ttl=100, max_entries=10, enabled=True, clock=self.clock
+        )
+        self.calls = []
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def structure(self, text):
+        self.calls.append(text)
+        return {"title": text.split()[1], "ingredients": ["egg"], "instructions": ["Cook."]}
+
+    def test_whitespace_variants_share_a_key_but_versions_do_not(self):
+        self.assertEqual(
+            content_key("Title: Pancakes\r\n\n  Ingredients:\t- egg ", "v1"),
+            content_key("Title:  Pancakes\nIngredients: - egg", "v1"),
+        )
+        self.assertNotEqual(content_key("Title: Pancakes", "v1"), content_key("Title: Pancakes", "v2"))
+
+    def test_memoized_results_are_reused_and_counted(self):
+        structure = self.cache.memoize(self.structure, "v1")
+
+        first = structure("Title: Pancakes")
+        second = structure("Title:   Pancakes\n")
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.calls, ["Title: Pancakes"])
+        self.assertEqual(self.cache.stats()["hit_rate"], 0.5)
+
+    def test_failures_are_not_cached(self):
+        structure = self.cache.memoize(lambda text: {"title": "Error parsing recipe"}, "v1",
+                                       cacheable=lambda result: result["title"] != "Error parsing recipe")
+        structure("Title: Pancakes")
+        structure("Title: Pancakes")
+
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+    def test_entries_expire_and_lru_is_evicted(self):
+        structure = self.cache.memoize(self.structure, "v1")
+        structure("Title: old")
+        self.clock.now += 101
+        structure("Title: old")
+        self.assertEqual(self.calls, ["Title: old", "Title: old"])
+
+        for i in range(12):
+            self.clock.now += 1
+            structure(f"Title: r{i}")
+        self.clock.now += 1
+        structure("Title: r11")
+        self.assertEqual(len(self.calls), 14)
+        self.assertIsNone(self.cache.get(content_key("Title: r0", "v1")))
+        self.assertGreater(self.cache.stats()["evictions"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from mp3_utils import Mp3FrameFilter, audio_frames, concat_mp3, parse_frame_header
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, joint stereo: 417-byte frames with 32 bytes of side info
+HEADER = b"\xff\xfb\x90\x44"
+FRAME_LENGTH = 417
+
+
+def _frame(fill):
+    return HEADER + bytes([fill]) * (FRAME_LENGTH - 4)
+
+
+def _xing_frame():
+    body = b"\x00" * 32 + b"Xing" + b"\x00" * (FRAME_LENGTH - 40)
+    return HEADER + body
+
+
+def _mp3(*fills, id3=True, xing=True, id3v1=True):
+    data = b""
+    if id3:
+        data += b"ID3\x04\x00\x00\x00\x00\x00\x0a" + b"\x00" * 10
+    if xing:
+        data += _xing_frame()
+    data += b"".join(_frame(fill) for fill in fills)
+    if id3v1:
+        data += b"TAG" + b"\x00" * 125
+    return data
+
+
+class Mp3UtilsTests(unittest.TestCase):
+    def test_frame_header_is_parsed(self):
+        self.assertEqual(parse_frame_header(_frame(1), 0), (FRAME_LENGTH, 32))
+        self.assertIsNone(parse_frame_header(b"ID3\x04", 0))
+
+    def test_tags_and_info_frame_are_stripped(self):
+        self.assertEqual(audio_frames(_mp3(1, 2)), _frame(1) + _frame(2))
+        self.assertEqual(audio_frames(_mp3(1, id3=False, xing=False, id3v1=False)), _frame(1))
+
+    def test_parts_are_joined_frame_by_frame(self):
+        joined = concat_mp3([_mp3(1, 2), _mp3(3), _mp3(4, xing=False)])
+        self.assertEqual(joined, b"".join(_frame(fill) for fill in (1, 2, 3, 4)))
+
+    def test_filter_emits_whole_frames_as_bytes_arrive(self):
+        data = _mp3(1, 2, 3)
+        frames = Mp3FrameFilter()
+        emitted = []
+        for start in range(0, len(data), 100):
+            output = frames.feed(data[start:start + 100])
+            self.assertEqual(len(output) % FRAME_LENGTH, 0)
+            emitted.append(output)
+        emitted.append(frames.flush())
+
+        self.assertEqual(b"".join(emitted), _frame(1) + _frame(2) + _frame(3))
+        self.assertEqual(next(output for output in emitted if output), _frame(1))
+
+    def test_unparseable_data_passes_through(self):
+        self.assertEqual(concat_mp3([b"abc", b"def"]), b"abcdef")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+
+from narration import Narration, narration_segments, narration_text
+from tts import AudioCache
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz: 417-byte frames of 1152 samples
+HEADER = b"\xff\xfb\x90\x44"
+FRAME_SECONDS = 1152 / 44100
+
+RECIPE = {
+    "title": " Soup ",
+    "introduction": "",
+    "ingredients": [{"quantity": "2 cups", "item": "stock"}, "salt", {"item": ""}],
+    "instructions": ["Boil the stock.", {"text": "Season."}],
+}
+
+
+class FakeStorage:
+    def __init__(self):
+        self.files = {}
+
+    def audio_exists(self, filename):
+        return f"/static/audio/{filename}" if filename in self.files else None
+
+    def save_audio(self, audio_content, filename):
+        self.files[filename] = audio_content
+        return f"/static/audio/{filename}"
+
+    def load_audio(self, filename):
+        return self.files.get(filename)
+
+
+def _cache(calls, frames_per_segment=2):
+    def synthesize(text, *args):
+        calls.append(text)
+        return (HEADER + b"\x00" * 413) * frames_per_segment
+
+    return AudioCache(FakeStorage(), synthesize)
+
+
+class NarrationTextTests(unittest.TestCase):
+    def test_matches_the_template_narration(self):
+        self.assertEqual(
+            narration_text(RECIPE),
+            "Recipe: Soup\n\nIngredients:\n2 cups stock\nsalt\n\nInstructions:\n"
+            "Step 1: Boil the stock.\nStep 2: Season.",
+        )
+
+    def test_one_segment_per_step(self):
+        self.assertEqual(
+            [(segment["label"], segment["text"]) for segment in narration_segments(RECIPE)],
+            [
+                ("Introduction", "Recipe: Soup"),
+                ("Ingredients", "Ingredients:\n2 cups stock\nsalt"),
+                ("Step 1", "Step 1: Boil the stock."),
+                ("Step 2", "Step 2: Season."),
+            ],
+        )
+
+
+class NarrationTests(unittest.TestCase):
+    def test_manifest_records_offsets_and_start_times(self):
+        calls = []
+        narration = Narration(_cache(calls), RECIPE)
+        audio = b"".join(narration.stream())
+
+        manifest = narration.manifest
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(narration.cache.storage.files[narration.filename], audio)
+        self.assertEqual([segment["offset"] for segment in manifest["segments"]], [0, 834, 1668, 2502])
+        self.assertAlmostEqual(manifest["segments"][2]["start"], 4 * FRAME_SECONDS, places=3)
+        self.assertAlmostEqual(manifest["duration"], 8 * FRAME_SECONDS, places=3)
+        self.assertTrue(narration.is_current(manifest))
+
+    def test_only_changed_steps_are_synthesized_again(self):
+        calls = []
+        cache = _cache(calls)
+        first = Narration(cache, RECIPE)
+        b"".join(first.stream())
+
+        edited = dict(RECIPE, instructions=["Boil the stock.", "Season well."])
+        calls.clear()
+        second = Narration(cache, edited)
+        self.assertFalse(second.is_current(first.manifest))
+        b"".join(second.stream())
+
+        self.assertEqual(calls, ["Step 2: Season well."])
+        self.assertEqual(
+            [segment["filename"] for segment in second.manifest["segments"][:3]],
+            [segment["filename"] for segment in first.manifest["segments"][:3]],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import json
+import unittest
+
+from partial_json import IncrementalJsonParser
+
+
+DOCUMENT = {
+    "title": "Brace {yourself} \"pancakes\"",
+    "introduction": "Quick, with [brackets] and a \\ backslash.",
+    "ingredients": [
+        {"quantity": "2 cups", "item": "flour"},
+        {"quantity": "1", "item": "egg"},
+    ],
+    "instructions": ["Mix.", "Cook."],
+    "servings": 4,
+}
+
+
+def _feed_all(text, size):
+    parser = IncrementalJsonParser()
+    snapshots = []
+    for start in range(0, len(text), size):
+        parser.feed(text[start:start + size])
+        snapshots.append(parser.snapshot())
+    return parser, snapshots
+
+
+class IncrementalJsonParserTests(unittest.TestCase):
+    def test_snapshots_only_expose_completed_values(self):
+        text = json.dumps(DOCUMENT, indent=2)
+        parser, snapshots = _feed_all(text, 1)
+
+        for snapshot in snapshots:
+            if snapshot is None:
+                continue
+            for field, value in snapshot.items():
+                expected = DOCUMENT[field]
+                if isinstance(expected, list):
+                    # Lists grow item by item; a trailing object may still be filling in
+                    self.assertEqual(value[:-1], expected[:len(value) - 1])
+                else:
+                    self.assertEqual(value, expected, field)
+        self.assertEqual(parser.result(), DOCUMENT)
+        self.assertEqual(snapshots[-1], DOCUMENT)
+
+    def test_fields_appear_in_order_as_they_complete(self):
+        parser = IncrementalJsonParser()
+        parser.feed('{"title": "Soup", "introduction": "Warm')
+        self.assertEqual(parser.snapshot(), {"title": "Soup"})
+        parser.feed(' and easy", "instructions": ["Boil", "Se')
+        self.assertEqual(
+            parser.snapshot(),
+            {"title": "Soup", "introduction": "Warm and easy", "instructions": ["Boil"]},
+        )
+
+    def test_numbers_are_exposed_only_once_terminated(self):
+        parser = IncrementalJsonParser()
+        parser.feed('{"servings": 1')
+        self.assertIsNone(parser.snapshot())
+        parser.feed('2, "title"')
+        self.assertEqual(parser.snapshot(), {"servings": 12})
+
+    def test_result_rejects_incomplete_documents(self):
+        parser = IncrementalJsonParser()
+        parser.feed('{"title": "Soup"')
+        with self.assertRaises(json.JSONDecodeError):
+            parser.result()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+from prompt_compaction import compact_for_prompt, estimate_tokens, score_blocks
+
+
+def _page(story_paragraphs=60, comments=60):
+    story = [
+        f"Paragraph {i}: my grandmother always told me stories about summers by the lake and this dish."
+        for i in range(story_paragraphs)
+    ]
+    recipe = [
+        "Ingredients",
+        "2 cups all-purpose flour",
+        "1/2 tsp salt",
+        "3 large eggs",
+        "Instructions",
+        "Preheat the oven to 350°F.",
+        "Whisk the flour and salt, then beat in the eggs.",
+        "Bake for 25 minutes.",
+    ]
+    tail = ["Comments"] + [f"Reply: I made this {i} times, subscribe to my newsletter!" for i in range(comments)]
+    return "\n".join(["Title: Lake Day Pancakes"] + story + recipe + tail)
+
+
+class PromptCompactionTests(unittest.TestCase):
+    def test_short_text_is_unchanged(self):
+        text = "Title: Toast\nIngredients:\n- bread"
+        self.assertEqual(compact_for_prompt(text, budget=500), (text, estimate_tokens(text), estimate_tokens(text)))
+
+    def test_recipe_lines_outscore_story_and_comments(self):
+        scores = score_blocks([
+            "My grandmother loved summers by the lake.",
+            "2 cups all-purpose flour",
+            "Whisk the flour and salt.",
+            "Reply: subscribe to my newsletter!",
+        ])
+        self.assertGreater(scores[1], scores[0])
+        self.assertGreater(scores[2], scores[0])
+        self.assertLess(scores[3], scores[0])
+
+    def test_compaction_keeps_recipe_within_budget(self):
+        text = _page()
+        compacted, before, after = compact_for_prompt(text, budget=200)
+
+        self.assertGreater(before, 200)
+        self.assertLessEqual(after, 200)
+        for line in ("Title: Lake Day Pancakes", "2 cups all-purpose flour", "1/2 tsp salt",
+                     "Preheat the oven to 350°F.", "Bake for 25 minutes."):
+            self.assertIn(line, compacted)
+        self.assertNotIn("subscribe", compacted)
+        # Page order is preserved
+        self.assertLess(compacted.index("Ingredients"), compacted.index("Preheat"))
+
+    def test_very_long_pages_are_mapped_in_chunks(self):
+        mapped = []
+
+        def mapper(chunk, budget):
+            mapped.append(chunk)
+            return "\n".join(line for line in chunk.splitlines() if "Paragraph" not in line and "Reply" not in line)
+
+        compacted, before, after = compact_for_prompt(_page(400, 400), budget=200, mapper=mapper)
+
+        self.assertGreater(len(mapped), 4)
+        self.assertGreater(before, 200 * 4)
+        self.assertIn("3 large eggs", compacted)
+        self.assertNotIn("Paragraph", compacted)
+
+
+if __name__ == "__main__":
+    unittest.main()
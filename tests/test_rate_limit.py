@@ -0,0 +1,125 @@
+import unittest
+
+from rate_limit import DomainRateLimiter, RateLimitedError, parse_retry_after
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class _FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def _limiter(clock, rate=1.0, burst=2):
+    return DomainRateLimiter(
+        rate=rate,
+        burst=burst,
+        respect_crawl_delay=False,
+        clock=clock,
+        sleep=clock.sleep,
+    )
+
+
+class DomainRateLimiterTests(unittest.TestCase):
+    def test_idle_domain_is_not_delayed(self):
+        clock = _FakeClock()
+        limiter = _limiter(clock)
+
+        self.assertEqual(limiter.acquire("https://a.example/1"), 0)
+        self.assertEqual(limiter.acquire("https://a.example/2"), 0)
+        self.assertEqual(clock.slept, [])
+
+    def test_waits_only_once_burst_is_spent(self):
+        clock = _FakeClock()
+        limiter = _limiter(clock, rate=0.5, burst=2)
+        limiter.acquire("https://a.example/1")
+        limiter.acquire("https://a.example/2")
+
+        self.assertAlmostEqual(limiter.acquire("https://a.example/3"), 2.0)
+        # Other domains keep their own budget.
+        self.assertEqual(limiter.acquire("https://b.example/1"), 0)
+
+    def test_retry_after_blocks_domain(self):
+        clock = _FakeClock()
+        limiter = _limiter(clock)
+        limiter.note_response("https://a.example/", _FakeResponse(429, {"Retry-After": "30"}))
+
+        with self.assertRaises(RateLimitedError):
+            limiter.acquire("https://a.example/", max_wait=5)
+        self.assertAlmostEqual(limiter.acquire("https://a.example/"), 30.0)
+
+    def test_crawl_delay_caps_rate(self):
+        clock = _FakeClock()
+        limiter = _limiter(clock, rate=1.0, burst=3)
+        limiter.set_crawl_delay("https://slow.example/", 10)
+        limiter.acquire("https://slow.example/1")
+
+        self.assertAlmostEqual(limiter.acquire("https://slow.example/2"), 10.0)
+
+    def test_rate_change_applies_to_known_domains_under_their_crawl_delay(self):
+        clock = _FakeClock()
+        limiter = _limiter(clock, rate=0.5, burst=1)
+        limiter.acquire("https://a.example/1")
+        limiter.set_crawl_delay("https://slow.example/", 10)
+        limiter.acquire("https://slow.example/1")
+
+        limiter.set_rate(2.0)
+
+        self.assertAlmostEqual(limiter.acquire("https://slow.example/2"), 10.0)
+        self.assertEqual(limiter.acquire("https://a.example/2"), 0)
+        self.assertAlmostEqual(limiter.acquire("https://a.example/3"), 0.5)
+        self.assertEqual(limiter.acquire("https://new.example/1"), 0)
+        self.assertAlmostEqual(limiter.acquire("https://new.example/2"), 0.5)
+
+    def test_crawl_delay_is_looked_up_off_the_request_path(self):
+        clock = _FakeClock()
+        spawned = []
+        limiter = DomainRateLimiter(
+            rate=1.0,
+            burst=3,
+            crawl_delay_fetcher=lambda url: 10,
+            clock=clock,
+            sleep=clock.sleep,
+            spawn=spawned.append,
+        )
+
+        self.assertEqual(limiter.acquire("https://slow.example/1"), 0)
+        self.assertEqual(len(spawned), 1)
+        spawned[0]()
+        limiter.acquire("https://slow.example/2")
+        self.assertEqual(len(spawned), 1)
+        self.assertGreater(limiter.acquire("https://slow.example/3"), 0)
+
+    def test_least_recently_used_idle_domains_are_forgotten(self):
+        clock = _FakeClock()
+        limiter = DomainRateLimiter(
+            rate=1.0, burst=2, respect_crawl_delay=False, clock=clock, sleep=clock.sleep, max_domains=2,
+        )
+        limiter.block("https://blocked.example/", 60)
+        limiter.acquire("https://a.example/")
+        limiter.acquire("https://b.example/")
+
+        self.assertEqual(limiter.stats()["domains"], 2)
+        with self.assertRaises(RateLimitedError):
+            limiter.acquire("https://blocked.example/", max_wait=5)
+
+    def test_parse_retry_after_http_date(self):
+        seconds = parse_retry_after("Thu, 01 Jan 1970 00:01:40 GMT", now=40)
+        self.assertAlmostEqual(seconds, 60.0)
+        self.assertIsNone(parse_retry_after("soon"))
+
+
+if __name__ == "__main__":
+    unittest.main()
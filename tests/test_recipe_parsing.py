@@ -1,9 +1,17 @@
 import json
+import time
 import unittest
 
 from bs4 import BeautifulSoup
 
-from scrape import extract_recipe_content, get_structured_data
+from scrape import (
+    _load_json_ld_payloads,
+    extract_recipe_content,
+    _find_recipe_in_data,
+    format_structured_recipe,
+    get_structured_data,
+    get_structured_data_from_html,
+)
 
 
 TOP_25_POPULAR_RECIPE_SITES = [
@@ -113,6 +121,32 @@ class RecipeParsingTests(unittest.TestCase):
                 self.assertIn("Ingredients:", content, msg=f"Missing ingredients for {domain}")
                 self.assertIn("Instructions:", content, msg=f"Missing instructions for {domain}")
 
+    def test_soup_free_fast_path_matches_dom_extraction(self):
+        for index, (domain, url) in enumerate(TOP_25_POPULAR_RECIPE_SITES):
+            payload = _build_recipe_payload(domain, index)
+            html_doc = (
+                '<html><head>'
+                '<script type="application/ld+json">{"@type": "WebSite", "name": "site"}</script>'
+                f'<script type="application/ld+json">{json.dumps(payload)}</script>'
+                '</head><body><p>Body text</p></body></html>'
+            )
+
+            with self.subTest(domain=domain):
+                structured = get_structured_data_from_html(html_doc)
+                self.assertIsNotNone(structured, msg=f"Fast path missed recipe JSON-LD for {domain}")
+                self.assertEqual(
+                    format_structured_recipe(structured),
+                    extract_recipe_content(BeautifulSoup(html_doc, "html.parser"), url),
+                )
+
+    def test_fast_path_ignores_incomplete_recipes(self):
+        html_doc = (
+            '<script type="application/ld+json">'
+            '{"@type": "Recipe", "name": "No steps", "recipeIngredient": ["1 egg"]}'
+            '</script>'
+        )
+        self.assertIsNone(get_structured_data_from_html(html_doc))
+
     def test_inspiredtaste_style_invalid_control_chars_in_json_ld(self):
         # This payload intentionally contains literal CR/LF inside description text.
         malformed_json_ld = (
@@ -145,5 +179,65 @@ class RecipeParsingTests(unittest.TestCase):
         self.assertIn("Sear in a skillet", content)
 
 
+    def test_broken_graph_node_still_yields_recipe(self):
+        recipe = {"@type": "Recipe", "name": "Pancakes", "recipeIngredient": ["1 egg"]}
+        raw = (
+            '{"@context": "https://schema.org", "@graph": ['
+            '{"@type": "WebPage", "name": "Page"},'
+            f"{json.dumps(recipe)},"
+            '{"@type": "BreadcrumbList", "itemListElement": [1, 2,]}'
+            "]}"
+        )
+
+        self.assertIn(recipe, _load_json_ld_payloads(raw))
+
+    def test_json_ld_scanner_respects_strings(self):
+        raw = (
+            '{"@type": "Recipe", "name": "Brackets ] and } and \\"quotes\\" [", "x": 1}'
+            ' junk {"@type": "WebSite", "url": "https://example.com/{id}"}'
+        )
+
+        payloads = _load_json_ld_payloads(raw)
+        self.assertEqual(
+            [payload["@type"] for payload in payloads],
+            ["Recipe", "WebSite"],
+        )
+        self.assertEqual(payloads[0]["name"], 'Brackets ] and } and "quotes" [')
+
+    def test_json_ld_scanner_handles_truncated_payloads(self):
+        self.assertEqual(_load_json_ld_payloads('{"@type": "Recipe", "name": "Cut off'), [])
+        self.assertEqual(
+            _load_json_ld_payloads('[{"@type": "Recipe", "name": "Kept"}, {"@type": "Wha'),
+            [{"@type": "Recipe", "name": "Kept"}],
+        )
+
+    def test_json_ld_scanner_is_linear_on_pathological_input(self):
+        for raw in ('{"a":[' * 200_000, "[1," * 300_000, '{"a":}' * 100_000):
+            start = time.perf_counter()
+            self.assertEqual(_load_json_ld_payloads(raw), [])
+            self.assertLess(time.perf_counter() - start, 5.0)
+
+    def test_recipe_search_prefers_recipe_with_ingredients(self):
+        stub = {"@type": "Recipe", "name": "Related recipe"}
+        full = {"@type": ["Recipe", "NewsArticle"], "name": "Main", "recipeIngredient": ["1 egg"]}
+        data = {
+            "@graph": [
+                {"@type": "BreadcrumbList", "itemListElement": [{"@type": "Recipe", "name": "Crumb"}]},
+                {"@type": "WebPage", "hasPart": stub},
+                {"@type": "Article", "mainEntity": full},
+            ]
+        }
+
+        self.assertIs(_find_recipe_in_data(data), full)
+        self.assertIs(_find_recipe_in_data({"@graph": [stub]}), stub)
+
+    def test_recipe_search_handles_deep_nesting(self):
+        data = recipe = {"@type": "Recipe", "name": "Deep", "recipeIngredient": ["salt"]}
+        for _ in range(5000):
+            data = {"@type": "WebPage", "hasPart": [data]}
+
+        self.assertIs(_find_recipe_in_data(data), recipe)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,151 @@
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+import circuit_breaker
+import hedging
+import recipe_pipeline
+from circuit_breaker import CircuitBreaker, NegativeCache
+from hedging import StrategyStats
+from rate_limit import RateLimitedError
+from recipe_pipeline import Transport, extract_recipe
+from strategy_memory import StrategyMemory
+
+
+RECIPE_PAGE = (
+    '<html><head><script type="application/ld+json">'
+    + json.dumps({
+        "@type": "Recipe",
+        "name": "Pipeline pancakes",
+        "recipeIngredient": ["1 cup flour"],
+        "recipeInstructions": ["Mix and fry."],
+    })
+    + '</script></head><body></body></html>'
+)
+
+KOREAN_PAGE = (
+    '<html><body><h3 class="view2_tit">김치찌개</h3>'
+    '<div class="ready_ingre3"><ul><li>김치 1컵 구매</li></ul></div>'
+    '<div class="view_step"><div class="media"><div class="media-body">김치를 볶는다</div></div></div>'
+    '</body></html>'
+)
+
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f"{status} error", response=response)
+
+
+class _CountingFetch:
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.calls = 0
+
+    def __call__(self, url):
+        self.calls += 1
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+class RecipePipelineTests(unittest.TestCase):
+    def setUp(self):
+        for name, value in (("html_cache", mock.DEFAULT), ("strategy_memory", StrategyMemory(enabled=False))):
+            patcher = mock.patch.object(recipe_pipeline, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for name, value in (("negative_cache", NegativeCache()), ("circuit_breaker", CircuitBreaker())):
+            patcher = mock.patch.object(circuit_breaker, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_json_ld_page_costs_one_fetch(self):
+        first, second = _CountingFetch(RECIPE_PAGE), _CountingFetch(RECIPE_PAGE)
+        result = extract_recipe("https://a.example/r", transports=[Transport("a", first), Transport("b", second)])
+
+        self.assertTrue(result.success)
+        self.assertEqual((result.transport, result.strategy, result.fetches), ("a", "json_ld", 1))
+        self.assertEqual(second.calls, 0)
+        self.assertIn("Pipeline pancakes", result.to_text())
+
+    def test_blocked_transport_falls_through_without_retrying(self):
+        blocked, fallback = _CountingFetch(_http_error(403)), _CountingFetch(RECIPE_PAGE)
+        result = extract_recipe(
+            "https://a.example/r",
+            max_retries=3,
+            transports=[Transport("a", blocked), Transport("b", fallback)],
+        )
+
+        self.assertTrue(result.success)
+        self.assertEqual(blocked.calls, 1)
+        self.assertEqual(result.transport, "b")
+
+    def test_page_without_recipe_is_not_refetched_by_same_kind_of_transport(self):
+        empty, other = _CountingFetch("<html><body><p>hello</p></body></html>"), _CountingFetch(RECIPE_PAGE)
+        result = extract_recipe("https://a.example/r", transports=[Transport("a", empty), Transport("b", other)])
+
+        self.assertFalse(result.success)
+        self.assertEqual(other.calls, 0)
+        self.assertTrue(result.to_text().startswith("Error scraping recipe:"))
+
+    def test_site_handler_runs_on_shared_document(self):
+        fetch = _CountingFetch(KOREAN_PAGE)
+        result = extract_recipe("https://www.10000recipe.com/recipe/1", transports=[Transport("a", fetch)])
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.strategy, "site_handler")
+        self.assertIn("김치를 볶는다", result.text)
+
+    def test_slow_transport_is_hedged_by_the_next_one(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def stuck(url):
+            release.wait(5)
+            return RECIPE_PAGE
+
+        began = time.monotonic()
+        with mock.patch.object(recipe_pipeline, "HEDGE_DELAY", 0.05):
+            result = extract_recipe(
+                "https://a.example/r",
+                transports=[Transport("slow", stuck), Transport("fast", _CountingFetch(RECIPE_PAGE))],
+                hedged=True,
+            )
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.transport, "fast")
+        self.assertLess(time.monotonic() - began, 1.0)
+
+    def test_rate_limited_transport_is_not_counted_as_a_win(self):
+        stats = StrategyStats()
+        limited = _CountingFetch(RateLimitedError("a.example", 30))
+        with mock.patch.object(hedging, "transport_stats", stats):
+            result = extract_recipe("https://a.example/r", transports=[Transport("a", limited)])
+
+        self.assertFalse(result.success)
+        self.assertEqual(result.retry_after, 30)
+        self.assertEqual(stats.snapshot()["a"]["wins"], 0)
+
+    def test_run_gives_up_at_the_deadline(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def stuck(url):
+            release.wait(5)
+            return RECIPE_PAGE
+
+        began = time.monotonic()
+        result = extract_recipe("https://a.example/r", transports=[Transport("slow", stuck)], deadline=0.2)
+
+        self.assertFalse(result.success)
+        self.assertLess(time.monotonic() - began, 1.0)
+        self.assertIn("Gave up", result.error)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+
+from recipe_structuring import add_first_use_quantities, split_ingredient, structure_from_json_ld, structure_recipe
+
+
+def _recipe(**overrides):
+    recipe = {
+        "@type": "Recipe",
+        "name": "Pancakes",
+        "description": "Fluffy weekend pancakes. Ready in 20 minutes. Kids love them.",
+        "recipeIngredient": ["2 cups flour", "1 tsp salt", "2 large eggs"],
+        "recipeInstructions": [
+            {"@type": "HowToStep", "text": "Mix the flour and salt in a bowl."},
+            {"@type": "HowToStep", "text": "Beat in the eggs and cook."},
+        ],
+    }
+    recipe.update(overrides)
+    return recipe
+
+
+class SplitIngredientTests(unittest.TestCase):
+    def test_common_ingredient_lines(self):
+        cases = {
+            "2 cups all-purpose flour": ("2 cups", "all-purpose flour"),
+            "1 1/2 tsp. baking soda": ("1 1/2 tsp.", "baking soda"),
+            "1/2 cup sugar": ("1/2 cup", "sugar"),
+            "3/4 tsp salt": ("3/4 tsp", "salt"),
+            "1/2-1 cup water": ("1/2-1 cup", "water"),
+            "½ cup sugar": ("½ cup", "sugar"),
+            "1 (14 oz) can diced tomatoes": ("1 (14 oz) can", "diced tomatoes"),
+            "2-3 cloves garlic, minced": ("2-3 cloves", "garlic, minced"),
+            "1 to 2 tablespoons olive oil": ("1 to 2 tablespoons", "olive oil"),
+            "4 chicken breasts": ("4", "chicken breasts"),
+            "pinch of salt": ("pinch", "salt"),
+            "Black pepper, to taste": ("to taste", "Black pepper"),
+            "양파 1개": ("1개", "양파"),
+            "Flour 2 cups": ("2 cups", "Flour"),
+            "계란 2": ("2", "계란"),
+            "Serves 4": ("", "Serves 4"),
+            "Preheat oven to 350": ("", "Preheat oven to 350"),
+            "Juice of 1 lime": ("", "Juice of 1 lime"),
+            "Fresh parsley": ("", "Fresh parsley"),
+        }
+        for line, (quantity, item) in cases.items():
+            with self.subTest(line=line):
+                self.assertEqual(split_ingredient(line), {"quantity": quantity, "item": item})
+
+
+class FirstUseQuantityTests(unittest.TestCase):
+    def test_only_whole_words_and_plurals_match(self):
+        ingredients = [
+            {"quantity": "1 cup", "item": "heavy cream"},
+            {"quantity": "2 tbsp", "item": "butter"},
+            {"quantity": "1 tsp", "item": "salt"},
+            {"quantity": "2", "item": "large eggs"},
+        ]
+        steps = ["Beat the eggs until creamy.", "Add buttermilk and salted nuts.", "Melt the butter, then add salt."]
+
+        self.assertEqual(
+            add_first_use_quantities(steps, ingredients),
+            ["Beat the eggs (2) until creamy.", "Add buttermilk and salted nuts.",
+             "Melt the butter (2 tbsp), then add salt (1 tsp)."],
+        )
+
+    def test_quantity_must_appear_as_a_whole_amount(self):
+        ingredients = [{"quantity": "1", "item": "onion"}, {"quantity": "1개", "item": "양파"}]
+        steps = ["Cook the onion for 10 minutes.", "양파를 볶는다. 1개면 충분하다."]
+
+        self.assertEqual(
+            add_first_use_quantities(steps, ingredients),
+            ["Cook the onion (1) for 10 minutes.", "양파를 볶는다. 1개면 충분하다."],
+        )
+
+
+class StructureFromJsonLdTests(unittest.TestCase):
+    def test_complete_recipe_is_structured_with_full_confidence(self):
+        recipe, confidence = structure_from_json_ld(_recipe())
+
+        self.assertEqual(confidence, 1.0)
+        self.assertEqual(recipe["title"], "Pancakes")
+        self.assertEqual(recipe["introduction"], "Fluffy weekend pancakes. Ready in 20 minutes.")
+        self.assertEqual(recipe["ingredients"][0], {"quantity": "2 cups", "item": "flour"})
+        self.assertEqual(
+            recipe["instructions"],
+            ["Mix the flour (2 cups) and salt (1 tsp) in a bowl.", "Beat in the eggs (2) and cook."],
+        )
+
+    def test_missing_field_has_zero_confidence(self):
+        _, confidence = structure_from_json_ld(_recipe(recipeInstructions=[]))
+        self.assertEqual(confidence, 0.0)
+
+    def test_unquantified_blob_recipes_fall_back_to_llm(self):
+        calls = []
+
+        def llm(raw_text):
+            calls.append(raw_text)
+            return {"title": "From LLM"}
+
+        data = _recipe(
+            recipeIngredient=["For the batter:", "flour", "eggs"],
+            recipeInstructions="Mix everything. " * 40,
+        )
+
+        self.assertEqual(structure_recipe("raw", data, llm=llm), {"title": "From LLM"})
+        self.assertEqual(structure_recipe("raw", None, llm=llm), {"title": "From LLM"})
+        self.assertEqual(structure_recipe("raw", _recipe(), llm=llm)["title"], "Pancakes")
+        self.assertEqual(calls, ["raw", "raw"])
+
+
+if __name__ == "__main__":
+    unittest.main()
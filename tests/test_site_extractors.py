@@ -0,0 +1,46 @@
+import unittest
+
+from bs4 import BeautifulSoup
+
+import scrape  # noqa: F401  registers the dedicated site handlers
+from site_extractors import GENERIC_PROFILE, ExtractorRegistry, SiteProfile, lookup
+
+
+class SiteExtractorRegistryTests(unittest.TestCase):
+    def test_exact_www_and_subdomain_hosts_share_a_profile(self):
+        for url in (
+            "https://allrecipes.com/recipe/1",
+            "https://www.allrecipes.com/recipe/1",
+            "https://m.allrecipes.com:443/recipe/1",
+            "https://WWW.AllRecipes.com./recipe/1",
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(lookup(url).name, "allrecipes")
+
+    def test_unknown_and_lookalike_hosts_use_generic_profile(self):
+        self.assertIs(lookup("https://example.com/r"), GENERIC_PROFILE)
+        self.assertIs(lookup("https://notallrecipes.com/r"), GENERIC_PROFILE)
+
+    def test_dedicated_handlers_are_registered(self):
+        self.assertIsNotNone(lookup("https://www.10000recipe.com/recipe/1").handler)
+        self.assertIsNotNone(lookup("https://www.maangchi.com/recipe/x").handler)
+        self.assertIsNone(lookup("https://www.allrecipes.com/recipe/1").handler)
+
+    def test_profile_selects_with_first_matching_selector(self):
+        profile = SiteProfile("t", ["t.example"], {"ingredients": [".missing li", ".ing li", "li"]})
+        soup = BeautifulSoup('<ul class="ing"><li>flour</li></ul><ul><li>other</li></ul>', "html.parser")
+
+        self.assertEqual([el.get_text() for el in profile.select(soup, "ingredients")], ["flour"])
+
+    def test_many_profiles_resolve_directly(self):
+        registry = ExtractorRegistry(GENERIC_PROFILE)
+        for i in range(300):
+            registry.register(SiteProfile(f"site{i}", [f"site{i}.com"], {"title": ["h1"]}))
+
+        self.assertEqual(len(registry), 300)
+        self.assertEqual(registry.lookup("https://blog.site250.com/r").name, "site250")
+        self.assertIs(registry.lookup("https://site300.com/r"), GENERIC_PROFILE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import circuit_breaker
+import recipe_pipeline
+from circuit_breaker import CircuitBreaker, NegativeCache
+from recipe_pipeline import Transport, extract_recipe
+from strategy_memory import StrategyMemory
+
+
+RECIPE_PAGE = (
+    '<script type="application/ld+json">'
+    + json.dumps({"@type": "Recipe", "name": "x", "recipeIngredient": ["a"], "recipeInstructions": ["b"]})
+    + '</script>'
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class StrategyMemoryTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.clock = _Clock()
+        self.memory = StrategyMemory(path=os.path.join(self.tmpdir.name, "memory.db"), half_life_days=1, clock=self.clock)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_winner_moves_first_and_loser_falls_behind_unknown(self):
+        url = "https://www.bonappetit.com/recipe/x"
+        self.memory.record(url, [("transport", "cloudscraper", False, 2.0), ("transport", "requests", True, 0.3)])
+
+        ranked = self.memory.rank(url, "transport", ["cloudscraper", "requests", "selenium"])
+
+        self.assertEqual(ranked, ["requests", "selenium", "cloudscraper"])
+        self.assertEqual(self.memory.rank("https://other.example/", "transport", ["cloudscraper", "requests"]),
+                         ["cloudscraper", "requests"])
+
+    def test_decay_lets_a_changed_site_be_relearned(self):
+        url = "https://a.example/r"
+        for _ in range(10):
+            self.memory.record(url, [("extractor", "json_ld", True, 0.01)])
+        self.clock.now += 10 * 86400  # ten half-lives later the site changed its markup
+        self.memory.record(url, [("extractor", "json_ld", False, 0.0), ("extractor", "site_selectors", True, 0.05)])
+
+        self.assertEqual(self.memory.rank(url, "extractor", ["json_ld", "site_selectors"]), ["site_selectors", "json_ld"])
+
+    def test_pipeline_tries_learned_transport_first(self):
+        calls = []
+
+        def fetch(name):
+            def inner(url):
+                calls.append(name)
+                return RECIPE_PAGE
+            return inner
+
+        transports = [Transport("cloudscraper", fetch("cloudscraper")), Transport("requests", fetch("requests"))]
+        url = "https://www.bonappetit.com/recipe/x"
+        self.memory.record(url, [("transport", "cloudscraper", False, 5.0), ("transport", "requests", True, 0.2)])
+
+        with mock.patch.object(recipe_pipeline, "html_cache"), \
+                mock.patch.object(circuit_breaker, "negative_cache", NegativeCache()), \
+                mock.patch.object(circuit_breaker, "circuit_breaker", CircuitBreaker()):
+            result = extract_recipe(url, transports=transports, memory=self.memory)
+
+        self.assertEqual(calls, ["requests"])
+        self.assertEqual((result.transport, result.strategy), ("requests", "json_ld"))
+        self.assertEqual(self.memory.stats()["first_choice_wins"], 1)
+        self.assertGreater(self.memory.scores(url, "extractor")["json_ld"]["successes"], 0)
+
+    def test_generic_fallback_win_does_not_outrank_json_ld(self):
+        url = "https://a.example/r"
+        plain = "<html><body><main><h1>Soup</h1><p>Heat a cup of stock and serve.</p></main></body></html>"
+
+        with mock.patch.object(recipe_pipeline, "html_cache"), \
+                mock.patch.object(circuit_breaker, "negative_cache", NegativeCache()), \
+                mock.patch.object(circuit_breaker, "circuit_breaker", CircuitBreaker()):
+            first = extract_recipe(url, transports=[Transport("a", lambda u: plain)], memory=self.memory)
+            self.assertEqual(first.strategy, "generic")
+            self.assertEqual(self.memory.scores(url, "extractor"), {})
+
+            second = extract_recipe(url + "/2", transports=[Transport("a", lambda u: RECIPE_PAGE)], memory=self.memory)
+            self.assertEqual(second.strategy, "json_ld")
+
+    def test_first_choice_rate_judges_the_learned_strategy_order(self):
+        url = "https://a.example/r"
+        page = ('<html><body><h1>Soup</h1><ul class="ingredients"><li>1 cup stock</li></ul>'
+                '<ol class="instructions"><li>Heat the stock.</li></ol></body></html>')
+
+        with mock.patch.object(recipe_pipeline, "html_cache"), \
+                mock.patch.object(circuit_breaker, "negative_cache", NegativeCache()), \
+                mock.patch.object(circuit_breaker, "circuit_breaker", CircuitBreaker()):
+            first = extract_recipe(url, transports=[Transport("a", lambda u: page)], memory=self.memory)
+            second = extract_recipe(url + "/2", transports=[Transport("a", lambda u: page)], memory=self.memory)
+
+        # site_handler was ranked ahead of site_selectors until site_selectors won once
+        self.assertEqual((first.strategy, second.strategy), ("site_selectors", "site_selectors"))
+        self.assertEqual((self.memory.stats()["misses"], self.memory.stats()["first_choice_wins"]), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import threading
+import time
+import unittest
+
+import tts
+from tts import AudioCache, audio_filename, audio_key, split_narration, synthesize_chunked
+
+
+class FakeStorage:
+    def __init__(self):
+        self.files = {}
+        self.saves = 0
+
+    def audio_exists(self, filename):
+        return f"/static/audio/{filename}" if filename in self.files else None
+
+    def save_audio(self, audio_content, filename):
+        self.saves += 1
+        self.files[filename] = audio_content
+        return f"/static/audio/{filename}"
+
+
+class AudioKeyTests(unittest.TestCase):
+    def test_key_ignores_whitespace_but_not_voice_or_model(self):
+        base = audio_key("Step 1.  Mix\n\n the flour.", "tts-1", "nova", "mp3")
+
+        self.assertEqual(base, audio_key("Step 1. Mix\nthe flour.", "tts-1", "nova", "mp3"))
+        self.assertNotEqual(base, audio_key("Step 1. Mix\nthe flour.", "tts-1", "alloy", "mp3"))
+        self.assertNotEqual(base, audio_key("Step 1. Mix\nthe flour.", "tts-1-hd", "nova", "mp3"))
+        self.assertEqual(audio_filename(base, "mp3"), f"tts_{base}.mp3")
+
+
+class ChunkedSynthesisTests(unittest.TestCase):
+    def test_chunks_keep_lines_whole_and_respect_the_limit(self):
+        text = "Recipe: Soup\n" + "\n".join(f"Step {i}: Stir the pot well." for i in range(1, 30))
+        chunks = split_narration(text, 120)
+
+        self.assertTrue(all(len(chunk) <= 120 for chunk in chunks))
+        self.assertEqual("\n".join(chunks), text)
+
+    def test_long_lines_split_at_sentences(self):
+        line = "Whisk the eggs. " * 20 + "x" * 50
+        chunks = split_narration(line.strip(), 100)
+
+        self.assertTrue(all(len(chunk) <= 100 for chunk in chunks))
+        self.assertTrue(chunks[0].endswith("eggs."))
+
+    def test_chunks_run_in_parallel_and_are_joined_in_order(self):
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def synthesize(text, *args):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return text.encode()
+
+        text = "\n".join(f"Step {i}: stir." for i in range(8))
+        audio = synthesize_chunked(text, synthesize, fmt="mp3", max_chars=20, workers=4)
+
+        self.assertEqual(audio, text.replace("\n", "").encode())
+        self.assertGreater(peak[0], 1)
+
+    def test_failed_chunks_are_retried(self):
+        attempts = []
+
+        def flaky(text, *args):
+            attempts.append(text)
+            if attempts.count(text) < 2:
+                raise RuntimeError("timeout")
+            return b"ok"
+
+        original_delay, tts.TTS_RETRY_DELAY = tts.TTS_RETRY_DELAY, 0
+        try:
+            audio = synthesize_chunked("Step 1: a.\nStep 2: b.", flaky, fmt="mp3", max_chars=12, retries=2)
+        finally:
+            tts.TTS_RETRY_DELAY = original_delay
+
+        self.assertEqual(audio, b"okok")
+        self.assertEqual(len(attempts), 4)
+
+
+class AudioCacheTests(unittest.TestCase):
+    def test_stored_audio_is_returned_without_synthesis(self):
+        calls = []
+        storage = FakeStorage()
+        cache = AudioCache(storage, lambda text, *args: calls.append(text) or b"mp3")
+
+        first = cache.get_or_create("Mix the flour.")
+        second = cache.get_or_create("Mix  the flour.")
+
+        self.assertEqual(first, second)
+        self.assertEqual(calls, ["Mix the flour."])
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_concurrent_requests_share_one_synthesis(self):
+        calls = []
+        started = threading.Event()
+
+        def slow_synthesis(text, *args):
+            calls.append(text)
+            started.set()
+            time.sleep(0.2)
+            return b"mp3"
+
+        storage = FakeStorage()
+        cache = AudioCache(storage, slow_synthesis)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_create("Boil."))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(storage.saves, 1)
+        self.assertEqual(len(set(results)), 1)
+
+    def test_failures_reach_every_waiter_and_are_not_remembered(self):
+        release = threading.Event()
+        outcome = {"fail": True}
+
+        def synthesize(text, *args):
+            release.wait(1)
+            if outcome["fail"]:
+                raise RuntimeError("quota")
+            return b"mp3"
+
+        storage = FakeStorage()
+        cache = AudioCache(storage, synthesize)
+        original_delay, tts.TTS_RETRY_DELAY = tts.TTS_RETRY_DELAY, 0
+        errors = []
+
+        def call():
+            try:
+                cache.get_or_create("Boil.")
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        try:
+            for thread in threads:
+                thread.start()
+            time.sleep(0.05)
+            release.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            tts.TTS_RETRY_DELAY = original_delay
+
+        self.assertEqual(errors, ["quota"] * 3)
+        outcome["fail"] = False
+        self.assertEqual(cache.get_or_create("Boil.")[1], f"/static/audio/{audio_filename(audio_key('Boil.'))}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,280 @@
+# tts.py
+"""
+Text-to-speech with a content-addressed audio cache.
+
+Audio files are named after a SHA-256 of the normalized text plus the TTS
+model, voice and format. Regenerating, double-submitting or sharing the same
+text across duplicate recipes therefore reuses one stored file instead of
+paying for another synthesis. When the file is not stored yet, one synthesis
+runs per key on a background pool and writes into an AudioBuffer; every
+concurrent request for that key waits on the same buffer (single-flight), and
+the finished audio is saved to storage. Coalescing happens within a process;
+across processes the storage lookup serves whatever another one has already
+finished.
+
+Long narrations are split at line (step) and sentence boundaries into chunks
+of at most TTS_CHUNK_CHARS characters. The chunks are synthesized in parallel
+by up to TTS_WORKERS threads, each retried on its own, and the MP3 results are
+joined frame by frame, so generation takes about as long as the slowest chunk.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from llm_cache import normalize_text
+from mp3_utils import Mp3FrameFilter
+
+logger = logging.getLogger(__name__)
+
+TTS_MODEL = os.getenv('TTS_MODEL', 'tts-1')  # Standard model - half the cost, good quality for recipes
+TTS_VOICE = os.getenv('TTS_VOICE', 'nova')   # Clear, engaging voice
+TTS_FORMAT = os.getenv('TTS_FORMAT', 'mp3')
+# The speech endpoint accepts at most 4096 characters per request
+TTS_MAX_INPUT_CHARS = 4096
+TTS_CHUNK_CHARS = min(int(os.getenv('TTS_CHUNK_CHARS', '1000')), TTS_MAX_INPUT_CHARS)
+TTS_WORKERS = int(os.getenv('TTS_WORKERS', '4'))
+TTS_CHUNK_RETRIES = int(os.getenv('TTS_CHUNK_RETRIES', '3'))
+TTS_RETRY_DELAY = float(os.getenv('TTS_RETRY_DELAY', '1.0'))
+
+# Finished keys remembered so a request racing the upload does not synthesize again
+RECENT_AUDIO_ENTRIES = 256
+
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?。])\s+')
+
+# synthesize(text, model, voice, format) -> audio bytes
+Synthesizer = Callable[[str, str, str, str], bytes]
+
+def audio_key(text: str, model: str = TTS_MODEL, voice: str = TTS_VOICE, fmt: str = TTS_FORMAT) -> str:
+    payload = '\n'.join((model, voice, fmt, normalize_text(text)))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def audio_filename(key: str, fmt: str = TTS_FORMAT) -> str:
+    return f"tts_{key}.{fmt}"
+
+def _pieces(line: str, max_chars: int) -> List[str]:
+    """Split an over-long line at sentence ends, then at spaces, into pieces of at most ``max_chars``."""
+    if len(line) <= max_chars:
+        return [line]
+    pieces = []
+    for sentence in _SENTENCE_END_RE.split(line):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars + 1)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            pieces.append(sentence)
+    return pieces
+
+def split_narration(text: str, max_chars: int = TTS_CHUNK_CHARS) -> List[str]:
+    """
+    Split narration into chunks of at most ``max_chars`` characters.
+    Whole lines (the title, each ingredient, each step) are packed together, so
+    a chunk only ends mid-line when that line alone is too long; then it is
+    split at sentence ends.
+    """
+    chunks: List[str] = []
+    current = ''
+    for line in text.split('\n'):
+        for piece in _pieces(line.strip(), max_chars):
+            if current and len(current) + 1 + len(piece) > max_chars:
+                chunks.append(current)
+                current = ''
+            current = f"{current}\n{piece}" if current else piece
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+class AudioBuffer:
+    """Audio written by one producer and waited on by any number of readers."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._parts: List[bytes] = []
+        self.done = False
+        self.url: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+    def append(self, data: bytes) -> None:
+        with self._cond:
+            self._parts.append(data)
+
+    def finish(self, url: Optional[str] = None, error: Optional[BaseException] = None) -> None:
+        with self._cond:
+            self.url, self.error, self.done = url, error, True
+            self._cond.notify_all()
+
+    def wait(self) -> Optional[str]:
+        """Block until the producer finishes; returns its URL or raises its error."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.done)
+        if self.error is not None:
+            raise self.error
+        return self.url
+
+    def content(self) -> bytes:
+        with self._cond:
+            return b''.join(self._parts)
+
+def synthesize_chunked(
+    text: str,
+    synthesize: Synthesizer,
+    model: str = TTS_MODEL,
+    voice: str = TTS_VOICE,
+    fmt: str = TTS_FORMAT,
+    max_chars: int = TTS_CHUNK_CHARS,
+    workers: int = TTS_WORKERS,
+    retries: int = TTS_CHUNK_RETRIES,
+) -> bytes:
+    """
+    Synthesize ``text`` chunk by chunk in parallel and join the audio in order.
+    Only MP3 can be joined without re-encoding, so other formats go out as a
+    single request.
+    """
+    chunks = split_narration(text, max_chars) if fmt == 'mp3' else []
+    if len(chunks) <= 1:
+        chunks = [text]
+    buffers = [AudioBuffer() for _ in chunks]
+
+    started = time.time()
+    pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks))))
+    parts: List[bytes] = []
+    try:
+        for chunk, buffer in zip(chunks, buffers):
+            pool.submit(_fill_buffer, synthesize, chunk, buffer, model, voice, fmt, retries)
+        for buffer in buffers:
+            buffer.wait()
+            if fmt != 'mp3':
+                parts.append(buffer.content())
+                continue
+            frames = Mp3FrameFilter()
+            parts.append(frames.feed(buffer.content()))
+            parts.append(frames.flush())
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    if len(chunks) > 1:
+        logger.info(f"Synthesized {len(chunks)} chunks in {time.time() - started:.1f}s")
+    return b''.join(parts)
+
+def _fill_buffer(synthesize: Synthesizer, text: str, buffer: AudioBuffer,
+                 model: str, voice: str, fmt: str, retries: int) -> None:
+    """Synthesize one chunk into ``buffer``, retrying failed attempts with backoff."""
+    attempts = max(retries, 1)
+    for attempt in range(attempts):
+        try:
+            audio = synthesize(text, model, voice, fmt)
+            if audio:
+                buffer.append(audio)
+            buffer.finish()
+            return
+        except Exception as e:
+            if attempt == attempts - 1:
+                buffer.finish(error=e)
+                return
+            logger.warning(f"TTS chunk attempt {attempt + 1} failed: {e}")
+            time.sleep(TTS_RETRY_DELAY * 2 ** attempt)
+
+class AudioCache:
+    """Look up audio by content key in AudioStorage; synthesize and store it once on a miss."""
+
+    def __init__(
+        self,
+        storage,
+        synthesize: Synthesizer,
+        model: str = TTS_MODEL,
+        voice: str = TTS_VOICE,
+        fmt: str = TTS_FORMAT,
+        workers: int = TTS_WORKERS,
+    ):
+        self.storage = storage
+        self.synthesize = synthesize
+        self.model = model
+        self.voice = voice
+        self.fmt = fmt
+        # Producers run in submission order, so the first segments of a narration are synthesized first
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='tts')
+        self._lock = threading.Lock()
+        self._live: Dict[str, AudioBuffer] = {}
+        self._recent: 'OrderedDict[str, str]' = OrderedDict()
+        self.counters = {'hits': 0, 'misses': 0, 'coalesced': 0, 'synthesized': 0}
+
+    def filename(self, text: str) -> str:
+        """Storage filename of the audio for ``text``."""
+        return audio_filename(audio_key(text, self.model, self.voice, self.fmt), self.fmt)
+
+    def open(self, text: str) -> Tuple[str, Optional[str], Optional[AudioBuffer]]:
+        """
+        Return (filename, url, None) when the audio for ``text`` is stored, or
+        (filename, None, buffer) to wait on the synthesis that produces it.
+        """
+        filename = self.filename(text)
+        with self._lock:
+            live, url = self._live.get(filename), self._recent.get(filename)
+        if live is None and url is None:
+            url = self.storage.audio_exists(filename)
+        if url:
+            self._count('hits')
+            return filename, url, None
+
+        with self._lock:
+            # Another request may have started (or finished) it during the storage lookup
+            live = live or self._live.get(filename)
+            url = self._recent.get(filename)
+            leader = live is None and url is None
+            if leader:
+                live = self._live[filename] = AudioBuffer()
+            self.counters['misses' if leader else ('coalesced' if live else 'hits')] += 1
+        if url:
+            return filename, url, None
+        if leader:
+            self._pool.submit(self._produce, text, filename, live)
+        return filename, None, live
+
+    def get_or_create(self, text: str) -> Tuple[str, str]:
+        """Return (filename, url) of the audio for ``text``, synthesizing it only if it is not stored."""
+        filename, url, live = self.open(text)
+        if url:
+            return filename, url
+        return filename, live.wait()
+
+    def _produce(self, text: str, filename: str, live: AudioBuffer) -> None:
+        try:
+            audio_content = synthesize_chunked(text, self.synthesize, self.model, self.voice, self.fmt)
+            live.append(audio_content)
+            url = self.storage.save_audio(audio_content, filename)
+            if not url:
+                raise RuntimeError('Failed to save audio')
+        except Exception as e:
+            logger.error(f"Synthesis of {filename} failed: {e}")
+            with self._lock:
+                del self._live[filename]
+            live.finish(error=e)
+            return
+
+        logger.info(f"Synthesized {filename} ({len(audio_content)} bytes)")
+        with self._lock:
+            self.counters['synthesized'] += 1
+            self._recent[filename] = url
+            while len(self._recent) > RECENT_AUDIO_ENTRIES:
+                self._recent.popitem(last=False)
+            del self._live[filename]
+        live.finish(url=url)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and hit rate for this process."""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self.counters)
+            stats['in_flight'] = len(self._live)
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats